@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+端到端基准测试：启动离线替身服务，通过 stdio 驱动 MCP 服务，按工具和知识库后端统计延迟、吞吐与内存
+
+每个后端启动一个独立的 MCP 服务进程（工作目录为临时目录），先运行萃取类工具写入数据，
+再运行检索增强类工具。结果以 JSON 输出，便于跨版本比较。
+
+用法：
+    python benchmarks/run_benchmark.py --backends numpy,cloud --requests 50 --concurrency 4 \\
+        --profile realistic --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from standins import PROFILES, StandInServer, load_profile, render_page  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKENDS = {"numpy": "numpy", "local": "local", "cloud": "cloud"}
+
+_QUERIES = [
+    "帮我写一段新品咖啡机的推广文案",
+    "写一份季度销售汇报的开头",
+    "为健身房会员续费设计一条短信",
+    "给在线课程写一个落地页标题",
+    "写一段说服用户开启自动备份的提示",
+    "为二手车平台写一段信任背书文案",
+]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), int(round(q / 100 * len(sorted_values) + 0.5))))
+    return sorted_values[rank - 1]
+
+
+def _find_server_pid() -> Optional[int]:
+    """在 /proc 中查找本进程启动的 MCP 服务子进程（仅 Linux）"""
+    if not os.path.isdir("/proc"):
+        return None
+    parent = os.getpid()
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            if ppid != parent:
+                continue
+            with open(f"/proc/{entry}/cmdline", "rb") as f:
+                if b"mcp_server_better_prompts" in f.read():
+                    return int(entry)
+        except (OSError, IndexError, ValueError):
+            continue
+    return None
+
+
+def _rss_mb(pid: Optional[int]) -> Optional[float]:
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+class RssSampler:
+    """定期采样子进程 RSS，记录峰值"""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.pid: Optional[int] = None
+        self.peak: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.pid = _find_server_pid()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def sample(self) -> Optional[float]:
+        rss = _rss_mb(self.pid)
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+        return rss
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+def _extract_input(number: int, base_url: str, extract_input: str) -> str:
+    if extract_input == "url":
+        return f"{base_url}/pages/{number}"
+    return re.sub(r"<[^>]+>", "\n", render_page(number)).strip()
+
+
+def make_arguments(tool: str, index: int, base_url: str, batch_size: int, extract_input: str = "url") -> Dict[str, Any]:
+    """第 index 次调用的工具参数"""
+    if tool == "extract_methodology":
+        return {"content": _extract_input(index, base_url, extract_input)}
+    if tool == "extract_methodology_batch":
+        start = 100000 + index * batch_size
+        return {"contents": [_extract_input(start + i, base_url, extract_input) for i in range(batch_size)]}
+    if tool == "enhance_prompt":
+        return {"user_input": f"{_QUERIES[index % len(_QUERIES)]}（第{index}次）"}
+    if tool == "enhance_prompt_batch":
+        return {"user_inputs": [
+            f"{_QUERIES[(index + i) % len(_QUERIES)]}（第{index}-{i}次）" for i in range(batch_size)
+        ]}
+    raise SystemExit(f"不支持的工具: {tool}")
+
+
+async def run_tool(
+    session: ClientSession,
+    tool: str,
+    requests: int,
+    concurrency: int,
+    make_args: Callable[[int], Dict[str, Any]],
+    sampler: RssSampler,
+) -> Dict[str, Any]:
+    """以固定并发调用 requests 次工具，统计延迟分布"""
+    latencies: List[float] = []
+    errors: List[str] = []
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, make_args(index))
+                if result.isError:
+                    errors.append(result.content[0].text if result.content else "error")
+            except Exception as e:
+                errors.append(str(e))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "tool": tool,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "throughput_rps": round(requests / elapsed, 3) if elapsed else 0.0,
+        "rss_mb": sampler.sample(),
+        "peak_rss_mb": sampler.peak,
+    }
+
+
+async def run_backend(backend: str, args: argparse.Namespace, standins: StandInServer) -> Dict[str, Any]:
+    """为一个后端启动 MCP 服务并依次测试各工具"""
+    workdir = tempfile.mkdtemp(prefix=f"bench-{backend}-")
+    env = {
+        **os.environ,
+        **standins.server_env(),
+        "KNOWLEDGE_STORAGE": BACKENDS[backend],
+        "NUMPY_STORE_PATH": os.path.join(workdir, "numpy_store"),
+        "FETCH_PER_HOST_DELAY": str(args.per_host_delay),
+        "FETCH_PER_HOST_CONNECTIONS": str(args.per_host_connections),
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.join(REPO_ROOT, "src"), os.environ.get("PYTHONPATH")])),
+    }
+    env.update(dict(item.split("=", 1) for item in args.env))
+    params = StdioServerParameters(
+        command=sys.executable, args=["-m", "mcp_server_better_prompts"], env=env, cwd=workdir
+    )
+
+    results: List[Dict[str, Any]] = []
+    sampler = RssSampler()
+    started = time.perf_counter()
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            await session.list_tools()
+            startup_ms = (time.perf_counter() - started) * 1000
+            sampler.start()
+            try:
+                for tool in args.tools:
+                    make_args = lambda index, tool=tool: make_arguments(
+                        tool, index, standins.base_url, args.batch_size, args.extract_input
+                    )
+                    # 预热调用不计入统计，使用独立的参数序号
+                    for i in range(args.warmup):
+                        await session.call_tool(tool, make_args(args.requests + i))
+                    result = await run_tool(session, tool, args.requests, args.concurrency, make_args, sampler)
+                    result["backend"] = backend
+                    results.append(result)
+                    print(json.dumps(result, ensure_ascii=False), file=sys.stderr)
+            finally:
+                await sampler.stop()
+    return {"backend": backend, "startup_ms": round(startup_ms, 2), "tools": results}
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    profile = load_profile(args.profile, args.profile_file)
+    standins = StandInServer(profile, port=args.port).start()
+    try:
+        backends = [await run_backend(backend, args, standins) for backend in args.backends]
+    finally:
+        standins.stop()
+    return {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "profile": args.profile_file or args.profile,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "upstream_requests": dict(standins.state.requests),
+        "backends": backends,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Better Prompts MCP 端到端基准测试")
+    parser.add_argument("--backends", default="numpy,cloud", help="逗号分隔: numpy,local,cloud")
+    parser.add_argument("--tools", default="extract_methodology,enhance_prompt",
+                        help="逗号分隔，按顺序执行: extract_methodology,extract_methodology_batch,"
+                             "enhance_prompt,enhance_prompt_batch")
+    parser.add_argument("--requests", type=int, default=50, help="每个工具的调用次数")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=2, help="每个工具的预热调用次数")
+    parser.add_argument("--extract-input", choices=["url", "text"], default="url",
+                        help="萃取工具的输入: url 经过网页抓取与正文提取，text 直接提交文章文本")
+    parser.add_argument("--batch-size", type=int, default=10, help="批量工具每次调用的条目数")
+    parser.add_argument("--profile", default="realistic", help=f"替身服务配置: {', '.join(PROFILES)}")
+    parser.add_argument("--profile-file", help="替身服务 JSON 配置文件")
+    parser.add_argument("--port", type=int, default=0, help="替身服务端口，0 为随机")
+    parser.add_argument("--per-host-delay", type=float, default=0.0, help="替身网页同属一个主机，默认不限速")
+    parser.add_argument("--per-host-connections", type=int, default=64)
+    parser.add_argument("--env", action="append", default=[], help="传给 MCP 服务的额外环境变量 NAME=VALUE")
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args()
+    args.backends = [name.strip() for name in args.backends.split(",") if name.strip()]
+    args.tools = [name.strip() for name in args.tools.split(",") if name.strip()]
+    for backend in args.backends:
+        if backend not in BACKENDS:
+            raise SystemExit(f"未知的后端: {backend}")
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+离线替身服务：模拟大模型 /chat/completions、Ollama 嵌入接口、Dify 知识库接口和待抓取的网页
+
+所有接口共用一个端口：
+- POST /v1/chat/completions                 OpenAI 兼容接口，支持 stream
+- GET  /api/tags, POST /api/embed, /api/embeddings  Ollama 接口
+- POST /v1/datasets/<id>/documents/<id>/segments, /v1/datasets/<id>/retrieve  Dify 接口
+- GET  /pages/<n>                           生成的文章网页
+
+每类服务 (llm / embedding / dify / web) 可单独配置延迟和错误率，见 PROFILES。
+
+用法：
+    python benchmarks/standins.py --port 8900 --profile realistic
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+EMBEDDING_DIMENSION = 768
+
+
+@dataclass
+class ServiceProfile:
+    """单类服务的延迟与错误配置"""
+    latency_ms: float = 0.0         # 平均响应延迟
+    jitter_ms: float = 0.0          # 延迟抖动（均匀分布 ±jitter）
+    per_item_ms: float = 0.0        # 大模型为每个输出 token、嵌入为每条文本额外增加的延迟
+    error_rate: float = 0.0         # 返回 500 的概率
+    rate_limit_rate: float = 0.0    # 返回 429 (带 Retry-After) 的概率
+    retry_after: float = 1.0
+
+
+@dataclass
+class Profile:
+    llm: ServiceProfile = field(default_factory=ServiceProfile)
+    embedding: ServiceProfile = field(default_factory=ServiceProfile)
+    dify: ServiceProfile = field(default_factory=ServiceProfile)
+    web: ServiceProfile = field(default_factory=ServiceProfile)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Profile":
+        return cls(**{name: ServiceProfile(**values) for name, values in data.items()})
+
+
+PROFILES: Dict[str, Profile] = {
+    # 无延迟，测量服务自身开销
+    "fast": Profile(),
+    # 接近真实上游的延迟
+    "realistic": Profile(
+        llm=ServiceProfile(latency_ms=600, jitter_ms=200, per_item_ms=2),
+        embedding=ServiceProfile(latency_ms=15, jitter_ms=5, per_item_ms=2),
+        dify=ServiceProfile(latency_ms=80, jitter_ms=30),
+        web=ServiceProfile(latency_ms=150, jitter_ms=100),
+    ),
+    # 在 realistic 基础上注入 5% 的 500 与 5% 的 429
+    "flaky": Profile(
+        llm=ServiceProfile(latency_ms=600, jitter_ms=200, per_item_ms=2, error_rate=0.05, rate_limit_rate=0.05),
+        embedding=ServiceProfile(latency_ms=15, jitter_ms=5, per_item_ms=2, error_rate=0.02),
+        dify=ServiceProfile(latency_ms=80, jitter_ms=30, error_rate=0.05, rate_limit_rate=0.05),
+        web=ServiceProfile(latency_ms=150, jitter_ms=100, error_rate=0.05),
+    ),
+}
+
+_WORD = re.compile(r"[\u4e00-\u9fff]|[a-z0-9]+")
+
+_TOPICS = [
+    ("心理账户", "消费者会把钱划入不同的心理账户，文案可以引导顾客把开支从不愿花钱的账户转移到乐于消费的账户。"),
+    ("AIDA 模型", "按注意、兴趣、欲望、行动四个阶段组织文案，每一段只完成一个阶段的任务。"),
+    ("锚定效应", "先给出一个参照价格或数字，后续的判断会向锚点靠拢，适合用于定价和对比。"),
+    ("SCQA 结构", "按情境、冲突、问题、答案展开叙述，让读者在冲突处产生阅读动力。"),
+    ("峰终定律", "体验的评价取决于高峰和结尾，设计流程时集中资源打造峰值和收尾。"),
+    ("金字塔原理", "结论先行，以上统下，归类分组，逻辑递进，适合写汇报和说明文。"),
+    ("损失厌恶", "人们对损失的敏感度高于同等收益，文案可以强调不行动会失去什么。"),
+    ("社会认同", "展示他人的选择和评价，降低决策的不确定性。"),
+]
+
+
+def embed_text(text: str) -> List[float]:
+    """确定性的特征哈希嵌入，词汇重叠越多的文本余弦相似度越高"""
+    vector = [0.0] * EMBEDDING_DIMENSION
+    for token in _WORD.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        index = int.from_bytes(digest[:4], "big") % EMBEDDING_DIMENSION
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+def render_page(number: int) -> str:
+    """生成第 number 篇文章的 HTML"""
+    title, summary = _TOPICS[number % len(_TOPICS)]
+    paragraphs = "".join(
+        f"<p>{summary}第{number}篇文章的第{i + 1}段展开说明如何在实际写作中应用{title}，并给出具体步骤和示例。</p>"
+        for i in range(12)
+    )
+    return (
+        f"<html><head><meta charset=\"utf-8\"><title>{title} 实战 {number}</title></head>"
+        f"<body><article><h1>{title} 实战 {number}</h1>{paragraphs}"
+        f"<h2>示例</h2><p>示例：把{title}用于新品发布文案。</p></article></body></html>"
+    )
+
+
+def _methodology_reply(content: str) -> str:
+    """模拟方法论萃取的输出"""
+    found = [(title, summary) for title, summary in _TOPICS if title in content] or [_TOPICS[0]]
+    return json.dumps([
+        {
+            "title": f"使用{title}写文案",
+            "description": f"需要应用{title}的写作场景",
+            "methodology": (
+                f"## 使用{title}写文案\n### 基本原理\n- {summary}\n"
+                f"### 应用方法\n- 明确目标读者\n- 按{title}组织内容\n- 检查每一步是否落实\n"
+                f"### 细节和示例\n- {content[:200]}"
+            ),
+        }
+        for title, summary in found
+    ], ensure_ascii=False)
+
+
+def _enhance_reply(user_prompt: str) -> str:
+    """模拟提示词增强的输出"""
+    query = re.search(r"<user_query>\s*(.*?)\s*</user_query>", user_prompt, re.S)
+    need = query.group(1) if query else user_prompt[:100]
+    return json.dumps({
+        "prompt": f"# 扮演角色：\n资深文案策划\n## 做什么：\n{need}\n## 怎么做：\n1. 分析需求\n2. 套用方法论\n## 结果要求：\n输出完整文案"
+    }, ensure_ascii=False)
+
+
+class StandInState:
+    """替身服务的共享状态：Dify 分段与请求计数"""
+
+    def __init__(self, profile: Profile, seed: int = 0):
+        self.profile = profile
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.segments: List[Dict[str, Any]] = []
+        self.requests: Dict[str, int] = {}
+
+    def count(self, service: str) -> None:
+        with self.lock:
+            self.requests[service] = self.requests.get(service, 0) + 1
+
+    def roll(self, service: ServiceProfile) -> Tuple[Optional[int], float]:
+        """按配置决定是否注入错误，返回 (错误状态码或 None, 基础延迟秒数)"""
+        with self.lock:
+            value = self.random.random()
+            jitter = self.random.uniform(-service.jitter_ms, service.jitter_ms)
+        delay = max(0.0, service.latency_ms + jitter) / 1000
+        if value < service.error_rate:
+            return 500, delay
+        if value < service.error_rate + service.rate_limit_rate:
+            return 429, delay
+        return None, delay
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "StandInServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    @property
+    def state(self) -> StandInState:
+        return self.server.state
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send(self, status: int, body: Any, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        data = body if isinstance(body, bytes) else (
+            body.encode("utf-8") if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        )
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _inject(self, service_name: str, extra_delay: float = 0.0) -> bool:
+        """模拟延迟与错误，已发送错误响应时返回 True"""
+        self.state.count(service_name)
+        service = getattr(self.state.profile, service_name)
+        status, delay = self.state.roll(service)
+        time.sleep(delay + extra_delay)
+        if status == 429:
+            self._send(429, {"error": {"message": "rate limited"}}, headers={"Retry-After": str(service.retry_after)})
+            return True
+        if status is not None:
+            self._send(status, {"error": {"message": "injected error"}})
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        if self.path == "/api/tags":
+            self._send(200, {"models": [{"name": "nomic-embed-text:latest"}]})
+            return
+        match = re.fullmatch(r"/pages/(\d+)", self.path)
+        if match:
+            if self._inject("web"):
+                return
+            number = int(match.group(1))
+            etag = f'"page-{number}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send(200, render_page(number), "text/html; charset=utf-8", {"ETag": etag})
+            return
+        if self.path == "/stats":
+            with self.state.lock:
+                self._send(200, {"requests": dict(self.state.requests), "segments": len(self.state.segments)})
+            return
+        self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        body = self._read_json()
+        path = self.path
+        if path.endswith("/chat/completions"):
+            self._chat(body)
+        elif path == "/api/embed":
+            texts = body.get("input")
+            texts = [texts] if isinstance(texts, str) else texts or []
+            if self._inject("embedding", len(texts) * self.state.profile.embedding.per_item_ms / 1000):
+                return
+            self._send(200, {"model": body.get("model"), "embeddings": [embed_text(text) for text in texts]})
+        elif path == "/api/embeddings":
+            if self._inject("embedding", self.state.profile.embedding.per_item_ms / 1000):
+                return
+            self._send(200, {"embedding": embed_text(body.get("prompt", ""))})
+        elif re.fullmatch(r"/v1/datasets/[^/]+/documents/[^/]+/segments", path):
+            if self._inject("dify"):
+                return
+            created = []
+            with self.state.lock:
+                for segment in body.get("segments", []):
+                    record = {
+                        "id": uuid.uuid4().hex,
+                        "content": segment.get("content", ""),
+                        "keywords": segment.get("keywords", []),
+                        "embedding": embed_text(segment.get("content", "")),
+                    }
+                    self.state.segments.append(record)
+                    created.append({k: v for k, v in record.items() if k != "embedding"})
+            self._send(200, {"data": created})
+        elif re.fullmatch(r"/v1/datasets/[^/]+/retrieve", path):
+            if self._inject("dify"):
+                return
+            query = embed_text(body.get("query", ""))
+            top_k = body.get("retrieval_model", {}).get("top_k", 3)
+            with self.state.lock:
+                scored = sorted(
+                    ((_cosine(query, segment["embedding"]), segment) for segment in self.state.segments),
+                    key=lambda item: item[0],
+                    reverse=True,
+                )[:top_k]
+            self._send(200, {"records": [
+                {"score": score, "segment": {k: v for k, v in segment.items() if k != "embedding"}}
+                for score, segment in scored
+            ]})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        messages = body.get("messages", [])
+        system_prompt = messages[0]["content"] if messages else ""
+        user_prompt = messages[-1]["content"] if messages else ""
+        if "萃取方法论" in system_prompt:
+            reply = _methodology_reply(user_prompt)
+        else:
+            reply = _enhance_reply(user_prompt)
+        usage = {"total_tokens": len(system_prompt + user_prompt) // 2 + len(reply)}
+        per_token = self.state.profile.llm.per_item_ms / 1000
+
+        if not body.get("stream"):
+            if self._inject("llm", per_token * len(reply)):
+                return
+            self._send(200, {
+                "id": uuid.uuid4().hex,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        # 流式：先等待首包延迟，再按 per_item_ms 逐段输出
+        if self._inject("llm"):
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        step = 16
+        for start in range(0, len(reply), step):
+            time.sleep(per_token * step)
+            chunk = {"choices": [{"index": 0, "delta": {"content": reply[start:start + step]}}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        if (body.get("stream_options") or {}).get("include_usage"):
+            # 与 OpenAI 一致：仅在请求 include_usage 时以最后一个空 choices 的分块返回用量
+            self.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class StandInServer(ThreadingHTTPServer):
+    """在后台线程运行的替身服务"""
+
+    daemon_threads = True
+
+    def __init__(self, profile: Profile, host: str = "127.0.0.1", port: int = 0, seed: int = 0):
+        super().__init__((host, port), StandInHandler)
+        self.state = StandInState(profile, seed)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def server_env(self) -> Dict[str, str]:
+        """让 MCP 服务把所有上游指向替身服务的环境变量"""
+        return {
+            "LLM_API_BASE": f"{self.base_url}/v1",
+            "LLM_API_KEY": "stand-in",
+            "LLM_MODEL_NAME": "stand-in",
+            "OLLAMA_BASE_URL": self.base_url,
+            "DIFY_BASE_URL": f"{self.base_url}/v1",
+            "DIFY_API_KEY": "stand-in",
+            "DIFY_DATASET_ID": "bench",
+            "DIFY_DOCUMENT_ID": "bench",
+        }
+
+
+def load_profile(name: str, path: Optional[str] = None) -> Profile:
+    """内置配置名或 JSON 文件（结构同 Profile，缺省的服务使用零延迟）"""
+    if path:
+        with open(path, encoding="utf-8") as f:
+            return Profile.from_dict(json.load(f))
+    if name not in PROFILES:
+        raise SystemExit(f"未知的配置: {name}，可选: {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Better Prompts MCP 离线替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--profile", default="realistic", help=f"内置配置: {', '.join(PROFILES)}")
+    parser.add_argument("--profile-file", help="JSON 配置文件，覆盖 --profile")
+    args = parser.parse_args()
+
+    profile = load_profile(args.profile, args.profile_file)
+    server = StandInServer(profile, args.host, args.port)
+    print(json.dumps({"base_url": server.base_url, "profile": asdict(profile)}, ensure_ascii=False, indent=2))
+    print("MCP 服务环境变量:")
+    for name, value in server.server_env().items():
+        print(f"  {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+冷启动基准测试：统计从启动 MCP 服务进程到收到 initialize / tools/list 响应的耗时，以及模块导入耗时分布
+
+MCP 客户端通常为每个会话启动一个服务进程，冷启动直接影响首次响应。每轮在独立的临时目录中
+启动服务，以原始 JSON-RPC 消息完成握手，不依赖离线替身服务或 Ollama。
+
+用法：
+    python benchmarks/startup_benchmark.py --runs 10 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_MODULE = "mcp_server_better_prompts.server"
+
+
+def _server_env(workdir: str, prewarm: bool, extra: List[str]) -> Dict[str, str]:
+    env = {
+        **os.environ,
+        "KNOWLEDGE_STORAGE": "numpy",
+        "NUMPY_STORE_PATH": os.path.join(workdir, "numpy_store"),
+        "JOB_QUEUE_PATH": os.path.join(workdir, "jobs.db"),
+        "PREWARM": "true" if prewarm else "false",
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.join(REPO_ROOT, "src"), os.environ.get("PYTHONPATH")])),
+    }
+    env.update(dict(item.split("=", 1) for item in extra))
+    return env
+
+
+def _send(proc: subprocess.Popen, message: Dict[str, Any]) -> None:
+    proc.stdin.write((json.dumps(message) + "\n").encode())
+    proc.stdin.flush()
+
+
+def _read_response(proc: subprocess.Popen, request_id: int) -> Dict[str, Any]:
+    """读取指定请求的响应，跳过通知"""
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"服务进程提前退出 (exit={proc.poll()})")
+        message = json.loads(line)
+        if message.get("id") == request_id:
+            if "error" in message:
+                raise RuntimeError(f"请求 {request_id} 失败: {message['error']}")
+            return message
+
+
+def measure_once(prewarm: bool, extra_env: List[str]) -> Dict[str, float]:
+    """启动一次服务，记录 initialize、tools/list 响应时间与退出耗时（毫秒）"""
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "mcp_server_better_prompts"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=_server_env(workdir, prewarm, extra_env),
+        cwd=workdir,
+    )
+    try:
+        _send(proc, {
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2025-06-18",
+                "capabilities": {},
+                "clientInfo": {"name": "startup-benchmark", "version": "1.0"},
+            },
+        })
+        _read_response(proc, 1)
+        initialize_ms = (time.perf_counter() - started) * 1000
+        _send(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        _send(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        _read_response(proc, 2)
+        list_tools_ms = (time.perf_counter() - started) * 1000
+
+        # 关闭标准输入即结束会话，统计优雅退出耗时
+        closing = time.perf_counter()
+        proc.stdin.close()
+        proc.wait(timeout=30)
+        shutdown_ms = (time.perf_counter() - closing) * 1000
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+    return {
+        "initialize_ms": round(initialize_ms, 2),
+        "list_tools_ms": round(list_tools_ms, 2),
+        "shutdown_ms": round(shutdown_ms, 2),
+    }
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    return {
+        "min": values[0],
+        "median": round(statistics.median(values), 2),
+        "mean": round(statistics.fmean(values), 2),
+        "max": values[-1],
+    }
+
+
+def import_breakdown(top: int) -> Dict[str, Any]:
+    """用 python -X importtime 统计导入服务模块的总耗时，并按顶层包汇总自身耗时"""
+    env = {**os.environ, "PYTHONPATH": _server_env("", False, [])["PYTHONPATH"]}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {SERVER_MODULE}"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    by_package: Dict[str, float] = {}
+    total_us: Optional[int] = None
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name.strip()
+        package = name.split(".")[0]
+        by_package[package] = by_package.get(package, 0.0) + int(self_us)
+        if name == SERVER_MODULE:
+            total_us = int(cumulative_us)
+    ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    return {
+        "total_ms": round(total_us / 1000, 2) if total_us is not None else None,
+        "packages_ms": {package: round(us / 1000, 2) for package, us in ranked[:top]},
+        # 这些依赖应在首次使用或后台预热时才加载
+        "deferred_loaded": [
+            module for module in ("numpy", "markdownify", "readabilipy", "bs4", "pymilvus", "tiktoken")
+            if module in by_package
+        ],
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Better Prompts MCP 冷启动基准测试")
+    parser.add_argument("--runs", type=int, default=10, help="启动次数")
+    parser.add_argument("--no-prewarm", action="store_true", help="关闭握手后的后台预热 (PREWARM=false)")
+    parser.add_argument("--target-ms", type=float, default=1000.0, help="initialize 响应中位数目标")
+    parser.add_argument("--top", type=int, default=15, help="导入耗时分布中列出的包数量")
+    parser.add_argument("--env", action="append", default=[], help="传给 MCP 服务的额外环境变量 NAME=VALUE")
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.runs):
+        run = measure_once(not args.no_prewarm, args.env)
+        runs.append(run)
+        print(json.dumps(run), file=sys.stderr)
+
+    initialize = _summary([run["initialize_ms"] for run in runs])
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "prewarm": not args.no_prewarm,
+        "runs": args.runs,
+        "initialize_ms": initialize,
+        "list_tools_ms": _summary([run["list_tools_ms"] for run in runs]),
+        "shutdown_ms": _summary([run["shutdown_ms"] for run in runs]),
+        "target_ms": args.target_ms,
+        "within_target": initialize["median"] <= args.target_ms,
+        "imports": import_breakdown(args.top),
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
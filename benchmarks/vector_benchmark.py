@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+NumPy 向量存储基准测试：检索延迟与近似检索（IVF / 量化粗筛）相对暴力检索的 recall@k
+
+两种用法：
+- 合成数据：在临时目录中写入 --rows 条随机或聚类分布的向量，分别统计暴力检索与指定配置的延迟和召回率
+- 已有存储：--store 指向 NUMPY_STORE_PATH，以已存向量为查询检查召回率，--rebuild 先按全部数据重新训练 IVF
+
+用法：
+    python benchmarks/vector_benchmark.py --rows 100000 --index ivf --quantization int8
+    python benchmarks/vector_benchmark.py --store numpy_store --index ivf --nprobe 8,16,32 --rebuild
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+from mcp_server_better_prompts.vector_store import NumpyVectorStore  # noqa: E402
+
+
+def synthetic_vectors(rows: int, dimension: int, distribution: str, noise: float, seed: int = 0) -> np.ndarray:
+    """random: 各向同性高斯（IVF 的最差情况）；clustered: 按主题聚集，近似真实嵌入的分布"""
+    rng = np.random.default_rng(seed)
+    if distribution == "random":
+        return rng.standard_normal((rows, dimension), dtype=np.float32)
+    topics = rng.standard_normal((max(16, rows // 50), dimension), dtype=np.float32)
+    labels = rng.integers(0, len(topics), rows)
+    return topics[labels] + noise * rng.standard_normal((rows, dimension), dtype=np.float32)
+
+
+def time_search(store: NumpyVectorStore, queries: np.ndarray, top_k: int, **kwargs: Any) -> float:
+    """逐条检索的平均延迟（毫秒）"""
+    started = time.perf_counter()
+    for query in queries:
+        store.search(query[None, :], top_k, **kwargs)
+    return round((time.perf_counter() - started) / len(queries) * 1000, 3)
+
+
+def evaluate(
+    store: NumpyVectorStore, args: argparse.Namespace, nprobes: List[Optional[int]]
+) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(1)
+    count = len(store)
+    queries = store.vectors(np.sort(rng.choice(count, min(args.queries, count), replace=False)))
+    results = [{"mode": "exact", "ms_per_query": time_search(store, queries, args.top_k, exact=True)}]
+    for nprobe in nprobes:
+        results.append({
+            "mode": "approximate",
+            "nprobe": nprobe,
+            "ms_per_query": time_search(store, queries, args.top_k, nprobe=nprobe),
+            f"recall@{args.top_k}": round(store.check_recall(args.queries, args.top_k, nprobe), 4),
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NumPy 向量存储检索延迟与召回率")
+    parser.add_argument("--store", help="已有的向量存储目录 (NUMPY_STORE_PATH)，不指定时使用合成数据")
+    parser.add_argument("--rebuild", action="store_true", help="检查前按全部数据重新训练 IVF 索引")
+    parser.add_argument("--rows", type=int, default=50000, help="合成数据条数")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--distribution", choices=["clustered", "random"], default="clustered")
+    parser.add_argument("--noise", type=float, default=1.5, help="clustered 分布中噪声相对主题向量的强度")
+    parser.add_argument("--index", choices=["flat", "ivf"], default="ivf")
+    parser.add_argument("--quantization", choices=["none", "int8", "binary"], help="默认沿用存储中的设置")
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", default="", help="逗号分隔的 nprobe 列表，默认使用索引校准后的值")
+    parser.add_argument("--ivf-min-rows", type=int, default=1000)
+    parser.add_argument("--target-recall", type=float, default=0.9)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200, help="用作查询的已存向量数")
+    parser.add_argument("--min-recall", type=float, default=0.0, help="召回率低于该值时以非零状态退出")
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    args = parser.parse_args()
+
+    options = dict(
+        dimension=args.dimension,
+        index=args.index,
+        nlist=args.nlist,
+        ivf_min_rows=args.ivf_min_rows,
+        ivf_target_recall=args.target_recall,
+        quantization=args.quantization,
+    )
+    workdir = None
+    started = time.perf_counter()
+    if args.store:
+        store = NumpyVectorStore(args.store, **options)
+    else:
+        workdir = tempfile.mkdtemp(prefix="bench-vectors-")
+        store = NumpyVectorStore(workdir, **options)
+        vectors = synthetic_vectors(args.rows, args.dimension, args.distribution, args.noise)
+        for start in range(0, args.rows, 4096):
+            batch = vectors[start:start + 4096]
+            store.add(batch, [{"title": str(start + i), "content": ""} for i in range(len(batch))])
+        store.compact()
+    if args.rebuild:
+        store.rebuild_index()
+    build_seconds = round(time.perf_counter() - started, 2)
+
+    try:
+        nprobes: List[Optional[int]] = [int(n) for n in args.nprobe.split(",") if n.strip()] or [None]
+        results = evaluate(store, args, nprobes)
+        report = {
+            "store": args.store or f"synthetic ({args.distribution}, {args.rows}x{args.dimension})",
+            "build_seconds": build_seconds,
+            "index": store.index_info(),
+            "results": results,
+        }
+        text = json.dumps(report, ensure_ascii=False, indent=2)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+        else:
+            print(text)
+        worst = min(result.get(f"recall@{args.top_k}", 1.0) for result in results)
+        if worst < args.min_recall:
+            sys.exit(f"召回率 {worst} 低于 --min-recall {args.min_recall}")
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
 """Better Prompts MCP Server - 用于萃取方法论和构建增强提示的 MCP 服务"""
 
-from .server import main
-
 __all__ = ["main"]
+
+
+def __getattr__(name: str):
+    # 延迟导入服务模块：正文提取工作进程 (python -m mcp_server_better_prompts.html_extract) 无需加载 MCP 依赖
+    if name == "main":
+        from .server import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,98 @@
+"""长文档切块与方法论结果合并"""
+
+import json
+import re
+from typing import Any, Dict, List
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符按 1 个，其余按 4 个字符 1 个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_sections(content: str) -> List[str]:
+    """按 Markdown 标题切分章节"""
+    starts = [m.start() for m in _HEADING.finditer(content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    starts.append(len(content))
+    return [content[a:b] for a, b in zip(starts, starts[1:]) if content[a:b].strip()]
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """按段落切分超长章节，单个超长段落再按字符硬切"""
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        if not paragraph.strip():
+            continue
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        # 保守按每字符 1 token 硬切
+        for start in range(0, len(paragraph), max_tokens):
+            pieces.append(paragraph[start:start + max_tokens])
+    return pieces
+
+
+def split_content(content: str, max_tokens: int) -> List[str]:
+    """将内容按标题/段落切分为不超过 max_tokens 的块，尽量把相邻片段合并"""
+    pieces: List[str] = []
+    for section in _split_sections(content):
+        if estimate_tokens(section) <= max_tokens:
+            pieces.append(section)
+        else:
+            pieces.extend(_split_oversized(section, max_tokens))
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece in pieces:
+        piece = piece.strip("\n")
+        tokens = estimate_tokens(piece)
+        # 合并时的段落分隔符按 1 个 token 计
+        if current and current_tokens + 1 + tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current_tokens += tokens + (1 if current else 0)
+        current.append(piece)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def parse_methodology_json(text: str) -> List[Dict[str, Any]]:
+    """解析大模型输出的方法论 JSON 数组，无法解析时返回空列表"""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+    return [item for item in data if isinstance(item, dict)]
+
+
+def _normalize_title(title: str) -> str:
+    return re.sub(r"[\s\W_]+", "", title).lower()
+
+
+def merge_methodologies(groups: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """合并各块的萃取结果，同名或内容相同的方法论只保留内容最完整的一条"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    seen_content: Dict[str, str] = {}
+    for items in groups:
+        for item in items:
+            content = item.get("methodology", "").strip()
+            if not content:
+                continue
+            key = _normalize_title(item.get("title", "")) or content
+            existing_key = seen_content.get(content, key)
+            existing = merged.get(existing_key)
+            if existing is None or len(content) > len(existing.get("methodology", "")):
+                merged[existing_key] = item
+            seen_content[content] = existing_key
+    return list(merged.values())
@@ -0,0 +1,99 @@
+"""入库去重：精确内容哈希 + SimHash 近似重复预筛"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .lexical_index import tokenize
+
+# 64 位 SimHash 分为 4 段，汉明距离 <= 3 的两个指纹至少有一段完全相同
+_BANDS = 4
+_BAND_BITS = 64 // _BANDS
+
+
+def content_hash(text: str) -> str:
+    """忽略空白差异的内容哈希"""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def simhash(text: str) -> int:
+    """基于分词结果的 64 位 SimHash"""
+    weights = [0] * 64
+    for token in tokenize(text):
+        value = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit in range(64) if weights[bit] > 0)
+
+
+def _bands(fingerprint: int) -> List[Tuple[int, int]]:
+    mask = (1 << _BAND_BITS) - 1
+    return [(band, fingerprint >> (band * _BAND_BITS) & mask) for band in range(_BANDS)]
+
+
+class DedupIndex:
+    """已入库内容的哈希与 SimHash 指纹，追加写 JSONL 持久化"""
+
+    def __init__(self, path: str, max_distance: int = 3):
+        self.path = path
+        self.max_distance = min(max_distance, _BANDS - 1)
+        self._hashes: Dict[str, Any] = {}
+        self._fingerprints: Dict[Any, int] = {}
+        self._buckets: Dict[Tuple[int, int], List[Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    self._index(record["id"], record["hash"], record["simhash"])
+
+    def __len__(self) -> int:
+        return len(self._fingerprints)
+
+    def __contains__(self, doc_id: Any) -> bool:
+        return doc_id in self._fingerprints
+
+    def _index(self, doc_id: Any, digest: str, fingerprint: int) -> None:
+        self._hashes.setdefault(digest, doc_id)
+        self._fingerprints[doc_id] = fingerprint
+        for band in _bands(fingerprint):
+            self._buckets.setdefault(band, []).append(doc_id)
+
+    def find_exact(self, text: str) -> Optional[Any]:
+        """内容完全相同的已有条目ID"""
+        return self._hashes.get(content_hash(text))
+
+    def find_near(self, text: str) -> Optional[Any]:
+        """SimHash 汉明距离不超过 max_distance 的已有条目ID"""
+        fingerprint = simhash(text)
+        with self._lock:
+            for band in _bands(fingerprint):
+                for doc_id in self._buckets.get(band, ()):
+                    if bin(self._fingerprints[doc_id] ^ fingerprint).count("1") <= self.max_distance:
+                        return doc_id
+        return None
+
+    def add(self, documents: Iterable[Tuple[Any, str]]) -> None:
+        """记录 (ID, 内容) 并追加写入磁盘"""
+        records = []
+        with self._lock:
+            for doc_id, text in documents:
+                if doc_id in self._fingerprints:
+                    continue
+                record = {"id": doc_id, "hash": content_hash(text), "simhash": simhash(text)}
+                self._index(doc_id, record["hash"], record["simhash"])
+                records.append(record)
+            if records:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record) + "\n")
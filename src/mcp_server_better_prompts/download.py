@@ -0,0 +1,134 @@
+"""流式、限长的网页下载"""
+
+import asyncio
+import codecs
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+from mcp.shared.exceptions import McpError
+from mcp.types import ErrorData, INTERNAL_ERROR
+
+# 明确无法作为文本处理的内容类型，读取正文前直接拒绝
+_BINARY_CONTENT_TYPES = (
+    "image/", "audio/", "video/", "font/",
+    "application/octet-stream", "application/zip", "application/pdf",
+)
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+@dataclass
+class DownloadLimits:
+    """下载限制"""
+    max_bytes: int = 5 * 1024 * 1024
+    # 超出 max_bytes 时: truncate 截断 / reject 拒绝
+    oversize: str = "truncate"
+    connect_timeout: float = 10
+    read_timeout: float = 30
+    total_timeout: float = 120
+
+    @classmethod
+    def from_env(cls) -> "DownloadLimits":
+        return cls(
+            max_bytes=int(os.getenv("FETCH_MAX_BYTES", str(5 * 1024 * 1024))),
+            oversize=os.getenv("FETCH_OVERSIZE", "truncate").lower(),
+            connect_timeout=float(os.getenv("FETCH_CONNECT_TIMEOUT", "10")),
+            read_timeout=float(os.getenv("FETCH_READ_TIMEOUT", "30")),
+            total_timeout=float(os.getenv("FETCH_TOTAL_TIMEOUT", "120")),
+        )
+
+
+@dataclass
+class DownloadResult:
+    """下载结果；304 或错误状态码时 text 为 None"""
+    status_code: int
+    headers: Dict[str, str]
+    text: Optional[str] = None
+    is_html: bool = False
+    truncated: bool = False
+
+
+def _fetch_error(url: str, message: str) -> McpError:
+    return McpError(ErrorData(code=INTERNAL_ERROR, message=f"获取URL失败 {url}: {message}"))
+
+
+def _make_decoder(encoding: Optional[str]) -> codecs.IncrementalDecoder:
+    try:
+        return codecs.getincrementaldecoder(encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+async def _stream(
+    client: httpx.AsyncClient, url: str, headers: Dict[str, str], limits: DownloadLimits
+) -> DownloadResult:
+    timeout = httpx.Timeout(limits.read_timeout, connect=limits.connect_timeout)
+    async with client.stream(
+        "GET", url, follow_redirects=True, headers=headers, timeout=timeout
+    ) as response:
+        result = DownloadResult(response.status_code, dict(response.headers))
+        if response.status_code == 304 or response.status_code >= 400:
+            return result
+
+        content_type = response.headers.get("content-type", "").lower()
+        if content_type.startswith(_BINARY_CONTENT_TYPES):
+            raise _fetch_error(url, f"不支持的内容类型 {content_type}")
+
+        declared = response.headers.get("content-length")
+        if (
+            limits.oversize == "reject"
+            and declared
+            and declared.isdigit()
+            and int(declared) > limits.max_bytes
+        ):
+            raise _fetch_error(url, f"内容大小 {declared} 字节超过上限 {limits.max_bytes}")
+
+        decoder = None
+        parts = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            if decoder is None:
+                # 首个数据块：嗅探内容类型和字符集
+                head = chunk[:1024]
+                if b"\x00" in head:
+                    raise _fetch_error(url, "内容为二进制数据")
+                result.is_html = (
+                    "text/html" in content_type
+                    or not content_type
+                    or b"<html" in head[:100].lower()
+                )
+                encoding = response.charset_encoding
+                if encoding is None and result.is_html:
+                    match = _META_CHARSET.search(head)
+                    encoding = match.group(1).decode("ascii") if match else None
+                decoder = _make_decoder(encoding)
+
+            if received + len(chunk) > limits.max_bytes:
+                if limits.oversize == "reject":
+                    raise _fetch_error(url, f"内容超过上限 {limits.max_bytes} 字节")
+                parts.append(decoder.decode(chunk[:limits.max_bytes - received]))
+                result.truncated = True
+                break
+            received += len(chunk)
+            parts.append(decoder.decode(chunk))
+
+        if decoder is not None:
+            parts.append(decoder.decode(b"", final=True))
+        result.text = "".join(parts)
+        return result
+
+
+async def download_page(
+    client: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+    limits: Optional[DownloadLimits] = None,
+) -> DownloadResult:
+    """流式下载页面，超过字节上限时截断或拒绝，并受连接/读取/总时长限制"""
+    limits = limits or DownloadLimits.from_env()
+    try:
+        return await asyncio.wait_for(_stream(client, url, headers, limits), limits.total_timeout)
+    except asyncio.TimeoutError:
+        raise _fetch_error(url, f"下载超过 {limits.total_timeout} 秒")
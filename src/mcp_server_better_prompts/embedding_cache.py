@@ -0,0 +1,149 @@
+"""按内容寻址的嵌入向量缓存（内存 LRU + SQLite 持久化）"""
+
+import hashlib
+import os
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .executor import run_blocking
+
+# 向量编码格式: float32 (4 字节/维) 或 float16 (2 字节/维)
+_DTYPE_CODES = {"float32": "f", "float16": "e"}
+
+
+def _cache_key(model: str, text: str) -> str:
+    """模型名 + 文本内容的哈希"""
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """嵌入向量缓存，先查内存 LRU，再查磁盘
+
+    内存中保存与磁盘相同的编码字节（768 维 float32 约 3KB），返回时再解码，两级缓存返回的值一致。
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", max_memory_items: int = 10000):
+        if dtype not in _DTYPE_CODES:
+            raise ValueError(f"不支持的缓存精度: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.max_memory_items = max_memory_items
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # key -> (编码格式, 编码后的向量)
+        self._memory: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, dtype TEXT NOT NULL, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["EmbeddingCache"]:
+        """根据环境变量创建缓存，EMBEDDING_CACHE=false 时返回 None"""
+        if os.getenv("EMBEDDING_CACHE", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            path=os.getenv("EMBEDDING_CACHE_PATH", "embedding_cache.db"),
+            dtype=os.getenv("EMBEDDING_CACHE_DTYPE", "float32").lower(),
+            max_memory_items=int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000")),
+        )
+
+    def _encode(self, vector: Sequence[float]) -> bytes:
+        return struct.pack(f"<{len(vector)}{_DTYPE_CODES[self.dtype]}", *vector)
+
+    @staticmethod
+    def _decode(blob: bytes, dtype: str) -> List[float]:
+        code = _DTYPE_CODES[dtype]
+        count = len(blob) // struct.calcsize(code)
+        return list(struct.unpack(f"<{count}{code}", blob))
+
+    def _remember(self, key: str, entry: Tuple[str, bytes]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _load_from_disk(self, keys: List[str]) -> Dict[str, Tuple[str, bytes]]:
+        found: Dict[str, Tuple[str, bytes]] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, dtype, vector FROM embeddings WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, dtype, blob in rows:
+                    found[key] = (dtype, blob)
+        return found
+
+    def _save_to_disk(self, rows: List[Tuple[str, str, str, bytes]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dtype, vector) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    async def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """批量查询缓存，未命中的位置返回 None"""
+        keys = [_cache_key(model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        pending: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                results[i] = self._decode(entry[1], entry[0])
+            else:
+                pending.setdefault(key, []).append(i)
+
+        if pending:
+            found = await run_blocking(self._load_from_disk, list(pending))
+            for key, positions in pending.items():
+                entry = found.get(key)
+                if entry is None:
+                    self.misses += len(positions)
+                    continue
+                self.disk_hits += len(positions)
+                self._remember(key, entry)
+                vector = self._decode(entry[1], entry[0])
+                for i in positions:
+                    results[i] = list(vector)
+        return results
+
+    async def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[List[float]]) -> List[List[float]]:
+        """写入缓存（内存与磁盘），返回按缓存精度编码再解码后的向量，与之后命中缓存时的值一致"""
+        rows = []
+        stored = []
+        for text, vector in zip(texts, vectors):
+            key = _cache_key(model, text)
+            blob = self._encode(vector)
+            self._remember(key, (self.dtype, blob))
+            rows.append((key, model, self.dtype, blob))
+            stored.append(self._decode(blob, self.dtype))
+        if rows:
+            await run_blocking(self._save_to_disk, rows)
+        return stored
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中计数"""
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "memory_items": len(self._memory),
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,94 @@
+"""阻塞调用的线程池卸载与事件循环延迟监控"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取有界线程池（BLOCKING_MAX_WORKERS，默认 4）"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("BLOCKING_MAX_WORKERS", "4")),
+            thread_name_prefix="better-prompts-blocking",
+        )
+    return _executor
+
+
+async def run_blocking(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在线程池中执行同步函数，避免阻塞事件循环"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(func, *args, **kwargs)
+    )
+
+
+def shutdown_executor() -> None:
+    """关闭线程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class LoopLagMonitor:
+    """周期性测量事件循环的调度延迟，超过阈值时输出警告"""
+
+    def __init__(self, interval: float = 0.5, warn_threshold: float = 0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["LoopLagMonitor"]:
+        """根据 LOOP_LAG_MONITOR 环境变量创建监控器，未启用时返回 None"""
+        if os.getenv("LOOP_LAG_MONITOR", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            interval=float(os.getenv("LOOP_LAG_INTERVAL", "0.5")),
+            warn_threshold=float(os.getenv("LOOP_LAG_WARN_MS", "100")) / 1000,
+        )
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - start - self.interval
+            self.last_lag = max(lag, 0.0)
+            self.max_lag = max(self.max_lag, self.last_lag)
+            self.samples += 1
+            if self.last_lag > self.warn_threshold:
+                logger.warning("事件循环阻塞 %.1f ms", self.last_lag * 1000)
+
+    def start(self) -> None:
+        """启动后台监控任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台监控任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info(
+                "事件循环延迟统计: 采样 %d 次, 最大 %.1f ms",
+                self.samples, self.max_lag * 1000,
+            )
@@ -0,0 +1,184 @@
+"""正文提取进程池：常驻工作进程并行执行 readabilipy/markdownify，按文档超时终止卡住的进程
+
+每个工作进程由一个调度协程负责，调度协程从有界队列中取文档，经标准输入输出与工作进程通信。
+首次提交时才启动第一个工作进程，之后仅在有文档排队且没有空闲进程时增加，最多 workers 个；
+队列已满时提交方等待（背压）；单个文档超时后整个进程组（含 readabilipy 启动的 node 子进程）被终止，
+下一个文档到来时重新启动工作进程。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+from typing import List, Optional, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+WORKER_MODULE = "mcp_server_better_prompts.html_extract"
+
+# 单行协议消息的上限（HTML/Markdown 以 JSON 字符串传输）
+_LINE_LIMIT = 64 * 1024 * 1024
+_STARTUP_TIMEOUT = 60.0
+_STOP_TIMEOUT = 2.0
+
+
+class _Worker:
+    def __init__(self, process: asyncio.subprocess.Process):
+        self.process = process
+        self.tasks = 0
+
+
+class ExtractPool:
+    """按需增长、最多 workers 个的常驻正文提取进程，提交的文档经有界队列分发"""
+
+    def __init__(self, workers: int, queue_size: int = 64, timeout: float = 30.0, max_tasks: int = 200):
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_tasks = max_tasks
+        self._queue: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue(max(1, queue_size))
+        self._tasks: List[asyncio.Task] = []
+        # 正在等待文档的调度协程数
+        self._idle = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ExtractPool"]:
+        """根据环境变量创建进程池，EXTRACT_WORKERS=0 时返回 None（在线程池中提取）"""
+        workers = int(os.getenv("EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+        if workers <= 0:
+            return None
+        return cls(
+            workers,
+            queue_size=int(os.getenv("EXTRACT_QUEUE_SIZE", "64")),
+            timeout=float(os.getenv("EXTRACT_TIMEOUT", "30")),
+            max_tasks=int(os.getenv("EXTRACT_WORKER_MAX_TASKS", "200")),
+        )
+
+    def _grow(self) -> None:
+        """排队的文档多于空闲进程且未达上限时，增加一个调度协程（及其工作进程）"""
+        if len(self._tasks) < self.workers and self._queue.qsize() > self._idle:
+            self._tasks.append(asyncio.create_task(self._dispatch()))
+
+    async def extract(self, html: str) -> str:
+        """提交文档并等待结果，队列已满时等待空位"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((html, future))
+        self._grow()
+        return await future
+
+    async def close(self) -> None:
+        """停止调度协程与工作进程，队列中未处理的文档返回错误"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_result("<error>服务正在关闭，正文提取已取消</error>")
+
+    async def _spawn(self) -> _Worker:
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = {
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join(filter(None, [package_root, os.environ.get("PYTHONPATH")])),
+        }
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", WORKER_MODULE,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env=env,
+            limit=_LINE_LIMIT,
+            # 独立进程组，超时时连同 node 子进程一起终止
+            start_new_session=os.name == "posix",
+        )
+        worker = _Worker(process)
+        try:
+            ready = await asyncio.wait_for(process.stdout.readline(), _STARTUP_TIMEOUT)
+        except BaseException:
+            await self._kill(worker)
+            raise
+        if not ready:
+            await self._kill(worker)
+            raise EOFError(f"正文提取进程启动失败 (exit={process.returncode})")
+        return worker
+
+    async def _call(self, worker: _Worker, html: str) -> str:
+        worker.process.stdin.write((json.dumps(html, ensure_ascii=False) + "\n").encode("utf-8"))
+        await worker.process.stdin.drain()
+        line = await worker.process.stdout.readline()
+        if not line:
+            raise EOFError(f"正文提取进程意外退出 (exit={worker.process.returncode})")
+        return json.loads(line)
+
+    @staticmethod
+    async def _kill(worker: _Worker) -> None:
+        process = worker.process
+        if process.returncode is None:
+            try:
+                if os.name == "posix":
+                    os.killpg(process.pid, signal.SIGKILL)
+                else:
+                    process.kill()
+            except ProcessLookupError:
+                pass
+        await process.wait()
+
+    async def _stop(self, worker: _Worker) -> None:
+        """关闭标准输入让工作进程自行退出，超时则强制终止"""
+        try:
+            worker.process.stdin.close()
+            await asyncio.wait_for(worker.process.wait(), _STOP_TIMEOUT)
+        except (asyncio.TimeoutError, OSError):
+            await self._kill(worker)
+
+    async def _dispatch(self) -> None:
+        worker: Optional[_Worker] = None
+        future: Optional[asyncio.Future] = None
+        try:
+            try:
+                worker = await self._spawn()
+            except (OSError, EOFError, asyncio.TimeoutError) as e:
+                logger.warning("正文提取进程启动失败，将在下次提交时重试: %s", e)
+            while True:
+                self._idle += 1
+                try:
+                    html, future = await self._queue.get()
+                finally:
+                    self._idle -= 1
+                if future.done():
+                    # 提交方已取消
+                    continue
+                try:
+                    if worker is None:
+                        worker = await self._spawn()
+                        metrics.incr("html_extract_worker_restarts")
+                    result = await asyncio.wait_for(self._call(worker, html), self.timeout)
+                except asyncio.TimeoutError:
+                    metrics.incr("html_extract_timeouts")
+                    if worker is not None:
+                        logger.warning("正文提取超过 %gs，终止工作进程 %d", self.timeout, worker.process.pid)
+                        await self._kill(worker)
+                        worker = None
+                    result = f"<error>正文提取超时（超过{self.timeout:g}秒）</error>"
+                except (OSError, EOFError, ValueError) as e:
+                    if worker is not None:
+                        await self._kill(worker)
+                        worker = None
+                    result = f"<error>正文提取进程异常: {str(e)}</error>"
+                else:
+                    worker.tasks += 1
+                    if self.max_tasks and worker.tasks >= self.max_tasks:
+                        # 定期替换工作进程，避免长期运行的内存增长
+                        await self._stop(worker)
+                        worker = None
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            if future is not None and not future.done():
+                future.set_result("<error>服务正在关闭，正文提取已取消</error>")
+            if worker is not None:
+                await self._stop(worker)
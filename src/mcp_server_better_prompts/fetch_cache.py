@@ -0,0 +1,146 @@
+"""网页抓取结果的磁盘缓存，支持 ETag/Last-Modified 条件请求"""
+
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .executor import run_blocking
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """规范化URL：小写协议和主机、去掉默认端口和片段、排序查询参数"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+@dataclass
+class FetchCacheEntry:
+    """缓存的抓取结果"""
+    content: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def is_fresh(self, max_age: float) -> bool:
+        return time.time() - self.fetched_at < max_age
+
+    def validators(self) -> Dict[str, str]:
+        """条件请求头"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class FetchCache:
+    """以规范化URL为键的抓取缓存，超过字节预算时按最近访问时间淘汰"""
+
+    def __init__(self, path: str, max_age: float = 86400, max_bytes: int = 200 * 1024 * 1024):
+        self.path = path
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, content TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+            "fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["FetchCache"]:
+        """根据环境变量创建缓存，FETCH_CACHE=false 时返回 None"""
+        if os.getenv("FETCH_CACHE", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            path=os.getenv("FETCH_CACHE_PATH", "fetch_cache.db"),
+            max_age=float(os.getenv("FETCH_CACHE_MAX_AGE", "86400")),
+            max_bytes=int(os.getenv("FETCH_CACHE_MAX_BYTES", str(200 * 1024 * 1024))),
+        )
+
+    def _get(self, url: str) -> Optional[FetchCacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, etag, last_modified, fetched_at FROM pages WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url)
+            )
+            self._conn.commit()
+            return FetchCacheEntry(*row)
+
+    def _put(self, url: str, content: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        now = time.time()
+        size = len(content.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, content, etag, last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, content, etag, last_modified, now, now, size),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _touch(self, url: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url)
+            )
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """超出字节预算时删除最久未访问的页面（调用方持有锁）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT url, size FROM pages ORDER BY accessed_at").fetchall()
+        for url, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total -= size
+
+    async def get(self, url: str) -> Optional[FetchCacheEntry]:
+        """查询缓存"""
+        return await run_blocking(self._get, normalize_url(url))
+
+    async def put(self, url: str, content: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """写入缓存"""
+        await run_blocking(self._put, normalize_url(url), content, etag, last_modified)
+
+    async def touch(self, url: str) -> None:
+        """304 重新验证成功后刷新抓取时间"""
+        await run_blocking(self._touch, normalize_url(url))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,48 @@
+"""按主机限制网页抓取：每个主机的并发连接上限与相邻请求的最小间隔"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+from urllib.parse import urlsplit
+
+
+class _HostState:
+    def __init__(self, max_connections: int):
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+
+class HostLimiter:
+    """同一主机最多 max_connections 个并发请求，相邻请求开始时间至少间隔 delay 秒"""
+
+    def __init__(self, max_connections: int = 2, delay: float = 1.0):
+        self.max_connections = max(1, max_connections)
+        self.delay = delay
+        self._hosts: Dict[str, _HostState] = {}
+
+    @classmethod
+    def from_env(cls) -> "HostLimiter":
+        return cls(
+            max_connections=int(os.getenv("FETCH_PER_HOST_CONNECTIONS", "2")),
+            delay=float(os.getenv("FETCH_PER_HOST_DELAY", "1.0")),
+        )
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """占用目标主机的一个请求名额"""
+        host = (urlsplit(url).hostname or "").lower()
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.max_connections)
+        async with state.semaphore:
+            if self.delay > 0:
+                async with state.lock:
+                    now = time.monotonic()
+                    wait = state.next_start - now
+                    state.next_start = max(now, state.next_start) + self.delay
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            yield
@@ -0,0 +1,56 @@
+"""网页正文提取（readabilipy + markdownify），也可作为正文提取进程池的工作进程运行
+
+工作进程协议：标准输入每行一个 JSON 字符串（HTML），标准输出每行一个 JSON 字符串（Markdown 或 <error> 文本）。
+"""
+
+import functools
+import json
+import os
+import sys
+
+
+def extract_content_from_html(html: str) -> str:
+    """从HTML中提取内容并转换为Markdown格式"""
+    # 正文提取依赖较重，首次使用时才导入（或由启动后的后台预热提前导入）
+    import markdownify
+    import readabilipy.simple_json
+
+    try:
+        ret = readabilipy.simple_json.simple_json_from_html_string(
+            html, use_readability=True
+        )
+        if not ret["content"]:
+            return "<error>页面内容提取失败</error>"
+        content = markdownify.markdownify(
+            ret["content"],
+            heading_style=markdownify.ATX,
+        )
+        return content
+    except Exception as e:
+        return f"<error>HTML处理失败: {str(e)}</error>"
+
+
+def _worker_main() -> None:
+    """工作进程主循环：常驻并复用已导入的依赖，逐条处理标准输入中的文档"""
+    # 协议独占原标准输出，其余输出（包括子进程）重定向到标准错误
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    import markdownify  # noqa: F401
+    import readabilipy.simple_json
+
+    # readabilipy 每次提取都会启动 node -v 检查环境，工作进程内只检查一次
+    readabilipy.simple_json.have_node = functools.lru_cache(maxsize=None)(readabilipy.simple_json.have_node)
+
+    # 依赖导入完成后通知进程池可以接收文档
+    protocol.write(json.dumps("ready") + "\n")
+    protocol.flush()
+
+    for line in sys.stdin.buffer:
+        result = extract_content_from_html(json.loads(line))
+        protocol.write(json.dumps(result, ensure_ascii=False) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    _worker_main()
@@ -0,0 +1,96 @@
+"""服务生命周期内共享的 HTTP 连接池"""
+
+import os
+import threading
+from typing import Dict, Optional
+
+import httpx
+
+# 按上游划分的客户端名称
+LLM = "llm"
+EMBEDDING = "embedding"
+DIFY = "dify"
+FETCH = "fetch"
+
+
+def _env_int(name: str, upstream: str, default: int) -> int:
+    """读取整数配置，优先使用上游专属的 HTTP_<UPSTREAM>_<NAME>"""
+    value = os.getenv(f"HTTP_{upstream.upper()}_{name}") or os.getenv(f"HTTP_{name}")
+    return int(value) if value else default
+
+
+def _env_float(name: str, upstream: str, default: float) -> float:
+    """读取浮点配置，优先使用上游专属的 HTTP_<UPSTREAM>_<NAME>"""
+    value = os.getenv(f"HTTP_{upstream.upper()}_{name}") or os.getenv(f"HTTP_{name}")
+    return float(value) if value else default
+
+
+def _http2_enabled() -> bool:
+    """是否启用 HTTP/2（需要安装 h2）"""
+    if os.getenv("HTTP_HTTP2", "false").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpClientRegistry:
+    """按上游缓存 httpx.AsyncClient，复用 TCP/TLS 连接"""
+
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # 预热时在工作线程中创建客户端（加载 SSL 上下文），需与事件循环中的调用互斥
+        self._lock = threading.Lock()
+
+    def get(self, upstream: str) -> httpx.AsyncClient:
+        """获取（必要时创建）指定上游的客户端"""
+        client = self._clients.get(upstream)
+        if client is not None and not client.is_closed:
+            return client
+        with self._lock:
+            client = self._clients.get(upstream)
+            if client is not None and not client.is_closed:
+                return client
+            limits = httpx.Limits(
+                max_connections=_env_int("MAX_CONNECTIONS", upstream, 100),
+                max_keepalive_connections=_env_int("MAX_KEEPALIVE_CONNECTIONS", upstream, 20),
+                keepalive_expiry=_env_float("KEEPALIVE_EXPIRY", upstream, 30.0),
+            )
+            client = httpx.AsyncClient(limits=limits, http2=_http2_enabled())
+            self._clients[upstream] = client
+        return client
+
+    async def aclose(self) -> None:
+        """关闭全部客户端"""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            await client.aclose()
+
+
+_registry: Optional[HttpClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_http_client(upstream: str) -> httpx.AsyncClient:
+    """获取共享的 HTTP 客户端"""
+    global _registry
+    registry = _registry
+    if registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = HttpClientRegistry()
+            registry = _registry
+    return registry.get(upstream)
+
+
+async def close_http_clients() -> None:
+    """服务退出时关闭所有连接池"""
+    global _registry
+    with _registry_lock:
+        registry, _registry = _registry, None
+    if registry is not None:
+        await registry.aclose()
@@ -0,0 +1,145 @@
+"""MCP Streamable HTTP 传输：单个常驻进程同时服务多个客户端会话
+
+所有会话共用同一个 Server 实例，因此共享知识库、HTTP 连接池和各类缓存。
+流式响应与进度通知通过 SSE 推送（HTTP_JSON_RESPONSE=true 时改为普通 JSON 响应）。
+"""
+
+import contextlib
+import logging
+import os
+from typing import Any, AsyncContextManager, AsyncIterator, Callable
+
+import uvicorn
+from mcp.server import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+SESSION_HEADER = "mcp-session-id"
+
+
+class SessionLimiter:
+    """限制同时打开的会话数的 ASGI 应用，放在会话管理器之前
+
+    会话从 Server.run 开始到结束计为活跃；尚未建立会话的 POST 请求（不带会话ID，即 initialize）
+    在响应开始前也计入名额，避免并发握手越过上限。超出上限的新会话返回 503，已有会话不受影响。
+    """
+
+    def __init__(self, app: ASGIApp, max_sessions: int):
+        self.app = app
+        self.max_sessions = max_sessions
+        self.active = 0
+        self.opening = 0
+
+    def track(self, server: Server) -> None:
+        """包装 server.run，统计活跃会话数"""
+        run = server.run
+
+        async def tracked_run(*args: Any, **kwargs: Any) -> Any:
+            self.active += 1
+            try:
+                return await run(*args, **kwargs)
+            finally:
+                self.active -= 1
+
+        server.run = tracked_run  # type: ignore[method-assign]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        opening = (
+            self.max_sessions > 0
+            and scope["type"] == "http"
+            and scope["method"] == "POST"
+            and not any(name.decode().lower() == SESSION_HEADER for name, _ in scope["headers"])
+        )
+        if not opening:
+            await self.app(scope, receive, send)
+            return
+        if self.active + self.opening >= self.max_sessions:
+            logger.warning("会话数已达上限 %d，拒绝新会话", self.max_sessions)
+            response = JSONResponse(
+                {
+                    "jsonrpc": "2.0",
+                    "id": None,
+                    "error": {"code": -32000, "message": f"会话数已达上限 ({self.max_sessions})，请稍后重试"},
+                },
+                status_code=503,
+                headers={"Retry-After": "5"},
+            )
+            await response(scope, receive, send)
+            return
+        self.opening += 1
+        released = False
+
+        async def send_and_release(message: Message) -> None:
+            # 响应开始时会话已建立（Server.run 已计入 active）或已失败，释放握手名额
+            nonlocal released
+            if message["type"] == "http.response.start" and not released:
+                released = True
+                self.opening -= 1
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_release)
+        finally:
+            if not released:
+                self.opening -= 1
+
+
+async def serve_http(
+    server: Server,
+    lifecycle: Callable[[], AsyncContextManager[None]],
+) -> None:
+    """以 Streamable HTTP 方式运行服务，直到收到 SIGINT/SIGTERM
+
+    lifecycle 在应用启动时进入、关闭时退出，用于启动和释放共享资源；
+    关闭时先停止接受新连接并等待进行中的请求（最多 HTTP_SHUTDOWN_TIMEOUT 秒），再结束所有会话。
+    """
+    host = os.getenv("HTTP_HOST", "127.0.0.1")
+    port = int(os.getenv("HTTP_PORT", "8000"))
+    path = "/" + os.getenv("HTTP_PATH", "/mcp").strip("/")
+
+    # 客户端未关闭就离开的会话在空闲超时后由会话管理器结束，否则会一直占用 HTTP_MAX_SESSIONS 名额
+    idle_timeout = float(os.getenv("HTTP_SESSION_IDLE_TIMEOUT", "1800"))
+    session_manager = StreamableHTTPSessionManager(
+        app=server,
+        json_response=os.getenv("HTTP_JSON_RESPONSE", "false").lower() in ("1", "true", "yes"),
+        session_idle_timeout=idle_timeout if idle_timeout > 0 else None,
+    )
+    limiter = SessionLimiter(session_manager.handle_request, int(os.getenv("HTTP_MAX_SESSIONS", "64")))
+    limiter.track(server)
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({
+            "status": "ok",
+            "sessions": limiter.active,
+            "max_sessions": limiter.max_sessions,
+        })
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        async with lifecycle():
+            async with session_manager.run():
+                logger.info("MCP HTTP 服务已启动: http://%s:%d%s", host, port, path)
+                yield
+            logger.info("所有会话已结束，正在释放资源")
+
+    app = Starlette(
+        routes=[
+            Route("/healthz", health, methods=["GET"]),
+            Route(path, endpoint=limiter),
+        ],
+        lifespan=lifespan,
+    )
+    config = uvicorn.Config(
+        app,
+        host=host,
+        port=port,
+        timeout_graceful_shutdown=int(os.getenv("HTTP_SHUTDOWN_TIMEOUT", "30")),
+        log_level=os.getenv("HTTP_LOG_LEVEL", "info"),
+    )
+    await uvicorn.Server(config).serve()
@@ -0,0 +1,250 @@
+"""NumPy 向量存储的倒排文件 (IVF) 近似最近邻索引
+
+对归一化向量做球面 k-means 得到 nlist 个聚类中心，每条向量归入最近的中心。
+检索时只扫描与查询最相近的 nprobe 个聚类，nprobe 越大召回越高、延迟越大。
+未指定 nprobe 时，训练后以抽样的已存向量为查询，选取召回率达到目标值的最小 nprobe。
+"""
+
+import json
+import logging
+import os
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGNMENTS_FILE = "ivf_assignments.npy"
+META_FILE = "ivf.json"
+
+_BLOCK = 4096
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """分块计算每条向量最近的聚类中心"""
+    result = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _BLOCK):
+        block = np.asarray(vectors[start:start + _BLOCK], dtype=np.float32)
+        result[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return result
+
+
+def spherical_kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """球面 k-means，返回归一化的聚类中心"""
+    rng = np.random.default_rng(seed)
+    centroids = np.array(data[rng.choice(len(data), k, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignments = _assign(data, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        counts = np.bincount(assignments, minlength=k)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # 空聚类重新随机选取样本点
+            sums[empty] = data[rng.choice(len(data), len(empty), replace=False)]
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _exact_top_k(vectors: np.ndarray, queries: np.ndarray, top_k: int) -> np.ndarray:
+    """分块暴力检索，返回每个查询前 top_k 个行号（降序）"""
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(vectors), _BLOCK):
+        block = np.asarray(vectors[start:start + _BLOCK], dtype=np.float32)
+        scores = np.hstack([best_scores, queries @ block.T])
+        ids = np.hstack([best_ids, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))])
+        keep = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_ids = np.take_along_axis(ids, keep, axis=1)
+    return best_ids
+
+
+def sample_recall(
+    vectors: np.ndarray,
+    search: Callable[[np.ndarray, int], List[List[Tuple[int, float]]]],
+    top_k: int = 10,
+    sample_size: int = 200,
+    seed: int = 0,
+) -> float:
+    """以随机抽取的已存向量为查询（排除查询自身），计算 search 结果相对暴力检索的 recall@top_k"""
+    count = len(vectors)
+    if count <= 1:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    query_ids = np.sort(rng.choice(count, min(sample_size, count), replace=False))
+    queries = np.asarray(vectors[query_ids], dtype=np.float32)
+    exact = _exact_top_k(vectors, queries, top_k + 1)
+    approximate = search(queries, top_k + 1)
+    truth = [[(int(i), 0.0) for i in row if i != query_id][:top_k] for query_id, row in zip(query_ids, exact)]
+    found = [[hit for hit in hits if hit[0] != query_id][:top_k] for query_id, hits in zip(query_ids, approximate)]
+    return recall_at_k(truth, found)
+
+
+class IVFIndex:
+    """倒排文件索引，ID 为向量在存储中的行号
+
+    nprobe 为 0 时在训练后按 target_recall 自动校准；trained_rows 记录训练时的数据量，
+    供存储在数据量增长到一定倍数后重新训练。
+    """
+
+    def __init__(self, directory: str, nlist: int = 0, nprobe: int = 0, target_recall: float = 0.9):
+        self.directory = directory
+        self.nlist = nlist
+        self.auto_nprobe = nprobe <= 0
+        self.nprobe = nprobe if nprobe > 0 else 8
+        self.target_recall = target_recall
+        self.trained_rows = 0
+        self.calibrated_recall: Optional[float] = None
+        self.centroids: Optional[np.ndarray] = None
+        self._assignments = np.empty(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._assignments)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _rebuild_lists(self) -> None:
+        order = np.argsort(self._assignments, kind="stable").astype(np.int64)
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(self._assignments, minlength=len(self.centroids)))])
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+
+    def load(self) -> bool:
+        """从磁盘加载索引，不存在时返回 False"""
+        centroids_path = self._path(CENTROIDS_FILE)
+        if not os.path.exists(centroids_path):
+            return False
+        self.centroids = np.load(centroids_path)
+        assignments_path = self._path(ASSIGNMENTS_FILE)
+        if os.path.exists(assignments_path):
+            self._assignments = np.load(assignments_path).astype(np.int32)
+        meta_path = self._path(META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            self.trained_rows = meta.get("trained_rows", 0)
+            self.calibrated_recall = meta.get("recall")
+            if self.auto_nprobe:
+                self.nprobe = meta.get("nprobe", self.nprobe)
+        self._rebuild_lists()
+        return True
+
+    def save(self) -> None:
+        """原子写入聚类中心与归属"""
+        if self.centroids is None:
+            return
+        for name, array in ((CENTROIDS_FILE, self.centroids), (ASSIGNMENTS_FILE, self._assignments)):
+            path = self._path(name)
+            tmp_path = path + ".tmp.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, path)
+        meta_path = self._path(META_FILE)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"trained_rows": self.trained_rows, "nprobe": self.nprobe, "recall": self.calibrated_recall}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def train(self, vectors: np.ndarray, max_samples: int = 0) -> None:
+        """在全部（或采样的）向量上训练聚类中心，重新归属全部向量，并按需校准 nprobe"""
+        count = len(vectors)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(count)))
+        nlist = min(nlist, count)
+        sample_size = min(count, max_samples or nlist * 64)
+        rng = np.random.default_rng(0)
+        sample_ids = np.sort(rng.choice(count, sample_size, replace=False))
+        sample = np.asarray(vectors[sample_ids], dtype=np.float32)
+        self.centroids = spherical_kmeans(sample, nlist)
+        self._assignments = _assign(vectors, self.centroids)
+        self._rebuild_lists()
+        self.trained_rows = count
+        if self.auto_nprobe:
+            self.calibrate(vectors)
+
+    def calibrate(self, vectors: np.ndarray, top_k: int = 10, sample_size: int = 200) -> int:
+        """按 1、2、4… 递增 nprobe，选取抽样召回率达到 target_recall 的最小值"""
+        nlist = len(self.centroids)
+        nprobe = 1
+        while True:
+            recall = sample_recall(
+                vectors,
+                lambda queries, k: self.search(queries, k, lambda ids: np.asarray(vectors[ids]), nprobe),
+                top_k,
+                sample_size,
+            )
+            if recall >= self.target_recall or nprobe >= nlist:
+                break
+            nprobe = min(nprobe * 2, nlist)
+        self.nprobe = nprobe
+        self.calibrated_recall = recall
+        if nprobe * 2 > nlist:
+            # 数据缺乏聚类结构时需要扫描大部分聚类，此时 IVF 不比暴力检索快
+            logger.warning(
+                "IVF 需扫描 %d/%d 个聚类才能达到召回率 %.2f（实际 %.3f），建议改用 flat 索引或量化粗筛",
+                nprobe, nlist, self.target_recall, recall,
+            )
+        return nprobe
+
+    def add(self, start_id: int, vectors: np.ndarray) -> None:
+        """增量加入向量，行号需从当前索引末尾连续递增"""
+        if self.centroids is None:
+            return
+        if start_id != len(self._assignments):
+            raise ValueError(f"IVF 索引行号不连续: 期望 {len(self._assignments)}，实际 {start_id}")
+        assignments = _assign(vectors, self.centroids)
+        self._assignments = np.concatenate([self._assignments, assignments])
+        ids = np.arange(start_id, start_id + len(vectors), dtype=np.int64)
+        for cluster in np.unique(assignments):
+            self._lists[cluster] = np.concatenate([self._lists[cluster], ids[assignments == cluster]])
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """返回与查询最近的 nprobe 个聚类中的全部行号"""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        centroid_scores = self.centroids @ query
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._lists[i] for i in probes])
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int,
+        fetch_vectors: Callable[[np.ndarray], np.ndarray],
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """近似 top-k 检索，fetch_vectors 按行号取出归一化向量"""
+        results = []
+        for query in queries:
+            ids = self.candidates(query, nprobe)
+            if len(ids) == 0:
+                results.append([])
+                continue
+            scores = fetch_vectors(ids) @ query
+            k = min(top_k, len(ids))
+            top = np.argpartition(-scores, k - 1)[:k] if k < len(ids) else np.arange(len(ids))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(int(ids[i]), float(scores[i])) for i in top])
+        return results
+
+
+def recall_at_k(
+    exact: Sequence[Sequence[Tuple[int, float]]],
+    approximate: Sequence[Sequence[Tuple[int, float]]],
+) -> float:
+    """近似结果相对暴力检索结果的平均召回率"""
+    recalls = []
+    for truth, found in zip(exact, approximate):
+        truth_ids = {row_id for row_id, _ in truth}
+        if truth_ids:
+            recalls.append(len(truth_ids & {row_id for row_id, _ in found}) / len(truth_ids))
+    return float(np.mean(recalls)) if recalls else 1.0
@@ -0,0 +1,190 @@
+"""后台萃取任务队列：提交后立即返回任务ID，由固定数量的后台协程执行，状态持久化到 SQLite"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+PARTIAL = "partial"
+FAILED = "failed"
+
+# 单条内容的处理函数，返回写入任务结果的统计信息
+ItemHandler = Callable[[str], Awaitable[Dict[str, Any]]]
+
+
+class JobStore:
+    """任务状态的 SQLite 存储"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, items TEXT NOT NULL, results TEXT NOT NULL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_job(row: tuple) -> Dict[str, Any]:
+        job_id, status, items, results, created_at, updated_at = row
+        return {
+            "id": job_id,
+            "status": status,
+            "items": json.loads(items),
+            "results": json.loads(results),
+            "created_at": created_at,
+            "updated_at": updated_at,
+        }
+
+    def create(self, items: List[str]) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, items, results, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(items, ensure_ascii=False), "[]", now, now),
+            )
+            self._conn.commit()
+        return job_id
+
+    def update(self, job_id: str, status: str, results: Optional[List[Dict[str, Any]]] = None) -> None:
+        with self._lock:
+            if results is None:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, results = ?, updated_at = ? WHERE id = ?",
+                    (status, json.dumps(results, ensure_ascii=False), time.time(), job_id),
+                )
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, items, results, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        query = "SELECT id, status, items, results, created_at, updated_at FROM jobs"
+        params: tuple = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def unfinished(self) -> List[str]:
+        """排队中或执行中（上次退出时被中断）的任务，按提交顺序"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at", (QUEUED, RUNNING)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """固定数量的后台协程按提交顺序执行任务，任务内逐条处理并在每条完成后保存进度"""
+
+    def __init__(self, store: JobStore, handler: ItemHandler, workers: int = 1):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_env(cls, handler: ItemHandler) -> Optional["JobQueue"]:
+        """JOB_QUEUE=true 时创建任务队列，否则返回 None"""
+        if os.getenv("JOB_QUEUE", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            JobStore(os.getenv("JOB_QUEUE_PATH", "jobs.db")),
+            handler,
+            workers=int(os.getenv("JOB_WORKERS", "1")),
+        )
+
+    async def start(self) -> None:
+        """启动后台协程，并重新排队上次未完成的任务"""
+        for job_id in await run_blocking(self.store.unfinished):
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """停止后台协程，执行中的任务保持 running 状态，下次启动时从断点继续"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.store.close()
+
+    async def submit(self, items: List[str]) -> str:
+        """提交任务，返回任务ID"""
+        job_id = await run_blocking(self.store.create, items)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await run_blocking(self.store.get, job_id)
+
+    async def list(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        return await run_blocking(self.store.list, status, limit)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("任务 %s 执行异常", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        job = await self.get(job_id)
+        if job is None or job["status"] not in (QUEUED, RUNNING):
+            return
+        results = job["results"]
+        done = {result["index"] for result in results}
+        await run_blocking(self.store.update, job_id, RUNNING)
+
+        for index, item in enumerate(job["items"]):
+            if index in done:
+                continue
+            result: Dict[str, Any] = {"index": index, "item": item[:200]}
+            try:
+                result.update(await self.handler(item))
+                result["status"] = SUCCEEDED
+            except Exception as e:
+                result.update(status=FAILED, error=str(e))
+            results.append(result)
+            await run_blocking(self.store.update, job_id, RUNNING, results)
+
+        failed = sum(1 for result in results if result["status"] == FAILED)
+        status = SUCCEEDED if failed == 0 else FAILED if failed == len(results) else PARTIAL
+        await run_blocking(self.store.update, job_id, status, results)
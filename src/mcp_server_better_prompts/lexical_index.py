@@ -0,0 +1,107 @@
+"""本地知识库的 BM25 倒排索引，以及与向量检索结果的 RRF 融合"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+_TOKEN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+")
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按字二元组切分（单字保留单字），英文数字按词切分"""
+    tokens: List[str] = []
+    for run in _TOKEN.findall(text.lower()):
+        if _CJK_RUN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+class BM25Index:
+    """增量更新的 BM25 索引，文档以追加写的 JSONL 持久化"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[Any, int]] = {}
+        self._lengths: Dict[Any, int] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    self._index(record["id"], record["tf"])
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: Any) -> bool:
+        return doc_id in self._lengths
+
+    def _index(self, doc_id: Any, term_freqs: Dict[str, int]) -> None:
+        if doc_id in self._lengths:
+            return
+        length = sum(term_freqs.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        for term, count in term_freqs.items():
+            self._postings.setdefault(term, {})[doc_id] = count
+
+    def add(self, documents: Iterable[Tuple[Any, str]]) -> None:
+        """加入 (ID, 文本) 文档并追加写入磁盘"""
+        records = []
+        with self._lock:
+            for doc_id, text in documents:
+                if doc_id in self._lengths:
+                    continue
+                term_freqs = dict(Counter(tokenize(text)))
+                self._index(doc_id, term_freqs)
+                records.append({"id": doc_id, "tf": term_freqs})
+            if records:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def search(self, query: str, top_k: int) -> List[Tuple[Any, float]]:
+        """BM25 检索，返回 (ID, 分数) 列表"""
+        with self._lock:
+            count = len(self._lengths)
+            if count == 0:
+                return []
+            average_length = self._total_length / count
+            scores: Dict[Any, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Any]], k: int = 60) -> List[Tuple[Any, float]]:
+    """按 RRF 融合多个排序（每个排序为 ID 列表），返回 (ID, 融合分数) 降序列表"""
+    fused: Dict[Any, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
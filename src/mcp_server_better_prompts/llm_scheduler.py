@@ -0,0 +1,187 @@
+"""大模型请求调度：并发上限、令牌桶限流、重试退避与优先级"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+import httpx
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 优先级：数值越小越先执行
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class _PrioritySemaphore:
+    """按优先级唤醒等待者的信号量，同优先级先到先得"""
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self._value > 0 and not self._waiters:
+            self._value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已分配到名额但调用方被取消时归还名额
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._value += 1
+
+
+class TokenBucket:
+    """每分钟配额的令牌桶，rate_per_minute <= 0 表示不限制"""
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    async def take(self, amount: float) -> None:
+        """取出令牌，不足时等待补充"""
+        if self.capacity <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) * 60 / self.capacity)
+
+    def debit(self, amount: float) -> None:
+        """按实际用量补扣（可为负数以退还）"""
+        if self.capacity <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """解析 Retry-After（秒数或 HTTP 日期）"""
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """所有大模型请求的统一入口"""
+
+    def __init__(
+        self,
+        max_in_flight: int = 4,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.retries = 0
+        self._slots = _PrioritySemaphore(max_in_flight)
+
+    @classmethod
+    def from_env(cls) -> "LLMScheduler":
+        return cls(
+            max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", "4")),
+            requests_per_minute=float(os.getenv("LLM_RPM", "0")),
+            tokens_per_minute=float(os.getenv("LLM_TPM", "0")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            base_delay=float(os.getenv("LLM_RETRY_BASE_DELAY", "1")),
+            max_delay=float(os.getenv("LLM_RETRY_MAX_DELAY", "30")),
+        )
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # 指数退避 + 全抖动
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def submit(
+        self,
+        send: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0,
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> T:
+        """在并发与速率限制内执行请求，可重试错误按退避策略重试
+
+        退避等待期间归还并发名额，之后按原优先级重新排队，避免批量请求的重试占满名额阻塞交互请求。
+        计时分为 llm_queue（等待名额与速率配额）、llm（请求本身）和 llm_backoff（重试前的退避）。
+        """
+        attempt = 0
+        while True:
+            with metrics.span("llm_queue"):
+                await self._slots.acquire(priority)
+                try:
+                    await self.requests.take(1)
+                    await self.tokens.take(estimated_tokens)
+                except BaseException:
+                    self._slots.release()
+                    raise
+            try:
+                with metrics.span("llm"):
+                    return await send()
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                response = e.response if isinstance(e, httpx.HTTPStatusError) else None
+                if response is not None and response.status_code not in _RETRYABLE_STATUS:
+                    raise
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, response)
+                attempt += 1
+                self.retries += 1
+                metrics.incr("llm_retries")
+                logger.warning("大模型请求失败 (%s)，%.1f 秒后第 %d 次重试", e, delay, attempt)
+            finally:
+                self._slots.release()
+            with metrics.span("llm_backoff"):
+                await asyncio.sleep(delay)
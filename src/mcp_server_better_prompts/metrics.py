@@ -0,0 +1,213 @@
+"""轻量的分阶段计时与计数，导出为 Prometheus 文本格式
+
+未启用时 span() 返回共享的空上下文、incr() 直接返回，几乎没有开销。
+启用后每次工具调用在 contextvar 中记录本次调用的各阶段耗时与计数，可作为结果附加信息返回。
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "better_prompts"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_NOOP = nullcontext()
+
+_enabled = False
+_lock = threading.Lock()
+# (指标名, 标签) -> [各桶计数..., 总数, 总和]
+_histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+_counters: Dict[str, float] = {}
+
+# 当前工具调用的记录: {"spans": {阶段: [次数, 秒]}, "counters": {名称: 值}}
+_trace: contextvars.ContextVar[Optional[Dict[str, Dict[str, Any]]]] = contextvars.ContextVar(
+    "better_prompts_trace", default=None
+)
+
+
+def configure(enabled: bool) -> None:
+    """启用或关闭指标收集"""
+    global _enabled
+    _enabled = enabled
+
+
+def configure_from_env() -> None:
+    """METRICS=true 时启用指标收集"""
+    configure(os.getenv("METRICS", "false").lower() in ("1", "true", "yes"))
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def _observe(name: str, labels: Tuple[Tuple[str, str], ...], seconds: float) -> None:
+    with _lock:
+        values = _histograms.get((name, labels))
+        if values is None:
+            values = _histograms[(name, labels)] = [0.0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                values[i] += 1
+        values[-2] += 1
+        values[-1] += seconds
+
+
+class _Span:
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        seconds = time.perf_counter() - self.started
+        _observe("stage_duration_seconds", (("stage", self.stage),), seconds)
+        trace = _trace.get()
+        if trace is not None:
+            entry = trace["spans"].setdefault(self.stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+
+def span(stage: str):
+    """计时上下文：with span("llm"): ..."""
+    if not _enabled:
+        return _NOOP
+    return _Span(stage)
+
+
+def incr(name: str, value: float = 1) -> None:
+    """累加计数器（名称不含前缀和 _total 后缀）"""
+    if not _enabled or not value:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+    trace = _trace.get()
+    if trace is not None:
+        trace["counters"][name] = trace["counters"].get(name, 0) + value
+
+
+class _ToolTrace:
+    """记录一次工具调用的总耗时与本次调用内的阶段明细"""
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.trace: Dict[str, Dict[str, Any]] = {"spans": {}, "counters": {}}
+        self.seconds = 0.0
+
+    def __enter__(self) -> "_ToolTrace":
+        self._token = _trace.set(self.trace)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        self.seconds = time.perf_counter() - self._started
+        _trace.reset(self._token)
+        _observe("tool_duration_seconds", (("tool", self.tool), ("status", "error" if exc_type else "ok")), self.seconds)
+
+    def summary(self) -> str:
+        """本次调用的阶段耗时与计数摘要"""
+        spans = sorted(self.trace["spans"].items(), key=lambda item: item[1][1], reverse=True)
+        parts = [f"{stage} {seconds * 1000:.0f}ms×{count}" for stage, (count, seconds) in spans]
+        text = f"耗时 {self.seconds * 1000:.0f}ms" + (f" | {', '.join(parts)}" if parts else "")
+        if self.trace["counters"]:
+            text += " | " + ", ".join(f"{name} {value:g}" for name, value in sorted(self.trace["counters"].items()))
+        return text
+
+
+def tool_trace(tool: str):
+    """工具调用级别的记录上下文，未启用时返回 None"""
+    if not _enabled:
+        return None
+    return _ToolTrace(tool)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    items = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        items.append(extra)
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def render_prometheus() -> str:
+    """以 Prometheus 文本格式导出全部指标"""
+    lines: List[str] = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+    seen = set()
+    for (name, labels), values in histograms:
+        metric = f"{PREFIX}_{name}"
+        if metric not in seen:
+            seen.add(metric)
+            lines.append(f"# TYPE {metric} histogram")
+        for bound, count in zip(BUCKETS, values):
+            bucket_labels = _format_labels(labels, 'le="%g"' % bound)
+            lines.append(f"{metric}_bucket{bucket_labels} {count:g}")
+        bucket_labels = _format_labels(labels, 'le="+Inf"')
+        lines.append(f"{metric}_bucket{bucket_labels} {values[-2]:g}")
+        lines.append(f"{metric}_count{_format_labels(labels)} {values[-2]:g}")
+        lines.append(f"{metric}_sum{_format_labels(labels)} {values[-1]:.6f}")
+    for name, value in counters:
+        metric = f"{PREFIX}_{name}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus_file(path: str) -> None:
+    """原子写入指标文件（可供 node_exporter textfile collector 读取）"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+
+class MetricsFileWriter:
+    """定期把指标写入 METRICS_FILE"""
+
+    def __init__(self, path: str, interval: float = 15.0):
+        self.path = path
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["MetricsFileWriter"]:
+        """指标已启用且设置了 METRICS_FILE 时创建，否则返回 None"""
+        path = os.getenv("METRICS_FILE")
+        if not _enabled or not path:
+            return None
+        return cls(path, float(os.getenv("METRICS_FILE_INTERVAL", "15")))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._write()
+
+    def _write(self) -> None:
+        try:
+            write_prometheus_file(self.path)
+        except OSError as e:
+            logger.warning("写入指标文件失败: %s", e)
+
+    async def stop(self) -> None:
+        """停止定期写入并写入最后一次"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._write()
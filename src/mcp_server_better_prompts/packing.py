@@ -0,0 +1,195 @@
+"""增强提示词的上下文打包：按 token 预算挑选、裁剪方法论
+
+先按相关度与冗余度 (MMR) 排序挑选方法论，超出预算时依次：
+删除可裁剪的章节（如"细节和示例"，从排名靠后的方法论开始）、
+截断排名最后的方法论、整条舍弃排名最后的方法论。
+"""
+
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .chunking import estimate_tokens
+from .lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+_SECTION = re.compile(r"^(#{1,6})\s*(.+?)\s*$", re.MULTILINE)
+_ELLIPSIS = "\n……"
+
+_token_counter: Optional[Callable[[str], int]] = None
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """返回 token 计数函数
+
+    PROMPT_TOKENIZER 为 tiktoken 编码名（如 cl100k_base）且已安装 tiktoken 时精确计数，
+    否则使用 estimate_tokens 粗略估算。
+    """
+    global _token_counter
+    if _token_counter is None:
+        encoding_name = os.getenv("PROMPT_TOKENIZER", "estimate")
+        _token_counter = estimate_tokens
+        if encoding_name != "estimate":
+            try:
+                import tiktoken
+                encoding = tiktoken.get_encoding(encoding_name)
+                _token_counter = lambda text: len(encoding.encode(text, disallowed_special=()))
+            except Exception as e:
+                logger.warning("无法加载分词器 %s，改用估算: %s", encoding_name, e)
+    return _token_counter
+
+
+def count_tokens(text: str) -> int:
+    """计算文本 token 数"""
+    return get_token_counter()(text)
+
+
+def render_methodology(index: int, method: Dict[str, Any]) -> str:
+    """单条方法论在提示词中的文本"""
+    return f"方法论{index}: {method['title']}\n{method['content']}\n"
+
+
+def render_methodologies(methodologies: Sequence[Dict[str, Any]]) -> str:
+    """拼接全部方法论"""
+    return "\n".join(render_methodology(i + 1, method) for i, method in enumerate(methodologies))
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def mmr_order(
+    methodologies: Sequence[Dict[str, Any]], max_items: int, mmr_lambda: float = 0.7
+) -> List[Dict[str, Any]]:
+    """最大边际相关 (MMR) 排序
+
+    相关度为检索分数按最高分归一化（无分数时按名次），冗余度为与已选方法论的词集合 Jaccard 相似度。
+    """
+    if not methodologies:
+        return []
+    scores = [float(method.get("score") or 0) for method in methodologies]
+    top = max(scores)
+    relevance = [
+        score / top if top > 0 else 1.0 / (rank + 1)
+        for rank, score in enumerate(scores)
+    ]
+    token_sets = [set(tokenize(f"{method['title']}\n{method['content']}")) for method in methodologies]
+
+    selected: List[int] = []
+    remaining = list(range(len(methodologies)))
+    while remaining and len(selected) < max_items:
+        best = max(remaining, key=lambda i: mmr_lambda * relevance[i] - (1 - mmr_lambda) * max(
+            (_jaccard(token_sets[i], token_sets[j]) for j in selected), default=0.0
+        ))
+        selected.append(best)
+        remaining.remove(best)
+    return [methodologies[i] for i in selected]
+
+
+def _sections(content: str) -> List[tuple]:
+    """按标题切分为 (标题文本, 层级, 起始, 结束)，章节包含其下级标题"""
+    headings = [(m.group(2), len(m.group(1)), m.start()) for m in _SECTION.finditer(content)]
+    sections = []
+    for i, (title, level, start) in enumerate(headings):
+        end = next((s for _, l, s in headings[i + 1:] if l <= level), len(content))
+        sections.append((title, level, start, end))
+    return sections
+
+
+def trim_section(content: str, names: Sequence[str]) -> Optional[str]:
+    """删除最后一个标题包含 names 之一的章节，没有可删除章节时返回 None"""
+    for title, _, start, end in reversed(_sections(content)):
+        if any(name in title for name in names):
+            return (content[:start].rstrip("\n") + "\n" + content[end:].lstrip("\n")).strip("\n")
+    return None
+
+
+def truncate_to_tokens(text: str, max_tokens: int, count: Callable[[str], int]) -> str:
+    """截断到不超过 max_tokens，优先在段落/行边界处截断"""
+    if count(text) <= max_tokens:
+        return text
+    # 为末尾的省略标记预留 token
+    limit = max_tokens - count(_ELLIPSIS)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count(text[:middle]) <= limit:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    boundary = max(cut.rfind("\n\n"), cut.rfind("\n"))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + _ELLIPSIS
+
+
+@dataclass
+class PackResult:
+    """打包结果"""
+
+    methodologies: List[Dict[str, Any]]
+    tokens: int
+    budget: int
+    dropped: List[str] = field(default_factory=list)
+    trimmed: List[str] = field(default_factory=list)
+
+
+def pack_methodologies(
+    methodologies: Sequence[Dict[str, Any]],
+    budget: int,
+    max_items: int,
+    mmr_lambda: float = 0.7,
+    trim_sections: Sequence[str] = ("细节和示例",),
+    min_tokens: int = 200,
+    count: Optional[Callable[[str], int]] = None,
+) -> PackResult:
+    """在 budget 个 token 内挑选并裁剪方法论，返回的方法论为副本，content 可能已被裁剪"""
+    count = count or get_token_counter()
+    ordered = mmr_order(methodologies, max_items, mmr_lambda)
+    packed = [dict(method) for method in ordered]
+    dropped = [method["title"] for method in methodologies if method not in ordered]
+    trimmed: List[str] = []
+
+    def total() -> int:
+        return count(render_methodologies(packed)) if packed else 0
+
+    # 1. 从排名最后的方法论开始删除可裁剪章节
+    while total() > budget:
+        for method in reversed(packed):
+            content = trim_section(method["content"], trim_sections)
+            if content is not None:
+                method["content"] = content
+                if method["title"] not in trimmed:
+                    trimmed.append(method["title"])
+                break
+        else:
+            break
+
+    # 2. 截断或舍弃排名最后的方法论
+    while packed and total() > budget:
+        last = packed[-1]
+        others = count(render_methodologies(packed[:-1])) + 1 if len(packed) > 1 else 0
+        overhead = count(render_methodology(len(packed), {"title": last["title"], "content": ""}))
+        room = budget - others - overhead
+        if room >= min(min_tokens, budget) and room > 0:
+            last["content"] = truncate_to_tokens(last["content"], room, count)
+            if last["title"] not in trimmed:
+                trimmed.append(last["title"])
+            if total() <= budget:
+                break
+            # 估算与实际拼接有偏差时继续收紧
+            last["content"] = truncate_to_tokens(last["content"], room - (total() - budget) - 1, count)
+            if total() <= budget:
+                break
+        packed.pop()
+        dropped.append(last["title"])
+        if last["title"] in trimmed:
+            trimmed.remove(last["title"])
+
+    return PackResult(packed, total(), budget, dropped, trimmed)
@@ -0,0 +1,66 @@
+"""把大模型流式输出转发为 MCP 进度通知"""
+
+import os
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from mcp.server import Server
+
+
+def make_progress_reporter(server: Server) -> Optional[Callable[[str], Awaitable[None]]]:
+    """为当前工具调用创建增量回调；客户端未提供 progressToken 时返回 None
+
+    通知的 progress 为已收到的字符数，message 为自上次通知以来的新增内容。
+    发送间隔由 LLM_PROGRESS_INTERVAL（秒）控制，避免逐 token 发送；
+    以空字符串调用表示流已结束，立即发送尚未发出的内容。
+    """
+    ctx = server.request_context
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+
+    interval = float(os.getenv("LLM_PROGRESS_INTERVAL", "0.2"))
+    pending: List[str] = []
+    received = 0
+    last_sent = 0.0
+
+    async def report(delta: str) -> None:
+        nonlocal received, last_sent
+        now = time.monotonic()
+        if delta:
+            pending.append(delta)
+            received += len(delta)
+            if now - last_sent < interval:
+                return
+        elif not pending:
+            return
+        last_sent = now
+        message = "".join(pending)
+        pending.clear()
+        await ctx.session.send_progress_notification(
+            token, received, message=message, related_request_id=str(ctx.request_id)
+        )
+
+    return report
+
+
+def make_item_reporter(server: Server, total: int) -> Optional[Callable[[str], Awaitable[None]]]:
+    """为批量工具调用创建逐项完成回调；客户端未提供 progressToken 时返回 None
+
+    每完成一项立即发送一次通知，progress 为已完成数量，total 为总数，message 为该项结果。
+    """
+    ctx = server.request_context
+    token = ctx.meta.progressToken if ctx.meta else None
+    if token is None:
+        return None
+
+    completed = 0
+
+    async def report(message: str) -> None:
+        nonlocal completed
+        completed += 1
+        await ctx.session.send_progress_notification(
+            token, completed, total=total, message=message, related_request_id=str(ctx.request_id)
+        )
+
+    return report
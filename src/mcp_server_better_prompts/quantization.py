@@ -0,0 +1,118 @@
+"""向量量化：int8 标量量化与二值 (符号位) 量化
+
+量化码常驻内存用于粗筛，再用磁盘上（内存映射）的全精度向量对候选重新打分。
+768 维 float32 为 3072 字节，int8 为 768 字节 (4x)，二值为 96 字节 (32x)。
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+
+# 打分时每次转换的量化码行数，控制临时 float32 矩阵的内存
+_BLOCK_ROWS = 8192
+
+
+class Quantizer:
+    """量化器基类"""
+
+    name = "none"
+
+    def fit(self, vectors: np.ndarray) -> None:
+        """根据已有数据确定量化参数"""
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """全部查询对全部量化码的近似相似度矩阵 (查询数 x 码数)，越大越相似"""
+        raise NotImplementedError
+
+    def needs_refit(self, vectors: np.ndarray) -> bool:
+        """新向量超出当前量化参数的表示范围时返回 True"""
+        return False
+
+    def save(self, directory: str) -> None:
+        """保存量化参数"""
+
+    def load(self, directory: str) -> bool:
+        """加载量化参数，无需参数时返回 True"""
+        return True
+
+
+class Int8Quantizer(Quantizer):
+    """逐维对称缩放到 [-127, 127]"""
+
+    name = "int8"
+    SCALE_FILE = "int8_scale.npy"
+
+    def __init__(self):
+        self.scale: Optional[np.ndarray] = None
+
+    def fit(self, vectors: np.ndarray) -> None:
+        if len(vectors) == 0:
+            self.scale = np.full(vectors.shape[1], 1 / 127, dtype=np.float32)
+            return
+        max_abs = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0)
+        max_abs[max_abs == 0] = 1.0
+        self.scale = (max_abs / 127).astype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        if self.scale is None:
+            self.fit(vectors)
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        # 把缩放系数并入查询向量，每块量化码只转换一次，所有查询一次矩阵乘法
+        scaled = (queries * self.scale).astype(np.float32).T
+        result = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            result[:, start:start + _BLOCK_ROWS] = (codes[start:start + _BLOCK_ROWS].astype(np.float32) @ scaled).T
+        return result
+
+    def needs_refit(self, vectors: np.ndarray) -> bool:
+        return self.scale is not None and bool(np.any(np.abs(vectors) > self.scale * 127 * (1 + 1e-6)))
+
+    def save(self, directory: str) -> None:
+        if self.scale is not None:
+            path = os.path.join(directory, self.SCALE_FILE)
+            np.save(path + ".tmp.npy", self.scale)
+            os.replace(path + ".tmp.npy", path)
+
+    def load(self, directory: str) -> bool:
+        path = os.path.join(directory, self.SCALE_FILE)
+        if not os.path.exists(path):
+            return False
+        self.scale = np.load(path)
+        return True
+
+
+class BinaryQuantizer(Quantizer):
+    """每维取符号位打包；粗筛时把符号位展开为 ±1 与全精度查询做内积（非对称距离，比汉明距离召回更高）"""
+
+    name = "binary"
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        dimension = queries.shape[1]
+        # 符号位 b∈{0,1} 对应 ±1: (2b - 1)·q = 2(b·q) - sum(q)
+        transposed = np.asarray(queries, dtype=np.float32).T
+        offsets = transposed.sum(axis=0)
+        result = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _BLOCK_ROWS):
+            bits = np.unpackbits(codes[start:start + _BLOCK_ROWS], axis=1, count=dimension).astype(np.float32)
+            result[:, start:start + _BLOCK_ROWS] = (2 * (bits @ transposed) - offsets).T
+        return result
+
+
+def make_quantizer(name: str) -> Optional[Quantizer]:
+    """按名称创建量化器，none 返回 None"""
+    if name in ("", "none"):
+        return None
+    if name == "int8":
+        return Int8Quantizer()
+    if name == "binary":
+        return BinaryQuantizer()
+    raise ValueError(f"不支持的量化方式: {name}")
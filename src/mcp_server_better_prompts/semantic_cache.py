@@ -0,0 +1,117 @@
+"""enhance_prompt 的语义结果缓存"""
+
+import math
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def _normalize(vector: Sequence[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+@dataclass
+class _Entry:
+    embedding: List[float]
+    response: str
+    created_at: float
+
+
+class SemanticCache:
+    """按 (模型名, 检索到的方法论ID) 分组，组内按查询向量余弦相似度命中"""
+
+    def __init__(self, threshold: float = 0.95, ttl: float = 3600, max_entries: int = 1000):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (model, ids) -> {entry_id: _Entry}，外层按最近使用排序
+        self._groups: "OrderedDict[Tuple[str, Tuple[str, ...]], Dict[int, _Entry]]" = OrderedDict()
+        self._size = 0
+        self._next_id = 0
+        # 每次 clear 递增，清空前发起的请求结果不再写入
+        self.generation = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """SEMANTIC_CACHE=true 时启用"""
+        if os.getenv("SEMANTIC_CACHE", "false").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000")),
+        )
+
+    @staticmethod
+    def _group_key(model: str, methodology_ids: Sequence) -> Tuple[str, Tuple[str, ...]]:
+        return model, tuple(str(i) for i in methodology_ids)
+
+    def _expire(self, group_key, now: float) -> None:
+        group = self._groups.get(group_key)
+        if group is None:
+            return
+        for entry_id in [k for k, e in group.items() if now - e.created_at > self.ttl]:
+            del group[entry_id]
+            self._size -= 1
+        if not group:
+            del self._groups[group_key]
+
+    def get(self, model: str, methodology_ids: Sequence, query_embedding: Sequence[float]) -> Optional[str]:
+        """查找足够相似的历史请求，未命中返回 None"""
+        group_key = self._group_key(model, methodology_ids)
+        self._expire(group_key, time.monotonic())
+        group = self._groups.get(group_key)
+        if group:
+            query = _normalize(query_embedding)
+            best, best_score = None, self.threshold
+            for entry in group.values():
+                score = sum(a * b for a, b in zip(query, entry.embedding))
+                if score >= best_score:
+                    best, best_score = entry, score
+            if best is not None:
+                self._groups.move_to_end(group_key)
+                self.hits += 1
+                return best.response
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        model: str,
+        methodology_ids: Sequence,
+        query_embedding: Sequence[float],
+        response: str,
+        generation: Optional[int] = None,
+    ) -> None:
+        """写入缓存，超出容量时淘汰最久未使用的分组中最旧的条目
+
+        generation 为发起请求时的代数，期间缓存被清空过（知识库已更新）时丢弃该结果。
+        """
+        if generation is not None and generation != self.generation:
+            return
+        group_key = self._group_key(model, methodology_ids)
+        group = self._groups.setdefault(group_key, {})
+        self._groups.move_to_end(group_key)
+        group[self._next_id] = _Entry(_normalize(query_embedding), response, time.monotonic())
+        self._next_id += 1
+        self._size += 1
+        while self._size > self.max_entries:
+            oldest_key, oldest_group = next(iter(self._groups.items()))
+            del oldest_group[next(iter(oldest_group))]
+            self._size -= 1
+            if not oldest_group:
+                del self._groups[oldest_key]
+
+    def clear(self) -> None:
+        """知识库写入新方法论后清空缓存"""
+        self._groups.clear()
+        self._size = 0
+        self.generation += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": self._size}
@@ -2,19 +2,22 @@
 
 import os
 import json
+import logging
 import re
-from typing import Any, List, Dict, Optional, Tuple
+import sys
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 from urllib.parse import urlparse
 import asyncio
+from contextlib import asynccontextmanager
 
 import httpx
-import markdownify
-import readabilipy.simple_json
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.shared.exceptions import McpError
 from mcp.types import (
     ErrorData,
+    InitializedNotification,
     TextContent,
     Tool,
     INVALID_PARAMS,
@@ -23,9 +26,32 @@ from mcp.types import (
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from .chunking import estimate_tokens, merge_methodologies, parse_methodology_json, split_content
+from .dedup import DedupIndex, content_hash
+from .download import DownloadLimits, download_page
+from .embedding_cache import EmbeddingCache
+from .fetch_cache import FetchCache
+from .extract_pool import ExtractPool
+from .executor import LoopLagMonitor, run_blocking, shutdown_executor
+from .host_limiter import HostLimiter
+from .html_extract import extract_content_from_html
+from .jobs import JobQueue
+from .http_clients import DIFY, EMBEDDING, FETCH, LLM, close_http_clients, get_http_client
+from . import metrics
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+from .llm_scheduler import PRIORITY_BULK, PRIORITY_INTERACTIVE, LLMScheduler
+from .packing import PackResult, count_tokens, pack_methodologies, render_methodologies
+from .progress import make_item_reporter, make_progress_reporter
+from .semantic_cache import SemanticCache
+
+if TYPE_CHECKING:
+    from .vector_store import NumpyVectorStore
+
 # 加载环境变量
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # 默认配置
 DEFAULT_USER_AGENT = "Better-Prompts-MCP/1.0 (+https://github.com/better-prompts/mcp)"
 
@@ -41,6 +67,29 @@ class EnhanceRequest(BaseModel):
     top_k: int = Field(default=3, description="从知识库检索的方法论数量")
 
 
+class BatchEnhanceRequest(BaseModel):
+    """批量提示增强请求参数"""
+    user_inputs: List[str] = Field(min_length=1, description="用户的原始提示词列表")
+    top_k: int = Field(default=3, description="每条提示词从知识库检索的方法论数量")
+
+
+class BatchExtractRequest(BaseModel):
+    """批量萃取请求参数"""
+    contents: List[str] = Field(min_length=1, description="要萃取的文本内容或URL链接列表")
+
+
+class SubmitExtractJobRequest(BaseModel):
+    """后台萃取任务提交参数"""
+    contents: List[str] = Field(min_length=1, description="要萃取的文本内容或URL链接列表，每项单独处理")
+
+
+class ExtractJobStatusRequest(BaseModel):
+    """后台萃取任务查询参数"""
+    job_id: Optional[str] = Field(default=None, description="任务ID，不提供时列出最近的任务")
+    status: Optional[str] = Field(default=None, description="按状态筛选: queued/running/succeeded/partial/failed")
+    limit: int = Field(default=20, description="列出任务的最大数量")
+
+
 def is_url(text: str) -> bool:
     """判断文本是否为URL"""
     try:
@@ -50,62 +99,180 @@ def is_url(text: str) -> bool:
         return False
 
 
-def extract_content_from_html(html: str) -> str:
-    """从HTML中提取内容并转换为Markdown格式"""
-    try:
-        ret = readabilipy.simple_json.simple_json_from_html_string(
-            html, use_readability=True
-        )
-        if not ret["content"]:
-            return "<error>页面内容提取失败</error>"
-        content = markdownify.markdownify(
-            ret["content"],
-            heading_style=markdownify.ATX,
-        )
-        return content
-    except Exception as e:
-        return f"<error>HTML处理失败: {str(e)}</error>"
+_fetch_cache: Optional[FetchCache] = None
+_fetch_cache_loaded = False
+
+
+def get_fetch_cache() -> Optional[FetchCache]:
+    """获取URL抓取缓存，FETCH_CACHE=false 时返回 None"""
+    global _fetch_cache, _fetch_cache_loaded
+    if not _fetch_cache_loaded:
+        _fetch_cache = FetchCache.from_env()
+        _fetch_cache_loaded = True
+    return _fetch_cache
+
+
+def close_fetch_cache() -> None:
+    """关闭URL抓取缓存"""
+    global _fetch_cache, _fetch_cache_loaded
+    if _fetch_cache is not None:
+        _fetch_cache.close()
+    _fetch_cache = None
+    _fetch_cache_loaded = False
+
+
+_extract_pool: Optional[ExtractPool] = None
+_extract_pool_loaded = False
+
+
+def get_extract_pool() -> Optional[ExtractPool]:
+    """获取正文提取进程池，EXTRACT_WORKERS=0 时返回 None"""
+    global _extract_pool, _extract_pool_loaded
+    if not _extract_pool_loaded:
+        _extract_pool = ExtractPool.from_env()
+        _extract_pool_loaded = True
+    return _extract_pool
+
+
+async def close_extract_pool() -> None:
+    """停止正文提取进程池"""
+    global _extract_pool, _extract_pool_loaded
+    if _extract_pool is not None:
+        await _extract_pool.close()
+    _extract_pool = None
+    _extract_pool_loaded = False
+
+
+async def extract_html(html: str) -> str:
+    """提取网页正文：优先交给常驻进程池并行处理，未启用时在线程池中执行"""
+    pool = get_extract_pool()
+    if pool is not None:
+        return await pool.extract(html)
+    return await run_blocking(extract_content_from_html, html)
+
+
+_host_limiter: Optional[HostLimiter] = None
+
+
+def get_host_limiter() -> HostLimiter:
+    """获取按主机的抓取限流器"""
+    global _host_limiter
+    if _host_limiter is None:
+        _host_limiter = HostLimiter.from_env()
+    return _host_limiter
 
 
 async def fetch_url_content(url: str) -> str:
-    """获取URL内容"""
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                url,
-                follow_redirects=True,
-                headers={"User-Agent": DEFAULT_USER_AGENT},
-                timeout=300,
-            )
-            if response.status_code >= 400:
-                raise McpError(ErrorData(
-                    code=INTERNAL_ERROR,
-                    message=f"获取URL失败 {url} - 状态码 {response.status_code}",
-                ))
-            
-            page_raw = response.text
-            content_type = response.headers.get("content-type", "")
-            is_page_html = (
-                "<html" in page_raw[:100] or "text/html" in content_type or not content_type
-            )
-            
-            if is_page_html:
-                return extract_content_from_html(page_raw)
-            else:
-                return page_raw
-                
-        except httpx.HTTPError as e:
+    """获取URL内容，优先使用抓取缓存并通过条件请求重新验证"""
+    cache = get_fetch_cache()
+    cached = await cache.get(url) if cache is not None else None
+    if cached is not None and cached.is_fresh(cache.max_age):
+        cache.hits += 1
+        metrics.incr("fetch_cache_hits")
+        return cached.content
+    
+    headers = {"User-Agent": DEFAULT_USER_AGENT}
+    if cached is not None:
+        headers.update(cached.validators())
+    
+    client = get_http_client(FETCH)
+    try:
+        async with get_host_limiter().slot(url):
+            with metrics.span("fetch"):
+                response = await download_page(client, url, headers)
+        if response.status_code == 304 and cached is not None:
+            # 内容未变化，跳过下载和正文提取
+            cache.revalidated += 1
+            metrics.incr("fetch_cache_revalidated")
+            await cache.touch(url)
+            return cached.content
+        
+        if response.status_code >= 400:
             raise McpError(ErrorData(
-                code=INTERNAL_ERROR, 
-                message=f"获取URL失败 {url}: {str(e)}"
+                code=INTERNAL_ERROR,
+                message=f"获取URL失败 {url} - 状态码 {response.status_code}",
             ))
+        
+        page_raw = response.text or ""
+        if response.is_html:
+            # readabilipy/markdownify 为CPU密集的同步调用，交给正文提取进程池或线程池执行
+            with metrics.span("html_extract"):
+                content = await extract_html(page_raw)
+        else:
+            content = page_raw
+        if response.truncated and not content.startswith("<error>"):
+            metrics.incr("fetch_truncated")
+            content += f"\n\n[内容已截断：页面超过 {DownloadLimits.from_env().max_bytes} 字节上限，仅提取了前面部分]"
+        
+        if cache is not None:
+            cache.misses += 1
+            metrics.incr("fetch_cache_misses")
+            if not content.startswith("<error>"):
+                # 截断的内容不保存 ETag/Last-Modified，过期后重新完整下载，而不是经 304 把不完整的内容当作最新
+                await cache.put(
+                    url,
+                    content,
+                    None if response.truncated else response.headers.get("etag"),
+                    None if response.truncated else response.headers.get("last-modified"),
+                )
+        return content
+        
+    except httpx.HTTPError as e:
+        raise McpError(ErrorData(
+            code=INTERNAL_ERROR, 
+            message=f"获取URL失败 {url}: {str(e)}"
+        ))
+
 
+_llm_scheduler: Optional[LLMScheduler] = None
 
-async def call_llm_api(system_prompt: str, user_prompt: str) -> str:
-    """调用大模型API"""
+
+def get_llm_scheduler() -> LLMScheduler:
+    """获取进程内共享的大模型请求调度器"""
+    global _llm_scheduler
+    if _llm_scheduler is None:
+        _llm_scheduler = LLMScheduler.from_env()
+    return _llm_scheduler
+
+
+async def _read_llm_stream(
+    response: httpx.Response, on_delta: Callable[[str], Awaitable[None]]
+) -> Tuple[str, Optional[int]]:
+    """解析 SSE 流式响应，逐段回调增量内容，返回 (完整内容, token用量)"""
+    parts: List[str] = []
+    total_tokens = None
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        chunk = json.loads(data)
+        if chunk.get("usage"):
+            total_tokens = chunk["usage"].get("total_tokens")
+        choices = chunk.get("choices") or []
+        delta = choices[0].get("delta", {}).get("content") if choices else None
+        if delta:
+            parts.append(delta)
+            await on_delta(delta)
+    return "".join(parts), total_tokens
+
+
+async def call_llm_api(
+    system_prompt: str,
+    user_prompt: str,
+    priority: int = PRIORITY_INTERACTIVE,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> str:
+    """调用大模型API（经调度器限流、重试，交互请求优先于批量萃取）
+    
+    提供 on_delta 且 LLM_STREAM 未关闭时使用流式输出，每收到一段内容即回调，流结束时以空字符串回调一次。
+    已开始输出后流中断不再重试，避免客户端收到重复内容。
+    """
     api_base = os.getenv("LLM_API_BASE", "https://api.openai.com/v1")
     api_key = os.getenv("LLM_API_KEY")
     model_name = os.getenv("LLM_MODEL_NAME", "gpt-3.5-turbo")
+    stream = on_delta is not None and os.getenv("LLM_STREAM", "true").lower() not in ("0", "false", "no")
     
     if not api_key:
         raise McpError(ErrorData(
@@ -113,37 +280,97 @@ async def call_llm_api(system_prompt: str, user_prompt: str) -> str:
             message="未配置LLM_API_KEY环境变量"
         ))
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                f"{api_base}/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": model_name,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.7,
-                },
-                timeout=60,
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result["choices"][0]["message"]["content"]
-        except Exception as e:
+    client = get_http_client(LLM)
+    url = f"{api_base}/chat/completions"
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    payload: Dict[str, Any] = {
+        "model": model_name,
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ],
+        "temperature": 0.7,
+    }
+    
+    async def send() -> Tuple[str, Optional[int]]:
+        if stream:
+            streamed = False
+            
+            async def forward(delta: str) -> None:
+                nonlocal streamed
+                streamed = True
+                await on_delta(delta)
+            
+            stream_payload: Dict[str, Any] = {**payload, "stream": True}
+            if os.getenv("LLM_STREAM_USAGE", "true").lower() not in ("0", "false", "no"):
+                # 请求在流末尾返回实际用量，未返回时按估算值扣减配额
+                stream_payload["stream_options"] = {"include_usage": True}
+            async with client.stream(
+                "POST", url, headers=headers, json=stream_payload, timeout=60
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                try:
+                    result = await _read_llm_stream(response, forward)
+                except httpx.TransportError as e:
+                    if not streamed:
+                        raise
+                    # 已有内容发给客户端，重试会重复输出，改为直接失败
+                    raise McpError(ErrorData(
+                        code=INTERNAL_ERROR,
+                        message=f"调用大模型API失败: 流式输出中断: {str(e)}"
+                    ))
+            # 流结束，发送节流中尚未发出的内容
+            await on_delta("")
+            return result
+        
+        response = await client.post(url, headers=headers, json=payload, timeout=60)
+        response.raise_for_status()
+        result = response.json()
+        return (
+            result["choices"][0]["message"]["content"],
+            result.get("usage", {}).get("total_tokens"),
+        )
+    
+    scheduler = get_llm_scheduler()
+    estimated_tokens = estimate_tokens(system_prompt) + estimate_tokens(user_prompt)
+    try:
+        content, total_tokens = await scheduler.submit(send, estimated_tokens, priority)
+        metrics.incr("llm_requests")
+        metrics.incr("llm_tokens", total_tokens or estimated_tokens)
+        # 按实际用量修正 tokens/min 配额
+        if total_tokens:
+            scheduler.tokens.debit(total_tokens - estimated_tokens)
+        return content
+    except McpError:
+        raise
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 429:
             raise McpError(ErrorData(
                 code=INTERNAL_ERROR,
-                message=f"调用大模型API失败: {str(e)}"
+                message="调用大模型API失败: 请求被限流 (429)，重试后仍未成功，请稍后再试"
             ))
+        raise McpError(ErrorData(
+            code=INTERNAL_ERROR,
+            message=f"调用大模型API失败: {str(e)}"
+        ))
+    except Exception as e:
+        raise McpError(ErrorData(
+            code=INTERNAL_ERROR,
+            message=f"调用大模型API失败: {str(e)}"
+        ))
 
 
 class KnowledgeBase:
     """知识库抽象基类"""
     
+    # 在工具结果中展示的存储方式
+    backend_name = ""
+    
     async def store_methodology(self, methodology: str) -> Dict[str, Any]:
         """存储方法论到知识库"""
         raise NotImplementedError
@@ -151,30 +378,240 @@ class KnowledgeBase:
     async def search_methodologies(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """从知识库检索方法论"""
         raise NotImplementedError
+    
+    async def search_methodologies_batch(
+        self, queries: List[str], top_k: int = 3
+    ) -> List[List[Dict[str, Any]]]:
+        """批量检索，默认逐条并发调用 search_methodologies"""
+        semaphore = asyncio.Semaphore(int(os.getenv("BATCH_SEARCH_CONCURRENCY", "8")))
+        
+        async def search(query: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self.search_methodologies(query, top_k)
+        
+        return list(await asyncio.gather(*(search(query) for query in queries)))
+    
+    async def search_methodologies_with_embeddings(
+        self, queries: List[str], top_k: int = 3
+    ) -> Tuple[List[List[Dict[str, Any]]], Optional[List[List[float]]]]:
+        """批量检索并返回检索所用的查询向量，供语义缓存复用；无本地嵌入能力时向量为 None"""
+        return await self.search_methodologies_batch(queries, top_k), None
+    
+    async def warmup(self) -> None:
+        """启动时预热（建立连接、加载索引等），默认无需处理"""
+    
+    async def close(self) -> None:
+        """服务退出时释放资源，默认无需处理"""
 
 
-class LocalKnowledgeBase(KnowledgeBase):
-    """本地知识库实现 (Milvus Lite + Ollama)"""
+class OllamaKnowledgeBase(KnowledgeBase):
+    """使用Ollama生成嵌入向量的本地知识库基类，子类实现向量存储部分"""
     
     def __init__(self):
-        self.collection_name = "methodologies"
+        self.embedding_model_name = "nomic-embed-text"
+        self.ollama_base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
         self.embedding_model = None
-        self.milvus_client = None
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self.hybrid_search = os.getenv("HYBRID_SEARCH", "false").lower() in ("1", "true", "yes")
+        self.lexical_index: Optional[BM25Index] = None
+        self.dedup = os.getenv("DEDUP", "true").lower() not in ("0", "false", "no")
+        self.dedup_threshold = float(os.getenv("DEDUP_VECTOR_THRESHOLD", "0.95"))
+        self.dedup_index: Optional[DedupIndex] = None
+        self._init_lock = asyncio.Lock()
+        self._cache_initialized = False
+        self._initialized = False
+        
+    async def _ensure_initialized(self):
+        """初始化嵌入模型、嵌入缓存、向量存储和关键词索引，并发调用时只执行一次"""
+        if self._initialized:
+            return
+        async with self._init_lock:
+            await self._init_embedding_model()
+            await self._init_embedding_cache()
+            await self._init_store()
+            await self._init_lexical_index()
+            await self._init_dedup_index()
+            self._initialized = True
+    
+    async def _init_store(self):
+        """初始化向量存储"""
+        raise NotImplementedError
+    
+    def _sidecar_path(self, name: str) -> str:
+        """与向量存储配套的辅助索引文件路径"""
+        raise NotImplementedError
+    
+    async def _row_count(self) -> int:
+        """向量存储中的条目数"""
+        raise NotImplementedError
+    
+    async def _all_rows(self) -> List[Dict[str, Any]]:
+        """读取全部 {id, title, content}，用于回填关键词索引"""
+        raise NotImplementedError
+    
+    async def _fetch_rows(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        """按ID读取 {id, title, content}"""
+        raise NotImplementedError
+    
+    async def _init_lexical_index(self):
+        """加载关键词索引 (HYBRID_SEARCH=true)，缺失的已有数据从向量存储回填"""
+        if not self.hybrid_search or self.lexical_index is not None:
+            return
+        try:
+            path = os.getenv("LEXICAL_INDEX_PATH") or self._sidecar_path("lexical_index")
+            index = await run_blocking(BM25Index, path)
+            if len(index) < await self._row_count():
+                rows = await self._all_rows()
+                await run_blocking(index.add, [
+                    (row["id"], f"{row['title']}\n{row['content']}")
+                    for row in rows if row["id"] not in index
+                ])
+            self.lexical_index = index
+        except Exception as e:
+            raise McpError(ErrorData(
+                code=INTERNAL_ERROR,
+                message=f"初始化关键词索引失败: {str(e)}"
+            ))
+    
+    async def _init_dedup_index(self):
+        """加载去重指纹 (DEDUP=true)，缺失的已有数据从向量存储回填"""
+        if not self.dedup or self.dedup_index is not None:
+            return
+        try:
+            index = await run_blocking(
+                DedupIndex,
+                self._sidecar_path("dedup_index"),
+                int(os.getenv("DEDUP_SIMHASH_DISTANCE", "3")),
+            )
+            if len(index) < await self._row_count():
+                rows = await self._all_rows()
+                await run_blocking(index.add, [
+                    (row["id"], row["content"]) for row in rows if row["id"] not in index
+                ])
+            self.dedup_index = index
+        except Exception as e:
+            raise McpError(ErrorData(
+                code=INTERNAL_ERROR,
+                message=f"初始化去重索引失败: {str(e)}"
+            ))
+    
+    async def _filter_duplicates(
+        self, titles: List[str], contents: List[str]
+    ) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """内容哈希与SimHash预筛（CPU密集，在线程池执行），返回 (保留的下标, 跳过的条目)"""
+        return await run_blocking(self._find_duplicates, titles, contents)
+    
+    def _find_duplicates(
+        self, titles: List[str], contents: List[str]
+    ) -> Tuple[List[int], List[Dict[str, Any]]]:
+        kept: List[int] = []
+        skipped: List[Dict[str, Any]] = []
+        batch_hashes: Dict[str, str] = {}
+        for i, content in enumerate(contents):
+            digest = content_hash(content)
+            duplicate_of, reason = self.dedup_index.find_exact(content), "内容相同"
+            if duplicate_of is None and digest in batch_hashes:
+                duplicate_of = batch_hashes[digest]
+            if duplicate_of is None:
+                duplicate_of, reason = self.dedup_index.find_near(content), "SimHash近似"
+            if duplicate_of is not None:
+                skipped.append({"title": titles[i], "reason": reason, "duplicate_of": duplicate_of})
+                continue
+            batch_hashes[digest] = titles[i]
+            kept.append(i)
+        return kept, skipped
+    
+    async def _filter_similar_vectors(
+        self, titles: List[str], embeddings: List[List[float]]
+    ) -> Tuple[List[int], List[Dict[str, Any]]]:
+        """与已有条目及本批已保留条目比较向量相似度，返回 (保留的下标, 跳过的条目)"""
+        with metrics.span("vector_search"):
+            existing = await self._search_vectors(embeddings, 1)
+        return await run_blocking(self._find_similar_vectors, titles, embeddings, existing)
+    
+    def _find_similar_vectors(
+        self,
+        titles: List[str],
+        embeddings: List[List[float]],
+        existing: List[List[Dict[str, Any]]],
+    ) -> Tuple[List[int], List[Dict[str, Any]]]:
+        import numpy as np
+        
+        # 本批向量两两余弦相似度，一次矩阵乘法得到
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        similarity = matrix @ matrix.T
+        
+        kept: List[int] = []
+        skipped: List[Dict[str, Any]] = []
+        for i, hits in enumerate(existing):
+            if hits and hits[0]["score"] >= self.dedup_threshold:
+                skipped.append({
+                    "title": titles[i],
+                    "reason": f"向量相似度{hits[0]['score']:.3f}",
+                    "duplicate_of": hits[0]["id"]
+                })
+                continue
+            if kept:
+                scores = similarity[i, kept]
+                best = int(np.argmax(scores))
+                if scores[best] >= self.dedup_threshold:
+                    skipped.append({"title": titles[i], "reason": "向量相似", "duplicate_of": titles[kept[best]]})
+                    continue
+            kept.append(i)
+        return kept, skipped
+    
+    async def _load_store(self):
+        """预热时将向量数据加载到内存，默认无需处理"""
+    
+    async def _insert_rows(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        """写入 {vector, title, content} 行，返回生成的ID"""
+        raise NotImplementedError
+    
+    async def _search_vectors(
+        self, vectors: List[List[float]], top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        """按向量检索，每个查询返回 {id, title, content, score} 列表"""
+        raise NotImplementedError
+    
+    async def close(self) -> None:
+        """关闭嵌入缓存"""
+        if self.embedding_cache is not None:
+            await run_blocking(self.embedding_cache.close)
+            self.embedding_cache = None
+            self._cache_initialized = False
+            self._initialized = False
+    
+    async def _init_embedding_cache(self):
+        """初始化嵌入缓存 (EMBEDDING_CACHE=false 时禁用)"""
+        if not self._cache_initialized:
+            try:
+                self.embedding_cache = await run_blocking(EmbeddingCache.from_env)
+            except Exception as e:
+                raise McpError(ErrorData(
+                    code=INTERNAL_ERROR,
+                    message=f"初始化嵌入缓存失败: {str(e)}"
+                ))
+            self._cache_initialized = True
+    
+    async def warmup(self) -> None:
+        """预热：探测Ollama、打开向量存储、生成一次嵌入并将数据加载到内存"""
+        await self._ensure_initialized()
+        await self._get_embedding("warmup")
+        await self._load_store()
         
     async def _init_embedding_model(self):
         """初始化嵌入模型"""
         if self.embedding_model is None:
             try:
                 # 使用Ollama的nomic-embed-text模型
-                import requests
                 # 测试Ollama连接
-                response = requests.get("http://localhost:11434/api/tags")
+                client = get_http_client(EMBEDDING)
+                response = await client.get(f"{self.ollama_base_url}/api/tags", timeout=10)
                 if response.status_code != 200:
                     raise Exception("Ollama服务未启动")
                 
-                # 使用sentence-transformers包装Ollama模型
-                from sentence_transformers import SentenceTransformer
-                
                 # 检查是否有nomic-embed-text模型
                 models = response.json().get("models", [])
                 if not any("nomic-embed-text" in model.get("name", "") for model in models):
@@ -189,85 +626,118 @@ class LocalKnowledgeBase(KnowledgeBase):
     
     async def _get_embedding(self, text: str) -> List[float]:
         """获取文本嵌入向量"""
+        embeddings = await self._get_embeddings([text])
+        return embeddings[0]
+    
+    async def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """批量获取文本嵌入向量，优先读取嵌入缓存"""
+        if self.embedding_cache is None:
+            return await self._request_embeddings(texts)
+        
+        cached = await self.embedding_cache.get_many(self.embedding_model_name, texts)
+        # 去重后只请求未命中的文本
+        missing = list(dict.fromkeys(
+            text for text, vector in zip(texts, cached) if vector is None
+        ))
+        metrics.incr("embedding_cache_hits", len(texts) - sum(1 for vector in cached if vector is None))
+        metrics.incr("embedding_cache_misses", len(missing))
+        if not missing:
+            return cached
+        
+        fresh = await self._request_embeddings(missing)
+        fresh = await self.embedding_cache.put_many(self.embedding_model_name, missing, fresh)
+        fresh_by_text = dict(zip(missing, fresh))
+        return [
+            vector if vector is not None else fresh_by_text[text]
+            for text, vector in zip(texts, cached)
+        ]
+    
+    async def _request_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """请求Ollama生成嵌入向量 (/api/embed，按 EMBEDDING_BATCH_SIZE 分批)"""
+        batch_size = max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "32")))
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "http://localhost:11434/api/embeddings",
-                    json={
-                        "model": "nomic-embed-text",
-                        "prompt": text
-                    },
-                    timeout=30
-                )
+            client = get_http_client(EMBEDDING)
+            embeddings: List[List[float]] = []
+            for start in range(0, len(texts), batch_size):
+                batch = texts[start:start + batch_size]
+                with metrics.span("embedding"):
+                    response = await client.post(
+                        f"{self.ollama_base_url}/api/embed",
+                        json={
+                            "model": self.embedding_model_name,
+                            "input": batch
+                        },
+                        timeout=30
+                    )
                 response.raise_for_status()
                 result = response.json()
-                return result["embedding"]
+                embeddings.extend(result["embeddings"])
+                metrics.incr("embedding_texts", len(batch))
+            return embeddings
         except Exception as e:
             raise McpError(ErrorData(
                 code=INTERNAL_ERROR,
                 message=f"获取嵌入向量失败: {str(e)}"
             ))
     
-    async def _init_milvus(self):
-        """初始化Milvus连接"""
-        if self.milvus_client is None:
-            try:
-                from pymilvus import MilvusClient
-                
-                # 使用Milvus Lite
-                self.milvus_client = MilvusClient("milvus_lite.db")
-                
-                # 检查集合是否存在，不存在则创建
-                if not self.milvus_client.has_collection(self.collection_name):
-                    # 使用简化的集合创建方式
-                    self.milvus_client.create_collection(
-                        collection_name=self.collection_name,
-                        dimension=768,  # nomic-embed-text 的向量维度
-                        metric_type="COSINE",
-                        auto_id=True
-                    )
-            except Exception as e:
-                raise McpError(ErrorData(
-                    code=INTERNAL_ERROR,
-                    message=f"初始化Milvus失败: {str(e)}"
-                ))
-    
     async def store_methodology(self, methodology: str) -> Dict[str, Any]:
         """存储方法论到本地知识库"""
-        await self._init_embedding_model()
-        await self._init_milvus()
+        await self._ensure_initialized()
         
         try:
             # 解析方法论JSON
             methodology_data = json.loads(methodology)
             
-            results = []
-            for item in methodology_data:
-                title = item.get("title", "")
-                content = item.get("methodology", "")
-                
-                # 获取嵌入向量
-                embedding = await self._get_embedding(content)
-                
-                # 插入数据 - 使用简化格式
-                data = [{
-                    "vector": embedding,
-                    "content": content,
-                    "title": title
-                }]
-                
-                res = self.milvus_client.insert(
-                    collection_name=self.collection_name,
-                    data=data
-                )
-                
-                results.append({
-                    "title": title,
-                    "id": res["ids"][0],
-                    "status": "success"
-                })
+            titles = [item.get("title", "") for item in methodology_data]
+            contents = [item.get("methodology", "") for item in methodology_data]
+            skipped: List[Dict[str, Any]] = []
+            
+            # 入库去重：先用哈希/SimHash预筛，避免为重复内容生成嵌入
+            if self.dedup_index is not None:
+                kept, skipped = await self._filter_duplicates(titles, contents)
+                titles = [titles[i] for i in kept]
+                contents = [contents[i] for i in kept]
+            if not contents:
+                return {"stored_count": 0, "skipped_count": len(skipped), "results": [], "skipped": skipped}
+            
+            # 批量获取嵌入向量
+            embeddings = await self._get_embeddings(contents)
+            
+            if self.dedup_index is not None and self.dedup_threshold < 1:
+                kept, similar = await self._filter_similar_vectors(titles, embeddings)
+                skipped.extend(similar)
+                titles = [titles[i] for i in kept]
+                contents = [contents[i] for i in kept]
+                embeddings = [embeddings[i] for i in kept]
+                if not contents:
+                    return {"stored_count": 0, "skipped_count": len(skipped), "results": [], "skipped": skipped}
             
-            return {"stored_count": len(results), "results": results}
+            # 一次性插入全部数据 - 使用简化格式
+            rows = [
+                {"vector": embedding, "content": content, "title": title}
+                for title, content, embedding in zip(titles, contents, embeddings)
+            ]
+            with metrics.span("vector_insert"):
+                ids = await self._insert_rows(rows)
+            if self.lexical_index is not None:
+                await run_blocking(self.lexical_index.add, [
+                    (row_id, f"{title}\n{content}")
+                    for row_id, title, content in zip(ids, titles, contents)
+                ])
+            if self.dedup_index is not None:
+                await run_blocking(self.dedup_index.add, list(zip(ids, contents)))
+            
+            results = [
+                {"title": title, "id": row_id, "status": "success"}
+                for title, row_id in zip(titles, ids)
+            ]
+            
+            return {
+                "stored_count": len(results),
+                "skipped_count": len(skipped),
+                "results": results,
+                "skipped": skipped
+            }
             
         except Exception as e:
             raise McpError(ErrorData(
@@ -277,41 +747,286 @@ class LocalKnowledgeBase(KnowledgeBase):
     
     async def search_methodologies(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """从本地知识库检索方法论"""
-        await self._init_embedding_model()
-        await self._init_milvus()
+        return (await self.search_methodologies_batch([query], top_k))[0]
+    
+    async def search_methodologies_batch(
+        self, queries: List[str], top_k: int = 3
+    ) -> List[List[Dict[str, Any]]]:
+        """批量检索：一次请求生成全部查询的嵌入向量，一次多向量检索"""
+        return (await self.search_methodologies_with_embeddings(queries, top_k))[0]
+    
+    async def search_methodologies_with_embeddings(
+        self, queries: List[str], top_k: int = 3
+    ) -> Tuple[List[List[Dict[str, Any]]], Optional[List[List[float]]]]:
+        """批量检索，同时返回查询向量，语义缓存无需再次生成嵌入"""
+        await self._ensure_initialized()
         
         try:
-            # 获取查询嵌入向量
-            query_embedding = await self._get_embedding(query)
-            
-            # 搜索
-            results = self.milvus_client.search(
-                collection_name=self.collection_name,
-                data=[query_embedding],
-                limit=top_k,
-                output_fields=["content", "title"]
-            )
+            query_embeddings = await self._get_embeddings(queries)
             
-            methodologies = []
-            for hit in results[0]:
-                methodologies.append({
-                    "title": hit.get("title", ""),
-                    "content": hit.get("content", ""),
-                    "score": hit.get("distance", 0)
-                })
+            if self.lexical_index is None:
+                with metrics.span("vector_search"):
+                    return await self._search_vectors(query_embeddings, top_k), query_embeddings
             
-            return methodologies
+            candidates = top_k * int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))
+            with metrics.span("vector_search"):
+                vector_hits = await self._search_vectors(query_embeddings, candidates)
+            return [
+                await self._hybrid_search(query, hits, top_k, candidates)
+                for query, hits in zip(queries, vector_hits)
+            ], query_embeddings
             
         except Exception as e:
             raise McpError(ErrorData(
                 code=INTERNAL_ERROR,
                 message=f"检索方法论失败: {str(e)}"
             ))
+    
+    async def _hybrid_search(
+        self, query: str, vector_hits: List[Dict[str, Any]], top_k: int, candidates: int
+    ) -> List[Dict[str, Any]]:
+        """向量检索候选与BM25检索候选按倒数排名融合 (RRF)"""
+        with metrics.span("lexical_search"):
+            lexical_hits = await run_blocking(self.lexical_index.search, query, candidates)
+        
+        fused = reciprocal_rank_fusion([
+            [hit["id"] for hit in vector_hits],
+            [doc_id for doc_id, _ in lexical_hits],
+        ])[:top_k]
+        
+        rows = {hit["id"]: hit for hit in vector_hits}
+        missing = [doc_id for doc_id, _ in fused if doc_id not in rows]
+        if missing:
+            rows.update(await self._fetch_rows(missing))
+        
+        return [
+            {
+                "id": doc_id,
+                "title": rows[doc_id].get("title", ""),
+                "content": rows[doc_id].get("content", ""),
+                "score": score
+            }
+            for doc_id, score in fused if doc_id in rows
+        ]
+
+
+class LocalKnowledgeBase(OllamaKnowledgeBase):
+    """本地知识库实现 (Milvus Lite + Ollama)"""
+    
+    backend_name = "本地 (Milvus Lite)"
+    
+    def __init__(self):
+        super().__init__()
+        self.collection_name = "methodologies"
+        self.milvus_client = None
+    
+    def _open_milvus(self):
+        """打开Milvus Lite并确保集合存在（同步，需在线程池中执行）"""
+        from pymilvus import MilvusClient
+        
+        # 使用Milvus Lite
+        client = MilvusClient("milvus_lite.db")
+        
+        # 检查集合是否存在，不存在则创建
+        if not client.has_collection(self.collection_name):
+            # 使用简化的集合创建方式
+            client.create_collection(
+                collection_name=self.collection_name,
+                dimension=768,  # nomic-embed-text 的向量维度
+                metric_type="COSINE",
+                auto_id=True
+            )
+        return client
+    
+    async def _init_store(self):
+        """初始化Milvus连接"""
+        if self.milvus_client is None:
+            try:
+                self.milvus_client = await run_blocking(self._open_milvus)
+            except Exception as e:
+                raise McpError(ErrorData(
+                    code=INTERNAL_ERROR,
+                    message=f"初始化Milvus失败: {str(e)}"
+                ))
+    
+    async def _load_store(self):
+        """将集合加载到内存"""
+        try:
+            await run_blocking(self.milvus_client.load_collection, self.collection_name)
+        except Exception as e:
+            raise McpError(ErrorData(
+                code=INTERNAL_ERROR,
+                message=f"加载Milvus集合失败: {str(e)}"
+            ))
+    
+    def _sidecar_path(self, name: str) -> str:
+        return f"milvus_{name}.jsonl"
+    
+    async def _row_count(self) -> int:
+        stats = await run_blocking(self.milvus_client.get_collection_stats, self.collection_name)
+        return int(stats.get("row_count", 0))
+    
+    def _query_all(self) -> List[Dict[str, Any]]:
+        if hasattr(self.milvus_client, "query_iterator"):
+            rows: List[Dict[str, Any]] = []
+            iterator = self.milvus_client.query_iterator(
+                collection_name=self.collection_name,
+                batch_size=1000,
+                filter="",
+                output_fields=["title", "content"],
+            )
+            while True:
+                batch = iterator.next()
+                if not batch:
+                    iterator.close()
+                    return rows
+                rows.extend(batch)
+        # 旧版 pymilvus 没有 query_iterator，单次查询最多返回 16384 条
+        return self.milvus_client.query(
+            collection_name=self.collection_name,
+            filter="id >= 0",
+            output_fields=["title", "content"],
+            limit=16384,
+        )
+    
+    async def _all_rows(self) -> List[Dict[str, Any]]:
+        return await run_blocking(self._query_all)
+    
+    async def _fetch_rows(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        rows = await run_blocking(
+            self.milvus_client.get,
+            collection_name=self.collection_name,
+            ids=ids,
+            output_fields=["title", "content"],
+        )
+        return {row["id"]: row for row in rows}
+    
+    async def _insert_rows(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        res = await run_blocking(
+            self.milvus_client.insert,
+            collection_name=self.collection_name,
+            data=rows
+        )
+        return list(res["ids"])
+    
+    async def _search_vectors(
+        self, vectors: List[List[float]], top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        results = await run_blocking(
+            self.milvus_client.search,
+            collection_name=self.collection_name,
+            data=vectors,
+            limit=top_k,
+            output_fields=["content", "title"]
+        )
+        
+        return [
+            [
+                {
+                    "id": hit.get("id"),
+                    "title": hit.get("entity", hit).get("title", ""),
+                    "content": hit.get("entity", hit).get("content", ""),
+                    "score": hit.get("distance", 0)
+                }
+                for hit in hits
+            ]
+            for hits in results
+        ]
+
+
+class NumpyKnowledgeBase(OllamaKnowledgeBase):
+    """本地知识库实现 (NumPy 内存映射矩阵 + Ollama)，适合中小规模语料"""
+    
+    backend_name = "本地 (NumPy)"
+    
+    def __init__(self):
+        super().__init__()
+        self.store_path = os.getenv("NUMPY_STORE_PATH", "numpy_store")
+        self.store: Optional["NumpyVectorStore"] = None
+    
+    def _open_store(self, **kwargs: Any) -> "NumpyVectorStore":
+        """在工作线程中导入NumPy并打开向量存储"""
+        from .vector_store import NumpyVectorStore
+        return NumpyVectorStore(self.store_path, **kwargs)
+    
+    async def _init_store(self):
+        """打开NumPy向量存储"""
+        if self.store is None:
+            try:
+                self.store = await run_blocking(
+                    self._open_store,
+                    dimension=768,  # nomic-embed-text 的向量维度
+                    compact_threshold=int(os.getenv("NUMPY_COMPACT_THRESHOLD", "1024")),
+                    index=os.getenv("NUMPY_INDEX", "flat").lower(),
+                    nlist=int(os.getenv("NUMPY_IVF_NLIST", "0")),
+                    nprobe=int(os.getenv("NUMPY_IVF_NPROBE", "0")),
+                    ivf_min_rows=int(os.getenv("NUMPY_IVF_MIN_ROWS", "20000")),
+                    ivf_target_recall=float(os.getenv("NUMPY_IVF_TARGET_RECALL", "0.9")),
+                    ivf_retrain_factor=float(os.getenv("NUMPY_IVF_RETRAIN_FACTOR", "4")),
+                    quantization=os.getenv("NUMPY_QUANTIZATION") or None,
+                    rescore_factor=int(os.getenv("NUMPY_RESCORE_FACTOR", "10")),
+                )
+            except Exception as e:
+                raise McpError(ErrorData(
+                    code=INTERNAL_ERROR,
+                    message=f"初始化NumPy向量存储失败: {str(e)}"
+                ))
+    
+    async def close(self) -> None:
+        """压缩追加数据并关闭嵌入缓存"""
+        if self.store is not None:
+            await run_blocking(self.store.compact)
+        await super().close()
+    
+    def _sidecar_path(self, name: str) -> str:
+        return os.path.join(self.store_path, f"{name}.jsonl")
+    
+    async def _row_count(self) -> int:
+        return len(self.store)
+    
+    async def _all_rows(self) -> List[Dict[str, Any]]:
+        # records() 是生成器，文件读取与 JSON 解析都在工作线程中的 list() 里完成
+        return await run_blocking(list, self.store.records())
+    
+    async def _fetch_rows(self, ids: List[Any]) -> Dict[Any, Dict[str, Any]]:
+        records = await run_blocking(self.store.get_many, ids)
+        return dict(zip(ids, records))
+    
+    async def _insert_rows(self, rows: List[Dict[str, Any]]) -> List[Any]:
+        return await run_blocking(
+            self.store.add,
+            [row["vector"] for row in rows],
+            [{"title": row["title"], "content": row["content"]} for row in rows],
+        )
+    
+    async def _search_vectors(
+        self, vectors: List[List[float]], top_k: int
+    ) -> List[List[Dict[str, Any]]]:
+        return await run_blocking(self._search_store, vectors, top_k)
+    
+    def _search_store(self, vectors: List[List[float]], top_k: int) -> List[List[Dict[str, Any]]]:
+        """检索并从磁盘读取命中行的元数据（在工作线程中执行）"""
+        results = self.store.search(vectors, top_k)
+        methodologies = []
+        for hits in results:
+            records = self.store.get_many([row_id for row_id, _ in hits])
+            methodologies.append([
+                {
+                    "id": row_id,
+                    "title": record.get("title", ""),
+                    "content": record.get("content", ""),
+                    "score": score
+                }
+                for (row_id, score), record in zip(hits, records)
+            ])
+        return methodologies
 
 
 class CloudKnowledgeBase(KnowledgeBase):
     """云端知识库实现 (Dify API)"""
     
+    backend_name = "云端 (Dify)"
+    
     def __init__(self):
         self.base_url = os.getenv("DIFY_BASE_URL", "http://dify.dulicode.com/v1")
         self.api_key = os.getenv("DIFY_API_KEY")
@@ -337,7 +1052,8 @@ class CloudKnowledgeBase(KnowledgeBase):
                     "keywords": [item.get("title", "")]
                 })
             
-            async with httpx.AsyncClient() as client:
+            client = get_http_client(DIFY)
+            with metrics.span("dify"):
                 response = await client.post(
                     f"{self.base_url}/datasets/{self.dataset_id}/documents/{self.document_id}/segments",
                     headers={
@@ -347,14 +1063,14 @@ class CloudKnowledgeBase(KnowledgeBase):
                     json={"segments": segments},
                     timeout=30
                 )
-                response.raise_for_status()
-                result = response.json()
-                
-                return {
-                    "stored_count": len(result.get("data", [])),
-                    "results": result.get("data", [])
-                }
-                
+            response.raise_for_status()
+            result = response.json()
+            
+            return {
+                "stored_count": len(result.get("data", [])),
+                "results": result.get("data", [])
+            }
+            
         except Exception as e:
             raise McpError(ErrorData(
                 code=INTERNAL_ERROR,
@@ -364,7 +1080,8 @@ class CloudKnowledgeBase(KnowledgeBase):
     async def search_methodologies(self, query: str, top_k: int = 3) -> List[Dict[str, Any]]:
         """从云端知识库检索方法论"""
         try:
-            async with httpx.AsyncClient() as client:
+            client = get_http_client(DIFY)
+            with metrics.span("dify"):
                 response = await client.post(
                     f"{self.base_url}/datasets/{self.dataset_id}/retrieve",
                     headers={
@@ -380,20 +1097,21 @@ class CloudKnowledgeBase(KnowledgeBase):
                     },
                     timeout=30
                 )
-                response.raise_for_status()
-                result = response.json()
-                
-                methodologies = []
-                for record in result.get("records", []):
-                    segment = record.get("segment", {})
-                    methodologies.append({
-                        "title": ", ".join(segment.get("keywords", [])),
-                        "content": segment.get("content", ""),
-                        "score": record.get("score", 0)
-                    })
-                
-                return methodologies
-                
+            response.raise_for_status()
+            result = response.json()
+            
+            methodologies = []
+            for record in result.get("records", []):
+                segment = record.get("segment", {})
+                methodologies.append({
+                    "id": segment.get("id"),
+                    "title": ", ".join(segment.get("keywords", [])),
+                    "content": segment.get("content", ""),
+                    "score": record.get("score", 0)
+                })
+            
+            return methodologies
+            
         except Exception as e:
             raise McpError(ErrorData(
                 code=INTERNAL_ERROR,
@@ -401,18 +1119,113 @@ class CloudKnowledgeBase(KnowledgeBase):
             ))
 
 
+_knowledge_base: Optional[KnowledgeBase] = None
+
+
 def get_knowledge_base() -> KnowledgeBase:
-    """根据环境变量获取知识库实例"""
-    storage_type = os.getenv("KNOWLEDGE_STORAGE", "local").lower()
-    
-    if storage_type == "cloud":
-        return CloudKnowledgeBase()
-    else:
-        return LocalKnowledgeBase()
+    """根据环境变量获取知识库实例（进程内单例）"""
+    global _knowledge_base
+    if _knowledge_base is None:
+        storage_type = os.getenv("KNOWLEDGE_STORAGE", "local").lower()
+        
+        if storage_type == "cloud":
+            _knowledge_base = CloudKnowledgeBase()
+        elif storage_type == "numpy":
+            _knowledge_base = NumpyKnowledgeBase()
+        else:
+            _knowledge_base = LocalKnowledgeBase()
+    return _knowledge_base
 
 
-async def extract_methodology_from_content(content: str) -> str:
-    """从内容中萃取方法论"""
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_loaded = False
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """获取语义结果缓存，未启用 (SEMANTIC_CACHE) 时返回 None"""
+    global _semantic_cache, _semantic_cache_loaded
+    if not _semantic_cache_loaded:
+        _semantic_cache = SemanticCache.from_env()
+        _semantic_cache_loaded = True
+    return _semantic_cache
+
+
+def semantic_cache_generation() -> int:
+    """语义缓存当前的代数，检索前记录，写入结果时用于丢弃清空之前发起的请求"""
+    cache = get_semantic_cache()
+    return cache.generation if cache is not None else 0
+
+
+async def store_to_knowledge_base(kb: KnowledgeBase, methodology: str) -> Dict[str, Any]:
+    """存储方法论，有新方法论写入时使语义缓存失效（全部因重复被跳过时保留缓存）"""
+    result = await kb.store_methodology(methodology)
+    cache = get_semantic_cache()
+    if cache is not None and result.get("stored_count", 0) > 0:
+        cache.clear()
+    return result
+
+
+async def init_knowledge_base() -> None:
+    """服务启动时构建并预热知识库，失败时保留实例供首次调用重试"""
+    try:
+        kb = get_knowledge_base()
+        await kb.warmup()
+    except McpError as e:
+        logger.warning("知识库预热失败: %s", e.error.message)
+
+
+async def close_knowledge_base() -> None:
+    """服务退出时释放知识库资源"""
+    global _knowledge_base
+    if _knowledge_base is not None:
+        await _knowledge_base.close()
+        _knowledge_base = None
+
+
+_prewarm_task: Optional[asyncio.Task] = None
+
+
+def _import_extract_dependencies() -> None:
+    """导入正文提取依赖（readabilipy、markdownify）"""
+    import markdownify  # noqa: F401
+    import readabilipy.simple_json  # noqa: F401
+
+
+async def prewarm() -> None:
+    """后台预热：未启用正文提取进程池时在工作线程中导入提取依赖，然后构建并预热知识库
+
+    进程池在首次提取网页时才启动，不为从不抓取URL的会话额外启动进程。
+    """
+    started = time.perf_counter()
+    if get_extract_pool() is None:
+        await run_blocking(_import_extract_dependencies)
+    # 首个 httpx 客户端的创建会导入 httpcore/ssl 并加载证书（约 150ms），放到线程池中避免阻塞握手后的请求
+    await run_blocking(get_http_client, EMBEDDING)
+    await init_knowledge_base()
+    logger.info("后台预热完成，耗时 %.0fms", (time.perf_counter() - started) * 1000)
+
+
+def start_prewarm() -> None:
+    """握手完成后启动后台预热（PREWARM=false 时跳过，首次调用时再加载），只启动一次"""
+    global _prewarm_task
+    if _prewarm_task is not None:
+        return
+    if os.getenv("PREWARM", "true").lower() in ("0", "false", "no"):
+        return
+    _prewarm_task = asyncio.create_task(prewarm())
+
+
+async def stop_prewarm() -> None:
+    """服务退出时取消尚未完成的预热"""
+    global _prewarm_task
+    if _prewarm_task is not None:
+        _prewarm_task.cancel()
+        await asyncio.gather(_prewarm_task, return_exceptions=True)
+        _prewarm_task = None
+
+
+async def _extract_methodology_from_chunk(content: str) -> str:
+    """调用大模型萃取单段内容中的方法论"""
     system_prompt = """接下来扮演一个课程设计师，你的任务是从我提供文章内容中萃取方法论。
 你萃取的方法论必须是可操作、可执行的，它应该能让学员使用你萃取的方法论开展创作。
 一个参考的格式如下（输出时不包含代码块标识符）：
@@ -444,12 +1257,169 @@ async def extract_methodology_from_content(content: str) -> str:
     
     user_prompt = f"待萃取方法论的文章：\n<content>\n{content}\n</content>"
     
-    return await call_llm_api(system_prompt, user_prompt)
+    return await call_llm_api(system_prompt, user_prompt, priority=PRIORITY_BULK)
+
+
+async def extract_methodology_from_content(content: str) -> str:
+    """从内容中萃取方法论，长文档切块并发萃取后合并去重"""
+    max_tokens = int(os.getenv("EXTRACT_CHUNK_TOKENS", "6000"))
+    if estimate_tokens(content) <= max_tokens:
+        return await _extract_methodology_from_chunk(content)
+    
+    chunks = split_content(content, max_tokens)
+    semaphore = asyncio.Semaphore(int(os.getenv("EXTRACT_CONCURRENCY", "4")))
+    
+    async def extract(chunk: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            return parse_methodology_json(await _extract_methodology_from_chunk(chunk))
+    
+    results = await asyncio.gather(*(extract(chunk) for chunk in chunks), return_exceptions=True)
+    groups = []
+    errors = []
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            errors.append((index, result))
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            groups.append(result)
+    if not groups:
+        raise errors[0][1]
+    # 单段失败（大模型错误、超时等）只跳过该段，保留其余段的结果
+    for index, error in errors:
+        metrics.incr("extract_chunk_failures")
+        logger.warning("第 %d/%d 段萃取失败，已跳过: %s", index + 1, len(chunks), error)
+    return json.dumps(merge_methodologies(groups), ensure_ascii=False, indent=2)
+
+
+async def ingest_content(content: str) -> Tuple[str, Dict[str, Any]]:
+    """抓取（URL）→ 萃取 → 存储，返回 (萃取的方法论, 存储结果)"""
+    content = content.strip()
+    if is_url(content):
+        content = await fetch_url_content(content)
+    methodology = await extract_methodology_from_content(content)
+    storage_result = await store_to_knowledge_base(get_knowledge_base(), methodology)
+    return methodology, storage_result
+
+
+async def ingest_batch(contents: List[str]) -> List[Dict[str, Any]]:
+    """批量萃取：抓取、萃取、存储三个阶段各自限制并发，不同条目在各阶段间流水执行
+
+    返回每一项的摘要 {item, status, stored_count, skipped_count, seconds, error}。
+    """
+    fetch_slots = asyncio.Semaphore(int(os.getenv("BATCH_FETCH_CONCURRENCY", "16")))
+    extract_slots = asyncio.Semaphore(int(os.getenv("BATCH_EXTRACT_CONCURRENCY", "4")))
+    store_slots = asyncio.Semaphore(int(os.getenv("BATCH_STORE_CONCURRENCY", "1")))
+    kb = get_knowledge_base()
+    
+    async def process(item: str) -> Dict[str, Any]:
+        started = time.monotonic()
+        summary: Dict[str, Any] = {"item": item.strip(), "status": "success"}
+        try:
+            content = item.strip()
+            if is_url(content):
+                async with fetch_slots:
+                    content = await fetch_url_content(content)
+            async with extract_slots:
+                methodology = await extract_methodology_from_content(content)
+            async with store_slots:
+                storage_result = await store_to_knowledge_base(kb, methodology)
+            summary["stored_count"] = storage_result.get("stored_count", 0)
+            summary["skipped_count"] = storage_result.get("skipped_count", 0)
+        except Exception as e:
+            summary.update(status="failed", error=str(e))
+        summary["seconds"] = time.monotonic() - started
+        return summary
+    
+    # 按主机轮转启动顺序，避免同一网站的条目占满抓取并发名额
+    by_host: Dict[str, List[int]] = {}
+    for i, item in enumerate(contents):
+        by_host.setdefault(urlparse(item.strip()).hostname or "", []).append(i)
+    order = [
+        queue[round_index]
+        for round_index in range(max(len(queue) for queue in by_host.values()))
+        for queue in by_host.values() if round_index < len(queue)
+    ]
+    tasks = {i: asyncio.create_task(process(contents[i])) for i in order}
+    return [await tasks[i] for i in range(len(contents))]
+
+
+def format_batch_summary(summaries: List[Dict[str, Any]]) -> str:
+    """批量萃取的逐项摘要"""
+    lines = []
+    for i, summary in enumerate(summaries):
+        item = summary["item"][:80].replace("\n", " ")
+        if summary["status"] == "failed":
+            lines.append(f"{i + 1}. ✗ {item} - {summary['error']}")
+        else:
+            lines.append(
+                f"{i + 1}. ✓ {item} - 存储 {summary['stored_count']}，"
+                f"跳过重复 {summary['skipped_count']} ({summary['seconds']:.1f}s)"
+            )
+    return "\n".join(lines)
+
 
+async def _ingest_job_item(content: str) -> Dict[str, Any]:
+    """后台任务中处理单条内容"""
+    _, storage_result = await ingest_content(content)
+    return {
+        "stored_count": storage_result.get("stored_count", 0),
+        "skipped_count": storage_result.get("skipped_count", 0),
+    }
 
-async def enhance_prompt_with_methodology(user_input: str, methodologies: List[Dict[str, Any]]) -> str:
-    """使用方法论增强提示词"""
-    system_prompt = """扮演一名提示词工程师，根据我接下来为你提供的需求、相关方法论和示例，创建一个可以满足需求的提示词。
+
+_job_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    """获取后台萃取任务队列"""
+    if _job_queue is None:
+        raise McpError(ErrorData(
+            code=INVALID_PARAMS,
+            message="后台任务队列未启用，请设置 JOB_QUEUE=true"
+        ))
+    return _job_queue
+
+
+async def start_job_queue() -> None:
+    """启动后台任务队列（JOB_QUEUE=false 时跳过），恢复上次未完成的任务"""
+    global _job_queue
+    _job_queue = JobQueue.from_env(_ingest_job_item)
+    if _job_queue is not None:
+        await _job_queue.start()
+
+
+async def close_job_queue() -> None:
+    """停止后台任务队列"""
+    global _job_queue
+    if _job_queue is not None:
+        await _job_queue.stop()
+        _job_queue = None
+
+
+def format_job(job: Dict[str, Any], detailed: bool = False) -> str:
+    """任务状态文本"""
+    results = job["results"]
+    stored = sum(result.get("stored_count", 0) for result in results)
+    failed = sum(1 for result in results if result["status"] == "failed")
+    created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job["created_at"]))
+    text = (
+        f"- {job['id']} [{job['status']}] 进度 {len(results)}/{len(job['items'])}，"
+        f"存储 {stored} 条，失败 {failed} 项，提交于 {created}"
+    )
+    if detailed:
+        for result in sorted(results, key=lambda result: result["index"]):
+            if result["status"] == "failed":
+                text += f"\n  {result['index'] + 1}. 失败: {result['item'][:80]} - {result.get('error', '')}"
+            else:
+                text += (
+                    f"\n  {result['index'] + 1}. 成功: {result['item'][:80]} "
+                    f"(存储 {result.get('stored_count', 0)}，跳过重复 {result.get('skipped_count', 0)})"
+                )
+    return text
+
+
+ENHANCE_SYSTEM_PROMPT = """扮演一名提示词工程师，根据我接下来为你提供的需求、相关方法论和示例，创建一个可以满足需求的提示词。
 ## 创作方法
 1. 分析需求：理解或挖掘需求的背景和目标，尽可能详细的提供在提示词中，但不要意向编造需求中未描述的信息；
 2. 方法论挑选：我会为你提供 0-3个与用户需求相关的方法论，你可以选择其中 1 个或整合多个，放在提示词中。如果接下来的信息中不包含方法论，使用你的自有知识，选择合适的理论增强提示。
@@ -475,16 +1445,10 @@ async def enhance_prompt_with_methodology(user_input: str, methodologies: List[D
 {
 "prompt":"增强的提示词，确保具备更强的引导性"
 }"""
-    
-    # 构建方法论字符串
-    methodology_text = ""
-    if methodologies:
-        methodology_text = "\n".join([
-            f"方法论{i+1}: {method['title']}\n{method['content']}\n"
-            for i, method in enumerate(methodologies)
-        ])
-    
-    user_prompt = f"""用户需求：
+
+
+def _build_enhance_user_prompt(user_input: str, methodology_text: str) -> str:
+    return f"""用户需求：
 <user_query>
 {user_input}
 </user_query>
@@ -492,8 +1456,139 @@ async def enhance_prompt_with_methodology(user_input: str, methodologies: List[D
 <methodology>
 {methodology_text}
 </methodology>"""
+
+
+def pack_enhance_context(
+    user_input: str, methodologies: List[Dict[str, Any]], max_items: int
+) -> PackResult:
+    """按提示词 token 预算 (PROMPT_TOKEN_BUDGET) 挑选并裁剪方法论
+
+    预算包含系统提示词与用户需求，剩余部分留给方法论；预算为 0 时不限制长度。
+    """
+    budget = int(os.getenv("PROMPT_TOKEN_BUDGET", "4000"))
+    fixed = count_tokens(ENHANCE_SYSTEM_PROMPT) + count_tokens(_build_enhance_user_prompt(user_input, ""))
+    result = pack_methodologies(
+        methodologies,
+        max(budget - fixed, 0) if budget > 0 else sys.maxsize,
+        max_items,
+        mmr_lambda=float(os.getenv("PROMPT_MMR_LAMBDA", "0.7")),
+        trim_sections=[
+            name.strip() for name in os.getenv("PROMPT_TRIM_SECTIONS", "细节和示例").split(",") if name.strip()
+        ],
+        min_tokens=int(os.getenv("PROMPT_MIN_METHOD_TOKENS", "200")),
+    )
+    result.budget = budget
+    result.tokens += fixed
+    return result
+
+
+async def enhance_prompt_with_methodology(
+    user_input: str,
+    methodologies: List[Dict[str, Any]],
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> str:
+    """使用方法论增强提示词，on_delta 用于接收流式输出"""
+    methodology_text = render_methodologies(methodologies) if methodologies else ""
+    user_prompt = _build_enhance_user_prompt(user_input, methodology_text)
+    return await call_llm_api(ENHANCE_SYSTEM_PROMPT, user_prompt, on_delta=on_delta)
+
+
+async def enhance_prompt_cached(
+    user_input: str,
+    methodologies: List[Dict[str, Any]],
+    query_embedding: Optional[List[float]],
+    generation: int,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> Tuple[str, bool]:
+    """带语义缓存的提示词增强，返回 (增强结果, 是否命中缓存)
+
+    query_embedding 为检索时生成的查询向量，generation 为检索前的语义缓存代数（semantic_cache_generation）。
+    """
+    cache = get_semantic_cache()
+    if cache is None or query_embedding is None:
+        return await enhance_prompt_with_methodology(user_input, methodologies, on_delta), False
+    
+    model_name = os.getenv("LLM_MODEL_NAME", "gpt-3.5-turbo")
+    methodology_ids = [method.get("id") for method in methodologies]
+    cached = cache.get(model_name, methodology_ids, query_embedding)
+    if cached is not None:
+        metrics.incr("semantic_cache_hits")
+        return cached, True
+    metrics.incr("semantic_cache_misses")
+    
+    enhanced_prompt = await enhance_prompt_with_methodology(user_input, methodologies, on_delta)
+    cache.put(model_name, methodology_ids, query_embedding, enhanced_prompt, generation)
+    return enhanced_prompt, False
+
+
+async def enhance_prompt_batch(
+    kb: KnowledgeBase,
+    user_inputs: List[str],
+    top_k: int,
+    on_result: Optional[Callable[[str], Awaitable[None]]] = None,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """批量增强提示词，返回 (逐项结果, 不重复的方法论数量)
+
+    所有查询一次批量嵌入和检索；多个查询命中的同一方法论只保留一份；
+    大模型调用按 BATCH_ENHANCE_CONCURRENCY 限制并发，每完成一项通过 on_result 推送。
+    """
+    candidate_factor = int(os.getenv("PROMPT_CANDIDATE_FACTOR", "2"))
+    generation = semantic_cache_generation()
+    candidate_lists, query_embeddings = await kb.search_methodologies_with_embeddings(
+        user_inputs, top_k * candidate_factor
+    )
+    
+    # 按ID共享方法论内容，各查询只保留自己的检索分数
+    shared: Dict[Any, Dict[str, Any]] = {}
+    for candidates in candidate_lists:
+        for i, method in enumerate(candidates):
+            key = method.get("id")
+            if key is None:
+                key = method["title"], method["content"]
+            canonical = shared.setdefault(key, method)
+            candidates[i] = {**canonical, "score": method.get("score", 0)}
+    
+    semaphore = asyncio.Semaphore(int(os.getenv("BATCH_ENHANCE_CONCURRENCY", "4")))
     
-    return await call_llm_api(system_prompt, user_prompt)
+    async def enhance(index: int) -> Dict[str, Any]:
+        user_input = user_inputs[index]
+        result: Dict[str, Any] = {"index": index, "user_input": user_input}
+        try:
+            packed = pack_enhance_context(user_input, candidate_lists[index], top_k)
+            async with semaphore:
+                enhanced_prompt, cache_hit = await enhance_prompt_cached(
+                    user_input,
+                    packed.methodologies,
+                    query_embeddings[index] if query_embeddings is not None else None,
+                    generation,
+                )
+            result.update(
+                status="success",
+                prompt=enhanced_prompt,
+                methodology_count=len(packed.methodologies),
+                tokens=packed.tokens,
+                cache_hit=cache_hit,
+            )
+        except Exception as e:
+            result.update(status="failed", error=str(e))
+        if on_result is not None:
+            await on_result(format_enhance_result(result))
+        return result
+    
+    results = await asyncio.gather(*(enhance(i) for i in range(len(user_inputs))))
+    return list(results), len(shared)
+
+
+def format_enhance_result(result: Dict[str, Any]) -> str:
+    """批量增强的单项结果文本"""
+    header = f"### {result['index'] + 1}. {result['user_input'][:80]}"
+    if result["status"] == "failed":
+        return f"{header}\n失败: {result['error']}"
+    cache_note = "，语义缓存命中" if result["cache_hit"] else ""
+    return (
+        f"{header}\n方法论 {result['methodology_count']} 条，提示词 token {result['tokens']}{cache_note}\n"
+        f"{result['prompt']}"
+    )
 
 
 async def serve() -> None:
@@ -502,7 +1597,7 @@ async def serve() -> None:
     
     @server.list_tools()
     async def list_tools() -> List[Tool]:
-        return [
+        tools = [
             Tool(
                 name="extract_methodology",
                 description="""从文本或URL中萃取方法论并存储到知识库。
@@ -525,29 +1620,80 @@ async def serve() -> None:
 3. 结合检索到的方法论使用AI生成增强的提示词
 4. 返回更专业、更具指导性的提示内容""",
                 inputSchema=EnhanceRequest.model_json_schema(),
-            )
+            ),
+            Tool(
+                name="enhance_prompt_batch",
+                description="""批量生成增强的提示词。
+
+这个工具可以：
+1. 一次接收多条原始提示词
+2. 批量生成查询向量并一次检索全部查询的相关方法论
+3. 并发调用AI生成增强的提示词，客户端提供 progressToken 时每完成一条即通过进度通知推送
+4. 按输入顺序返回全部结果""",
+                inputSchema=BatchEnhanceRequest.model_json_schema(),
+            ),
+            Tool(
+                name="extract_methodology_batch",
+                description="""批量从多条文本或URL中萃取方法论并存储到知识库。
+
+这个工具可以：
+1. 一次接收多条文本内容或URL链接
+2. 抓取、萃取、存储分阶段并发流水执行，同一网站的请求限制并发数和间隔
+3. 返回每一项的简要结果（存储数量、跳过重复数量或错误原因）""",
+                inputSchema=BatchExtractRequest.model_json_schema(),
+            ),
         ]
+        if _job_queue is not None:
+            # 任务队列需通过 JOB_QUEUE=true 启用，未启用时不列出相关工具
+            tools.extend([
+                Tool(
+                    name="submit_extract_job",
+                    description="""提交后台萃取任务，立即返回任务ID。
+
+适合批量或耗时较长的萃取：
+1. 接收多条文本内容或URL链接
+2. 后台逐条抓取、萃取方法论并存储到知识库，服务重启后自动继续
+3. 使用 get_extract_job 查询进度和结果""",
+                    inputSchema=SubmitExtractJobRequest.model_json_schema(),
+                ),
+                Tool(
+                    name="get_extract_job",
+                    description="""查询后台萃取任务的状态。
+
+提供任务ID时返回该任务每一项的处理结果，否则列出最近的任务（可按状态筛选）。""",
+                    inputSchema=ExtractJobStatusRequest.model_json_schema(),
+                ),
+            ])
+        if metrics.is_enabled():
+            tools.append(Tool(
+                name="get_metrics",
+                description="以 Prometheus 文本格式返回各阶段耗时分布与缓存命中、重试、token 等计数。",
+                inputSchema={"type": "object", "properties": {}},
+            ))
+        return tools
     
     @server.call_tool()
     async def call_tool(name: str, arguments: dict) -> List[TextContent]:
+        trace = metrics.tool_trace(name)
+        if trace is None:
+            return await handle_tool(name, arguments)
+        with trace:
+            result = await handle_tool(name, arguments)
+        # METRICS_TRAILER=true 时在结果末尾附加本次调用的阶段耗时
+        if name != "get_metrics" and os.getenv("METRICS_TRAILER", "false").lower() in ("1", "true", "yes"):
+            result.append(TextContent(type="text", text=f"[metrics] {trace.summary()}"))
+        return result
+    
+    async def handle_tool(name: str, arguments: dict) -> List[TextContent]:
         if name == "extract_methodology":
             try:
                 args = ExtractRequest(**arguments)
             except ValueError as e:
                 raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
             
-            # 获取内容
-            content = args.content.strip()
-            if is_url(content):
-                # 是URL，提取网页内容
-                content = await fetch_url_content(content)
-            
-            # 萃取方法论
-            methodology = await extract_methodology_from_content(content)
-            
-            # 存储到知识库
+            # 获取内容（URL 自动提取网页正文）、萃取方法论并存储到知识库
             kb = get_knowledge_base()
-            storage_result = await kb.store_methodology(methodology)
+            methodology, storage_result = await ingest_content(args.content)
             
             result_text = f"""萃取完成！
 
@@ -555,8 +1701,9 @@ async def serve() -> None:
 {methodology}
 
 存储结果：
-- 存储方式: {'云端 (Dify)' if isinstance(kb, CloudKnowledgeBase) else '本地 (Milvus Lite)'}
+- 存储方式: {kb.backend_name}
 - 存储数量: {storage_result['stored_count']}
+- 跳过重复: {storage_result.get('skipped_count', 0)}
 - 状态: 成功"""
             
             return [TextContent(type="text", text=result_text)]
@@ -569,33 +1716,189 @@ async def serve() -> None:
             
             # 从知识库检索相关方法论
             kb = get_knowledge_base()
-            methodologies = await kb.search_methodologies(args.user_input, args.top_k)
+            candidate_factor = int(os.getenv("PROMPT_CANDIDATE_FACTOR", "2"))
+            generation = semantic_cache_generation()
+            candidate_lists, query_embeddings = await kb.search_methodologies_with_embeddings(
+                [args.user_input], args.top_k * candidate_factor
+            )
+            candidates = candidate_lists[0]
+            
+            # 按 token 预算挑选、裁剪方法论，使大模型调用的延迟和成本有上限
+            packed = pack_enhance_context(args.user_input, candidates, args.top_k)
+            methodologies = packed.methodologies
             
-            # 生成增强提示词
-            enhanced_prompt = await enhance_prompt_with_methodology(args.user_input, methodologies)
+            # 生成增强提示词（启用语义缓存时相似请求直接复用结果）
+            # 客户端提供 progressToken 时以进度通知的形式推送流式输出
+            enhanced_prompt, cache_hit = await enhance_prompt_cached(
+                args.user_input,
+                methodologies,
+                query_embeddings[0] if query_embeddings is not None else None,
+                generation,
+                make_progress_reporter(server),
+            )
             
+            cache_note = "\n语义缓存: 命中" if cache_hit else ""
+            budget_text = f" / 预算 {packed.budget}" if packed.budget > 0 else ""
+            trim_note = f"\n已裁剪: {', '.join(packed.trimmed)}" if packed.trimmed else ""
             result_text = f"""提示词增强完成！
 
-检索到的相关方法论数量: {len(methodologies)}
-检索方式: {'云端 (Dify)' if isinstance(kb, CloudKnowledgeBase) else '本地 (Milvus Lite)'}
+检索到的相关方法论数量: {len(candidates)}，使用: {len(methodologies)}
+检索方式: {kb.backend_name}{cache_note}
+提示词 token: {packed.tokens}{budget_text}{trim_note}
 
 增强后的提示词：
 {enhanced_prompt}"""
             
             return [TextContent(type="text", text=result_text)]
         
+        elif name == "enhance_prompt_batch":
+            try:
+                args = BatchEnhanceRequest(**arguments)
+            except ValueError as e:
+                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
+            
+            kb = get_knowledge_base()
+            started = time.monotonic()
+            results, unique_count = await enhance_prompt_batch(
+                kb, args.user_inputs, args.top_k, make_item_reporter(server, len(args.user_inputs))
+            )
+            succeeded = sum(1 for result in results if result["status"] == "success")
+            body = "\n\n".join(format_enhance_result(result) for result in results)
+            result_text = f"""批量提示词增强完成！
+
+- 检索方式: {kb.backend_name}
+- 成功: {succeeded}/{len(results)}
+- 涉及方法论: {unique_count}
+- 耗时: {time.monotonic() - started:.1f}s
+
+{body}"""
+            
+            return [TextContent(type="text", text=result_text)]
+        
+        elif name == "extract_methodology_batch":
+            try:
+                args = BatchExtractRequest(**arguments)
+            except ValueError as e:
+                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
+            
+            kb = get_knowledge_base()
+            started = time.monotonic()
+            summaries = await ingest_batch(args.contents)
+            succeeded = [summary for summary in summaries if summary["status"] == "success"]
+            result_text = f"""批量萃取完成！
+
+- 存储方式: {kb.backend_name}
+- 成功: {len(succeeded)}/{len(summaries)}
+- 存储数量: {sum(summary['stored_count'] for summary in succeeded)}
+- 跳过重复: {sum(summary['skipped_count'] for summary in succeeded)}
+- 耗时: {time.monotonic() - started:.1f}s
+
+{format_batch_summary(summaries)}"""
+            
+            return [TextContent(type="text", text=result_text)]
+        
+        elif name == "submit_extract_job":
+            try:
+                args = SubmitExtractJobRequest(**arguments)
+            except ValueError as e:
+                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
+            
+            queue = get_job_queue()
+            job_id = await queue.submit(args.contents)
+            result_text = f"""任务已提交！
+
+任务ID: {job_id}
+内容数量: {len(args.contents)}
+排队中的任务: {queue.pending()}
+
+使用 get_extract_job 查询进度。"""
+            
+            return [TextContent(type="text", text=result_text)]
+        
+        elif name == "get_extract_job":
+            try:
+                args = ExtractJobStatusRequest(**arguments)
+            except ValueError as e:
+                raise McpError(ErrorData(code=INVALID_PARAMS, message=str(e)))
+            
+            queue = get_job_queue()
+            if args.job_id:
+                job = await queue.get(args.job_id)
+                if job is None:
+                    raise McpError(ErrorData(code=INVALID_PARAMS, message=f"任务不存在: {args.job_id}"))
+                result_text = f"任务状态：\n{format_job(job, detailed=True)}"
+            else:
+                jobs = await queue.list(args.status, args.limit)
+                lines = "\n".join(format_job(job) for job in jobs) or "（无任务）"
+                result_text = f"最近的任务：\n{lines}"
+            
+            return [TextContent(type="text", text=result_text)]
+        
+        elif name == "get_metrics" and metrics.is_enabled():
+            return [TextContent(type="text", text=metrics.render_prometheus())]
+        
         else:
             raise McpError(ErrorData(
                 code=INVALID_PARAMS,
                 message=f"未知的工具: {name}"
             ))
     
-    # 创建服务器初始化选项
-    options = server.create_initialization_options()
+    # 知识库在握手完成（客户端发送 initialized 通知）后于后台预热，
+    # 不阻塞 initialize 响应；预热完成前的调用会在首次使用时按需初始化同一实例
+    async def on_initialized(notification: InitializedNotification) -> None:
+        start_prewarm()
     
-    # 运行服务器
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, options, raise_exceptions=True)
+    server.notification_handlers[InitializedNotification] = on_initialized
+    
+    # 传输方式: stdio（默认，每个客户端启动一个进程）或 http（常驻进程服务多个客户端）
+    transport = os.getenv("MCP_TRANSPORT", "stdio").lower()
+    if transport == "http":
+        from .http_transport import serve_http
+        
+        # 常驻服务无需等待握手，启动后立即预热
+        await serve_http(server, lambda: service_lifecycle(prewarm=True))
+    elif transport == "stdio":
+        async with service_lifecycle():
+            async with stdio_server() as (read_stream, write_stream):
+                await server.run(
+                    read_stream, write_stream, server.create_initialization_options(), raise_exceptions=True
+                )
+    else:
+        raise ValueError(f"不支持的传输方式: {transport}，可选 stdio 或 http")
+
+
+@asynccontextmanager
+async def service_lifecycle(prewarm: bool = False) -> AsyncIterator[None]:
+    """启动并在退出时释放所有会话共享的资源（知识库、连接池、缓存、任务队列等）"""
+    # 可选的事件循环延迟监控 (LOOP_LAG_MONITOR=true)
+    lag_monitor = LoopLagMonitor.from_env()
+    if lag_monitor is not None:
+        lag_monitor.start()
+    
+    # 可选的分阶段计时与计数 (METRICS=true)，METRICS_FILE 设置时定期写入 Prometheus 文本
+    metrics.configure_from_env()
+    metrics_writer = metrics.MetricsFileWriter.from_env()
+    if metrics_writer is not None:
+        metrics_writer.start()
+    
+    try:
+        # 后台萃取任务队列
+        await start_job_queue()
+        if prewarm:
+            start_prewarm()
+        yield
+    finally:
+        await stop_prewarm()
+        if lag_monitor is not None:
+            await lag_monitor.stop()
+        if metrics_writer is not None:
+            await metrics_writer.stop()
+        await close_job_queue()
+        await close_knowledge_base()
+        await close_extract_pool()
+        close_fetch_cache()
+        await close_http_clients()
+        shutdown_executor()
 
 
 async def main():
@@ -0,0 +1,513 @@
+"""基于 NumPy 的进程内向量存储
+
+磁盘布局（目录内）：
+- vectors.npy      已压缩的 L2 归一化 float32 矩阵，以只读内存映射方式打开；
+                   文件按容量预分配，有效行数记录在 store.json 的 base_rows 中
+- vectors.append   压缩后追加的向量（原始 float32 字节，追加写）
+- metadata.jsonl   每行一条元数据 {"id", "title", "content"}，与向量行一一对应；
+                   内存中只保存每行的字节偏移，按需从文件读取（正文远大于向量本身）
+
+写入时先追加向量再追加元数据，加载时以元数据行数为准，
+因此中途崩溃最多丢失最后一批未写完的数据。压缩时只把追加的向量写入 vectors.npy 的预留空间，
+写完后再更新 base_rows；容量不足时按倍数扩容（写临时文件后原子替换），总写入量与数据量成线性关系。
+
+index="ivf" 时在数据量达到 ivf_min_rows 后训练 IVF 近似索引（见 ivf_index.py），
+此后检索只扫描 nprobe 个聚类，新写入的向量增量归入索引；数据量增长到上次训练时的
+ivf_retrain_factor 倍后重新训练，避免早期数据上拟合的聚类中心服务整个语料。
+
+quantization 为 int8/binary 时在内存中保存量化码（见 quantization.py），
+检索先用量化码对全部向量（或 IVF 选中的聚类内的向量，即 IVF-SQ）粗筛 top_k * rescore_factor 条，
+再用全精度向量重新打分。
+量化方式记录在目录下的 store.json 中，打开时指定不同的方式会自动迁移（重建量化码）。
+新向量超出 int8 缩放范围时，下次压缩会重新拟合并编码全部向量。
+"""
+
+import json
+import os
+import threading
+from array import array as Array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .ivf_index import IVFIndex, sample_recall
+from .quantization import Quantizer, make_quantizer
+
+VECTORS_FILE = "vectors.npy"
+APPEND_FILE = "vectors.append"
+METADATA_FILE = "metadata.jsonl"
+CONFIG_FILE = "store.json"
+CODES_FILE = "codes.npy"
+
+# 预分配文件与内存中量化码的最小容量（行），扩容时至少翻倍
+_MIN_CAPACITY = 1024
+_COPY_ROWS = 65536
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行 L2 归一化"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """对每行分数取前 top_k 个下标（降序）"""
+    count = scores.shape[1]
+    if count == 0 or top_k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    k = min(top_k, count)
+    if k < count:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(count), (scores.shape[0], 1))
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def _open_rows(path: str, rows: Optional[int]) -> np.ndarray:
+    """以只读内存映射打开预分配的 .npy 文件，返回前 rows 行（None 表示整个文件，兼容未预分配的旧文件）"""
+    array = np.load(path, mmap_mode="r")
+    return array if rows is None else array[:min(rows, len(array))]
+
+
+def _write_rows(path: str, rows: int, array: np.ndarray) -> None:
+    """把 array 写入 .npy 文件第 rows 行起的位置
+
+    容量足够时原地写入预留空间；否则按至少两倍的容量新建文件，复制前 rows 行后原子替换。
+    """
+    needed = rows + len(array)
+    existing = np.load(path, mmap_mode="r+") if os.path.exists(path) else None
+    if (
+        existing is not None
+        and len(existing) >= needed
+        and existing.dtype == array.dtype
+        and existing.shape[1:] == array.shape[1:]
+    ):
+        existing[rows:needed] = array
+        existing.flush()
+        return
+    capacity = max(needed, 2 * (len(existing) if existing is not None else 0), _MIN_CAPACITY)
+    tmp_path = path + ".tmp.npy"
+    grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=array.dtype, shape=(capacity, *array.shape[1:]))
+    for start in range(0, rows, _COPY_ROWS):
+        stop = min(rows, start + _COPY_ROWS)
+        grown[start:stop] = existing[start:stop]
+    grown[rows:needed] = array
+    grown.flush()
+    del grown, existing
+    os.replace(tmp_path, path)
+
+
+class NumpyVectorStore:
+    """追加写入、内存映射读取的向量矩阵，余弦相似度暴力检索"""
+
+    def __init__(
+        self,
+        directory: str,
+        dimension: int = 768,
+        compact_threshold: int = 1024,
+        index: str = "flat",
+        nlist: int = 0,
+        nprobe: int = 0,
+        ivf_min_rows: int = 20000,
+        ivf_target_recall: float = 0.9,
+        ivf_retrain_factor: float = 4.0,
+        quantization: Optional[str] = None,
+        rescore_factor: int = 10,
+    ):
+        self.directory = directory
+        self.dimension = dimension
+        self.compact_threshold = compact_threshold
+        self.ivf_min_rows = ivf_min_rows
+        self.ivf_retrain_factor = ivf_retrain_factor
+        self.rescore_factor = rescore_factor
+        self._lock = threading.Lock()
+        self._ivf: Optional[IVFIndex] = (
+            IVFIndex(directory, nlist, nprobe, ivf_target_recall) if index == "ivf" else None
+        )
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        if self._ivf is not None:
+            self._load_ivf()
+        self._load_quantization(quantization)
+
+    def _read_config(self) -> Dict[str, Any]:
+        path = self._path(CONFIG_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_config(self, config: Dict[str, Any]) -> None:
+        path = self._path(CONFIG_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(config, f)
+        os.replace(path + ".tmp", path)
+
+    def _update_config(self, **values: Any) -> None:
+        self._write_config({**self._read_config(), **values})
+
+    def _load_quantization(self, quantization: Optional[str]) -> None:
+        """加载量化码；未指定时沿用 store.json 中的设置，与已有设置不同时迁移"""
+        config = self._read_config()
+        stored = config.get("quantization", "none")
+        name = (quantization or stored).lower()
+        self._quantizer: Optional[Quantizer] = make_quantizer(name)
+        self._codes: Optional[np.ndarray] = None
+        # 预分配的量化码缓冲区，self._codes 为其前 len 行的视图
+        self._code_buffer: Optional[np.ndarray] = None
+        # 已写入 codes.npy 的行数
+        self._code_rows = 0
+        self._refit_codes = False
+        if self._quantizer is not None:
+            codes_path = self._path(CODES_FILE)
+            reuse = name == stored and os.path.exists(codes_path) and self._quantizer.load(self.directory)
+            if reuse:
+                codes = _open_rows(codes_path, config.get("code_rows"))
+                if len(codes) <= len(self._offsets):
+                    self._codes = self._code_buffer = np.array(codes)
+                    self._code_rows = len(codes)
+                    if len(codes) < len(self._offsets):
+                        missing = np.arange(len(codes), len(self._offsets))
+                        self._append_codes(self._quantizer.encode(self.vectors(missing)))
+            if self._codes is None:
+                self._build_codes()
+        if name != stored or not os.path.exists(self._path(CONFIG_FILE)):
+            self._update_config(dimension=self.dimension, quantization=name)
+            if self._quantizer is None and os.path.exists(self._path(CODES_FILE)):
+                os.remove(self._path(CODES_FILE))
+
+    def _build_codes(self) -> None:
+        """对全部向量重新拟合量化参数并编码"""
+        count = len(self._offsets)
+        all_ids = np.arange(count)
+        sample = self.vectors(all_ids[:: max(1, count // 100000)])
+        self._quantizer.fit(sample if count else np.empty((0, self.dimension), dtype=np.float32))
+        codes = [
+            self._quantizer.encode(self.vectors(all_ids[start:start + 65536]))
+            for start in range(0, count, 65536)
+        ]
+        self._codes = self._code_buffer = np.concatenate(codes) if codes else self._quantizer.encode(
+            np.empty((0, self.dimension), dtype=np.float32)
+        )
+        # 重新编码后整个文件重写
+        path = self._path(CODES_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+        self._code_rows = 0
+        self._save_codes()
+
+    def _append_codes(self, codes: np.ndarray) -> None:
+        """追加量化码：缓冲区按倍数扩容，检索中持有的旧视图不受影响"""
+        count = len(self._codes)
+        needed = count + len(codes)
+        buffer = self._code_buffer
+        if needed > len(buffer):
+            buffer = np.empty((max(needed, 2 * len(buffer), _MIN_CAPACITY), *codes.shape[1:]), dtype=codes.dtype)
+            buffer[:count] = self._codes
+            self._code_buffer = buffer
+        buffer[count:needed] = codes
+        self._codes = buffer[:needed]
+
+    def _save_codes(self) -> None:
+        """把上次保存后新增的量化码写入 codes.npy"""
+        if self._codes is None:
+            return
+        self._quantizer.save(self.directory)
+        if len(self._codes) > self._code_rows or not os.path.exists(self._path(CODES_FILE)):
+            _write_rows(self._path(CODES_FILE), self._code_rows, self._codes[self._code_rows:])
+            self._code_rows = len(self._codes)
+            self._update_config(code_rows=self._code_rows)
+
+    @property
+    def quantization(self) -> str:
+        return self._quantizer.name if self._quantizer is not None else "none"
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        base_path = self._path(VECTORS_FILE)
+        if os.path.exists(base_path):
+            self._base = _open_rows(base_path, self._read_config().get("base_rows"))
+        else:
+            self._base = np.empty((0, self.dimension), dtype=np.float32)
+
+        # 每行元数据在 metadata.jsonl 中的起始偏移
+        self._offsets = Array("q")
+        end = 0
+        metadata_path = self._path(METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # 最后一行写入不完整
+                        break
+                    self._offsets.append(end)
+                    end += len(line)
+            if os.path.getsize(metadata_path) > end:
+                # 截掉不完整的行，之后追加的元数据才能与行号对齐
+                os.truncate(metadata_path, end)
+
+        tail = np.empty((0, self.dimension), dtype=np.float32)
+        append_path = self._path(APPEND_FILE)
+        if os.path.exists(append_path):
+            raw = np.fromfile(append_path, dtype=np.float32)
+            rows = raw.size // self.dimension
+            tail = raw[:rows * self.dimension].reshape(rows, self.dimension)
+
+        # 以元数据为准对齐向量：压缩替换后未清空的追加文件、未写完元数据的向量都会被忽略
+        expected_tail = max(0, len(self._offsets) - len(self._base))
+        self._tail = np.ascontiguousarray(tail[:expected_tail])
+        total = len(self._base) + len(self._tail)
+        if len(self._offsets) > total:
+            os.truncate(metadata_path, self._offsets[total])
+            del self._offsets[total:]
+        self._rewrite_append_file()
+
+    def _rewrite_append_file(self) -> None:
+        """使追加文件与内存中的尾部向量一致"""
+        append_path = self._path(APPEND_FILE)
+        tmp_path = append_path + ".tmp"
+        self._tail.astype(np.float32).tofile(tmp_path)
+        os.replace(tmp_path, append_path)
+
+    def _load_ivf(self) -> None:
+        """加载 IVF 索引并补齐上次保存后新增的向量"""
+        count = len(self._offsets)
+        if self._ivf.load() and len(self._ivf) <= count:
+            if len(self._ivf) < count:
+                missing = np.arange(len(self._ivf), count)
+                self._ivf.add(len(self._ivf), self.vectors(missing))
+            if self._needs_retrain():
+                self._train_ivf()
+        elif count >= self.ivf_min_rows:
+            self._train_ivf()
+
+    def _train_ivf(self) -> None:
+        """训练新的 IVF 索引后整体替换，训练期间检索继续使用旧索引"""
+        current = self._ivf
+        index = IVFIndex(
+            self.directory,
+            current.nlist,
+            0 if current.auto_nprobe else current.nprobe,
+            current.target_recall,
+        )
+        index.train(self.matrix())
+        index.save()
+        self._ivf = index
+
+    def _needs_retrain(self) -> bool:
+        ivf = self._ivf
+        return (
+            ivf.is_trained
+            and self.ivf_retrain_factor > 1
+            and len(self._offsets) >= ivf.trained_rows * self.ivf_retrain_factor
+        )
+
+    def rebuild_index(self) -> None:
+        """按当前全部数据重新训练 IVF 索引（并重新校准 nprobe）"""
+        with self._lock:
+            if self._ivf is not None and len(self._offsets):
+                self._compact_locked()
+                self._train_ivf()
+
+    def index_info(self) -> Dict[str, Any]:
+        """当前检索方式的概要，供基准测试和排查使用"""
+        ivf = self._ivf
+        info: Dict[str, Any] = {"rows": len(self._offsets), "quantization": self.quantization, "index": "flat"}
+        if ivf is not None:
+            info["index"] = "ivf"
+            info["ivf_trained"] = ivf.is_trained
+            if ivf.is_trained:
+                info.update(
+                    nlist=len(ivf.centroids),
+                    nprobe=ivf.nprobe,
+                    trained_rows=ivf.trained_rows,
+                    calibrated_recall=ivf.calibrated_recall,
+                )
+        return info
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @property
+    def append_rows(self) -> int:
+        return len(self._tail)
+
+    def matrix(self) -> np.ndarray:
+        """全部向量（压缩部分为内存映射，仅在有追加数据时拼接）"""
+        if len(self._tail) == 0:
+            return self._base
+        return np.concatenate([self._base, self._tail])
+
+    def add(self, vectors: Sequence[Sequence[float]], metadata: Sequence[Dict[str, Any]]) -> List[int]:
+        """追加向量与元数据，返回行号作为ID"""
+        array = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension))
+        with self._lock:
+            start = len(self._offsets)
+            ids = list(range(start, start + len(array)))
+            with open(self._path(APPEND_FILE), "ab") as f:
+                f.write(array.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            lines = [
+                (json.dumps({**meta, "id": row_id}, ensure_ascii=False) + "\n").encode("utf-8")
+                for meta, row_id in zip(metadata, ids)
+            ]
+            with open(self._path(METADATA_FILE), "ab") as f:
+                offset = f.tell()
+                f.write(b"".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._tail = np.concatenate([self._tail, array]) if len(self._tail) else array
+            for line in lines:
+                self._offsets.append(offset)
+                offset += len(line)
+            if self._codes is not None:
+                if self._quantizer.needs_refit(array):
+                    self._refit_codes = True
+                self._append_codes(self._quantizer.encode(array))
+            if self._ivf is not None:
+                if self._ivf.is_trained:
+                    self._ivf.add(start, array)
+                if (
+                    not self._ivf.is_trained and len(self._offsets) >= self.ivf_min_rows
+                ) or self._needs_retrain():
+                    # 先合并追加数据，训练时直接读取内存映射的矩阵
+                    self._compact_locked()
+                    self._train_ivf()
+            if len(self._tail) >= self.compact_threshold:
+                self._compact_locked()
+        return ids
+
+    def compact(self, requantize: bool = False) -> None:
+        """把追加的向量合并进 vectors.npy；requantize=True 时重新拟合量化参数并编码全部向量"""
+        with self._lock:
+            if requantize and self._codes is not None:
+                self._refit_codes = True
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        if self._refit_codes:
+            self._refit_codes = False
+            self._build_codes()
+        if len(self._tail) == 0:
+            return
+        base_path = self._path(VECTORS_FILE)
+        rows = len(self._base) + len(self._tail)
+        _write_rows(base_path, len(self._base), self._tail)
+        self._save_codes()
+        # 向量写完后才记录有效行数，中途崩溃时仍以追加文件中的数据为准
+        self._update_config(base_rows=rows)
+        self._base = _open_rows(base_path, rows)
+        self._tail = np.empty((0, self.dimension), dtype=np.float32)
+        self._rewrite_append_file()
+        if self._ivf is not None:
+            self._ivf.save()
+
+    def get(self, row_id: int) -> Dict[str, Any]:
+        """从 metadata.jsonl 读取一行元数据"""
+        return self.get_many([row_id])[0]
+
+    def get_many(self, row_ids: Sequence[int]) -> List[Dict[str, Any]]:
+        """按行号读取多行元数据（按偏移排序读取，结果与 row_ids 顺序一致）"""
+        offsets = [self._offsets[row_id] for row_id in row_ids]
+        records: Dict[int, Dict[str, Any]] = {}
+        with open(self._path(METADATA_FILE), "rb") as f:
+            for offset in sorted(set(offsets)):
+                f.seek(offset)
+                records[offset] = json.loads(f.readline())
+        return [records[offset] for offset in offsets]
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        """按行号顺序遍历全部元数据"""
+        count = len(self._offsets)
+        with open(self._path(METADATA_FILE), "rb") as f:
+            for _, line in zip(range(count), f):
+                yield json.loads(line)
+
+    def vectors(self, row_ids: Sequence[int]) -> np.ndarray:
+        """按行号取出向量"""
+        ids = np.asarray(row_ids, dtype=np.int64)
+        base, tail = self._base, self._tail
+        result = np.empty((len(ids), self.dimension), dtype=np.float32)
+        in_base = ids < len(base)
+        result[in_base] = base[ids[in_base]]
+        result[~in_base] = tail[ids[~in_base] - len(base)]
+        return result
+
+    def search(
+        self,
+        queries: Sequence[Sequence[float]],
+        top_k: int,
+        exact: bool = False,
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """余弦相似度 top-k，返回每个查询的 (行号, 分数) 列表
+
+        已训练 IVF 索引时默认走近似检索，exact=True 强制暴力检索。
+        """
+        query_matrix = normalize_rows(np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension))
+        ivf = self._ivf
+        if not exact and ivf is not None and ivf.is_trained:
+            return self._search_ivf(ivf, query_matrix, top_k, nprobe)
+        if not exact and self._codes is not None:
+            return self._search_quantized(query_matrix, top_k)
+        with self._lock:
+            base, tail = self._base, self._tail
+        # 分别计算压缩部分与追加部分的分数，避免拼接整个矩阵
+        scores = query_matrix @ base.T
+        if len(tail):
+            scores = np.hstack([scores, query_matrix @ tail.T])
+        indices = top_k_indices(scores, top_k)
+        return [
+            [(int(i), float(scores[q, i])) for i in row]
+            for q, row in enumerate(indices)
+        ]
+
+    def check_recall(self, sample_size: int = 200, top_k: int = 10, nprobe: Optional[int] = None) -> float:
+        """以随机抽取的已存向量为查询（排除自身），计算当前检索方式（IVF 或量化粗筛）相对暴力检索的召回率"""
+        return sample_recall(
+            self.matrix(),
+            lambda queries, k: self.search(queries, k, nprobe=nprobe),
+            top_k,
+            sample_size,
+        )
+
+    def _rescore(self, query: np.ndarray, shortlist: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """用全精度向量对候选重新打分"""
+        if len(shortlist) == 0:
+            return []
+        exact = self.vectors(shortlist) @ query
+        order = top_k_indices(exact[None, :], top_k)[0]
+        return [(int(shortlist[i]), float(exact[i])) for i in order]
+
+    def _search_quantized(self, queries: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        """量化码粗筛（所有查询一次打分）后用全精度向量重新打分"""
+        approximate = self._quantizer.scores(self._codes, queries)
+        shortlists = top_k_indices(approximate, top_k * self.rescore_factor)
+        return [self._rescore(query, shortlist, top_k) for query, shortlist in zip(queries, shortlists)]
+
+    def _search_ivf(
+        self, ivf: IVFIndex, queries: np.ndarray, top_k: int, nprobe: Optional[int]
+    ) -> List[List[Tuple[int, float]]]:
+        """IVF 选出候选聚类；有量化码时先用量化码粗筛候选，只对 top_k * rescore_factor 条读取全精度向量"""
+        codes = self._codes
+        if codes is None:
+            return ivf.search(queries, top_k, self.vectors, nprobe)
+        results = []
+        for query in queries:
+            candidates = ivf.candidates(query, nprobe)
+            approximate = self._quantizer.scores(codes[candidates], query[None, :])
+            shortlist = candidates[top_k_indices(approximate, top_k * self.rescore_factor)[0]]
+            results.append(self._rescore(query, shortlist, top_k))
+        return results
+
+
+def migrate_store(directory: str, quantization: str, dimension: int = 768) -> NumpyVectorStore:
+    """把已有存储转换为指定的量化方式 (none/int8/binary)"""
+    store = NumpyVectorStore(directory, dimension=dimension, quantization=quantization)
+    store.compact(requantize=True)
+    return store
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+
+def clustered_vectors(rows: int, dimension: int, topics: int = 64, noise: float = 0.5, seed: int = 0) -> np.ndarray:
+    """按主题聚集的向量，近似真实嵌入的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((topics, dimension)).astype(np.float32)
+    labels = rng.integers(0, topics, rows)
+    return centers[labels] + noise * rng.standard_normal((rows, dimension)).astype(np.float32)
+
+
+@pytest.fixture
+def clustered():
+    return clustered_vectors
@@ -0,0 +1,56 @@
+from mcp_server_better_prompts.chunking import (
+    estimate_tokens,
+    merge_methodologies,
+    parse_methodology_json,
+    split_content,
+)
+
+
+def test_estimate_tokens_counts_cjk_characters_individually():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("方法论") == 3
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("方法 abcd") == 2 + 2
+
+
+def test_short_content_stays_in_one_chunk():
+    content = "# 标题\n\n第一段。\n\n第二段。"
+    assert split_content(content, 1000) == [content]
+
+
+def test_chunks_respect_the_token_limit():
+    sections = [f"# 第{i}章\n\n" + "\n\n".join(f"第{i}章第{j}段，" + "内容" * 40 for j in range(5)) for i in range(6)]
+    content = "\n\n".join(sections)
+    chunks = split_content(content, 200)
+
+    assert len(chunks) > 1
+    assert all(estimate_tokens(chunk) <= 200 for chunk in chunks)
+    # 只在片段边界切分，不丢失正文
+    assert "".join(chunks).replace("\n", "") == content.replace("\n", "")
+
+
+def test_oversized_paragraph_is_hard_split():
+    chunks = split_content("长" * 1000, 300)
+
+    assert all(estimate_tokens(chunk) <= 300 for chunk in chunks)
+    assert "".join(chunks) == "长" * 1000
+
+
+def test_parse_methodology_json_tolerates_surrounding_text():
+    text = '结果如下：\n```json\n[{"title": "A", "methodology": "x"}, 1]\n```'
+    assert parse_methodology_json(text) == [{"title": "A", "methodology": "x"}]
+    assert parse_methodology_json("没有结果") == []
+    assert parse_methodology_json("[不是 JSON]") == []
+
+
+def test_merge_keeps_the_most_complete_duplicate():
+    merged = merge_methodologies([
+        [{"title": "第一性原理", "methodology": "短"}, {"title": "其他", "methodology": "相同内容"}],
+        [{"title": "第一性 原理！", "methodology": "更完整的内容"}, {"title": "别名", "methodology": "相同内容"}],
+        [{"title": "空", "methodology": "  "}],
+    ])
+
+    assert merged == [
+        {"title": "第一性 原理！", "methodology": "更完整的内容"},
+        {"title": "其他", "methodology": "相同内容"},
+    ]
@@ -0,0 +1,42 @@
+from mcp_server_better_prompts.dedup import DedupIndex, content_hash, simhash
+
+TEXT = (
+    "第一性原理是一种思考方法：把问题拆解到最基本的事实，再从这些事实出发重新推理，而不是依赖类比或惯例。"
+    "使用步骤：一、明确要解决的问题和目标；二、列出当前的假设与行业惯例；三、逐条质疑假设，追问其背后的物理或经济事实；"
+    "四、只保留无法再分解的基本事实；五、从基本事实出发重新组合出解决方案；六、用小规模实验验证推理结果。"
+    "适用场景：创新产品设计、成本结构分析、技术选型、商业模式重构。注意事项：拆解需要足够的领域知识，"
+    "否则容易把惯例误当作事实；推理链条要可检验，避免停留在抽象层面。示例：电池成本分析中，把电池拆解为钴、镍、铝、碳等原材料，"
+    "按大宗商品价格估算材料成本，发现远低于市场售价，从而找到降本空间。"
+)
+# 同一条方法论措辞略有不同的版本
+EDITED = TEXT.replace("技术选型", "技术决策").replace("示例：", "例如：")
+
+
+def test_content_hash_ignores_whitespace():
+    assert content_hash("金字塔  原理\n结论先行") == content_hash(" 金字塔 原理 结论先行 ")
+    assert content_hash("金字塔原理") != content_hash("第一性原理")
+
+
+def test_simhash_is_stable_for_small_edits():
+    assert simhash(TEXT) == simhash(TEXT)
+    assert bin(simhash(TEXT) ^ simhash(EDITED)).count("1") <= 3
+
+
+def test_finds_exact_and_near_duplicates(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.jsonl"))
+    index.add([(1, TEXT), (2, "SWOT 分析法：优势、劣势、机会、威胁")])
+
+    assert index.find_exact(TEXT + "  ") == 1
+    assert index.find_exact("全新的内容") is None
+    assert index.find_near(EDITED) == 1
+    assert index.find_near("金字塔原理：结论先行，以上统下，归类分组，逻辑递进") is None
+
+
+def test_index_persists_across_reloads(tmp_path):
+    path = str(tmp_path / "dedup.jsonl")
+    DedupIndex(path).add([(1, TEXT), (1, "重复ID被忽略")])
+
+    reloaded = DedupIndex(path)
+    assert len(reloaded) == 1 and 1 in reloaded
+    assert reloaded.find_exact(TEXT) == 1
+    assert reloaded.find_exact("重复ID被忽略") is None
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from mcp_server_better_prompts.ivf_index import IVFIndex, recall_at_k, sample_recall
+from mcp_server_better_prompts.vector_store import NumpyVectorStore, normalize_rows
+
+MIN_RECALL = 0.85
+
+
+def _metadata(count: int):
+    return [{"title": "", "content": ""}] * count
+
+
+def test_recall_at_k():
+    exact = [[(1, 0.9), (2, 0.8)], [(3, 0.9), (4, 0.8)]]
+    approximate = [[(1, 0.9), (5, 0.7)], [(4, 0.8), (3, 0.9)]]
+
+    assert recall_at_k(exact, approximate) == 0.75
+    assert recall_at_k([], []) == 1.0
+
+
+def test_sample_recall_of_exact_search_is_one(clustered):
+    vectors = normalize_rows(clustered(500, 16))
+
+    def exact(queries, k):
+        scores = queries @ vectors.T
+        return [[(int(i), float(row[i])) for i in np.argsort(-row)[:k]] for row in scores]
+
+    assert sample_recall(vectors, exact, top_k=5, sample_size=50) == 1.0
+
+
+def test_calibrated_nprobe_reaches_target_recall(tmp_path, clustered):
+    vectors = normalize_rows(clustered(4000, 32))
+    index = IVFIndex(str(tmp_path), target_recall=0.9)
+    index.train(vectors)
+
+    assert index.auto_nprobe
+    assert 1 <= index.nprobe <= len(index.centroids)
+    assert index.calibrated_recall >= 0.9
+    fetch = lambda ids: vectors[ids]
+    recall = sample_recall(vectors, lambda queries, k: index.search(queries, k, fetch), sample_size=100, seed=1)
+    assert recall >= MIN_RECALL
+
+
+def test_index_round_trips_through_disk(tmp_path, clustered):
+    vectors = normalize_rows(clustered(2000, 16))
+    index = IVFIndex(str(tmp_path))
+    index.train(vectors[:1500])
+    index.add(1500, vectors[1500:])
+    index.save()
+
+    loaded = IVFIndex(str(tmp_path))
+    assert loaded.load()
+    assert len(loaded) == 2000
+    assert loaded.nprobe == index.nprobe and loaded.trained_rows == 1500
+    query = vectors[1999]
+    assert set(loaded.candidates(query).tolist()) == set(index.candidates(query).tolist())
+
+
+def test_add_requires_contiguous_ids(tmp_path, clustered):
+    vectors = normalize_rows(clustered(300, 8))
+    index = IVFIndex(str(tmp_path), nlist=4, nprobe=2)
+    index.train(vectors[:200])
+
+    with pytest.raises(ValueError):
+        index.add(250, vectors[200:])
+
+
+def test_store_recall_stays_above_minimum(tmp_path, clustered):
+    vectors = clustered(6000, 32)
+    store = NumpyVectorStore(str(tmp_path), dimension=32, index="ivf", ivf_min_rows=2000)
+    for start in range(0, 6000, 1000):
+        store.add(vectors[start:start + 1000], _metadata(1000))
+
+    info = store.index_info()
+    assert info["index"] == "ivf" and info["ivf_trained"]
+    # 只扫描部分聚类，召回率反映的是近似检索
+    assert info["nprobe"] < info["nlist"]
+    assert store.check_recall(sample_size=100) >= MIN_RECALL
+
+
+def test_store_retrains_after_growth(tmp_path, clustered):
+    vectors = clustered(4500, 16)
+    store = NumpyVectorStore(
+        str(tmp_path), dimension=16, index="ivf", ivf_min_rows=1000, ivf_retrain_factor=4.0
+    )
+    store.add(vectors[:1000], _metadata(1000))
+    assert store.index_info()["trained_rows"] == 1000
+
+    store.add(vectors[1000:3000], _metadata(2000))
+    assert store.index_info()["trained_rows"] == 1000
+    store.add(vectors[3000:], _metadata(1500))
+    assert store.index_info()["trained_rows"] == 4500
+
+    reopened = NumpyVectorStore(str(tmp_path), dimension=16, index="ivf", ivf_min_rows=1000)
+    assert reopened.index_info()["trained_rows"] == 4500
+    assert reopened.check_recall(sample_size=100) >= MIN_RECALL
@@ -0,0 +1,45 @@
+from mcp_server_better_prompts.lexical_index import BM25Index, reciprocal_rank_fusion, tokenize
+
+
+def test_tokenize_mixes_cjk_bigrams_and_words():
+    assert tokenize("第一性原理 First-Principles 2024") == [
+        "第一", "一性", "性原", "原理", "first", "principles", "2024",
+    ]
+    assert tokenize("用 AI") == ["用", "ai"]
+
+
+def test_search_ranks_matching_documents(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.jsonl"))
+    index.add([
+        (1, "第一性原理：回到事物最基本的事实重新推理"),
+        (2, "金字塔原理：结论先行，以上统下"),
+        (3, "SWOT 分析法：优势、劣势、机会、威胁"),
+    ])
+
+    results = index.search("第一性原理", 10)
+    assert results[0][0] == 1
+    assert {doc_id for doc_id, _ in results} == {1, 2}
+    assert index.search("swot", 10)[0][0] == 3
+    assert index.search("不相关的查询词", 10) == []
+
+
+def test_index_persists_and_ignores_duplicate_ids(tmp_path):
+    path = str(tmp_path / "bm25.jsonl")
+    index = BM25Index(path)
+    index.add([(1, "金字塔原理"), (2, "第一性原理")])
+    index.add([(1, "重复的文档"), (3, "SWOT 分析")])
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"id": 4, "tf"')
+
+    reloaded = BM25Index(path)
+    assert len(reloaded) == 3
+    assert 3 in reloaded and 4 not in reloaded
+    assert reloaded.search("金字塔", 1) == index.search("金字塔", 1)
+    assert reloaded.search("重复", 10) == []
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["b", "a", "d", "c"]
+    assert fused[0][1] == 1 / 62 + 1 / 61
@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+import pytest
+
+from mcp_server_better_prompts.llm_scheduler import (
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    LLMScheduler,
+    TokenBucket,
+    _retry_after,
+)
+
+
+def _status_error(status: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://llm.test/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"HTTP {status}", request=request, response=response)
+
+
+def test_interactive_requests_run_before_queued_bulk_requests():
+    async def main():
+        scheduler = LLMScheduler(max_in_flight=1)
+        order = []
+        gate = asyncio.Event()
+
+        async def blocker():
+            await gate.wait()
+
+        def job(name):
+            async def send():
+                order.append(name)
+            return send
+
+        first = asyncio.create_task(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        waiting = [
+            asyncio.create_task(scheduler.submit(job("bulk-1"), priority=PRIORITY_BULK)),
+            asyncio.create_task(scheduler.submit(job("bulk-2"), priority=PRIORITY_BULK)),
+            asyncio.create_task(scheduler.submit(job("interactive"), priority=PRIORITY_INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *waiting)
+        return order
+
+    assert asyncio.run(main()) == ["interactive", "bulk-1", "bulk-2"]
+
+
+def test_retries_retryable_errors_then_succeeds():
+    async def main():
+        scheduler = LLMScheduler(max_retries=3, base_delay=0)
+        calls = 0
+
+        async def send():
+            nonlocal calls
+            calls += 1
+            if calls < 3:
+                raise _status_error(503)
+            return "ok"
+
+        return await scheduler.submit(send), calls, scheduler.retries
+
+    assert asyncio.run(main()) == ("ok", 3, 2)
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    async def main():
+        scheduler = LLMScheduler(max_retries=3, base_delay=0)
+        calls = 0
+
+        async def send():
+            nonlocal calls
+            calls += 1
+            raise _status_error(400)
+
+        with pytest.raises(httpx.HTTPStatusError):
+            await scheduler.submit(send)
+        return calls
+
+    assert asyncio.run(main()) == 1
+
+
+def test_gives_up_after_max_retries():
+    async def main():
+        scheduler = LLMScheduler(max_retries=2, base_delay=0)
+
+        async def send():
+            raise httpx.ConnectError("connection refused")
+
+        with pytest.raises(httpx.ConnectError):
+            await scheduler.submit(send)
+        return scheduler.retries
+
+    assert asyncio.run(main()) == 2
+
+
+def test_backoff_honours_retry_after_within_the_cap():
+    scheduler = LLMScheduler(base_delay=1, max_delay=30)
+
+    assert scheduler._backoff(0, _status_error(429, {"retry-after": "5"}).response) == 5
+    assert scheduler._backoff(0, _status_error(429, {"retry-after": "3600"}).response) == 30
+    assert 0 <= scheduler._backoff(10, None) <= 30
+
+
+def test_retry_after_parses_seconds_and_dates():
+    assert _retry_after(_status_error(429, {"retry-after": "2.5"}).response) == 2.5
+    assert _retry_after(_status_error(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}).response) == 0
+    assert _retry_after(_status_error(429, {"retry-after": "soon"}).response) is None
+    assert _retry_after(None) is None
+
+
+def test_token_bucket_debit_and_unlimited_rate():
+    async def main():
+        bucket = TokenBucket(600)
+        await bucket.take(500)
+        bucket.debit(50)
+        remaining = bucket.tokens
+        unlimited = TokenBucket(0)
+        await unlimited.take(10 ** 9)
+        return remaining
+
+    assert asyncio.run(main()) == pytest.approx(50, abs=1)
@@ -0,0 +1,82 @@
+import pytest
+
+from mcp_server_better_prompts.chunking import estimate_tokens
+from mcp_server_better_prompts.packing import (
+    mmr_order,
+    pack_methodologies,
+    render_methodologies,
+    trim_section,
+    truncate_to_tokens,
+)
+
+
+def _methodology(title: str, score: float, body: str = "核心步骤说明。", details: int = 30):
+    content = (
+        f"## 核心思想\n{title}{body * 5}\n\n"
+        f"## 应用步骤\n" + "\n".join(f"{i}. 第{i}步：{body}" for i in range(1, 6)) + "\n\n"
+        f"## 细节和示例\n" + "示例内容，" * details
+    )
+    return {"id": title, "title": title, "content": content, "score": score}
+
+
+METHODOLOGIES = [
+    _methodology("第一性原理", 0.9, "拆解到基本事实再推理。"),
+    _methodology("金字塔原理", 0.8, "结论先行，以上统下。"),
+    _methodology("SWOT 分析", 0.7, "列出优势劣势机会威胁。"),
+    _methodology("五个为什么", 0.6, "连续追问找到根因。"),
+]
+
+
+def test_everything_fits_in_a_large_budget():
+    result = pack_methodologies(METHODOLOGIES, budget=100000, max_items=10, count=estimate_tokens)
+
+    assert [m["title"] for m in result.methodologies] == [m["title"] for m in METHODOLOGIES]
+    assert result.dropped == [] and result.trimmed == []
+    assert result.tokens == estimate_tokens(render_methodologies(METHODOLOGIES))
+
+
+@pytest.mark.parametrize("budget", [50, 150, 300, 500, 800, 1200])
+def test_packed_context_never_exceeds_the_budget(budget):
+    result = pack_methodologies(METHODOLOGIES, budget=budget, max_items=10, count=estimate_tokens)
+
+    assert result.tokens == estimate_tokens(render_methodologies(result.methodologies))
+    assert result.tokens <= budget
+    kept = {m["title"] for m in result.methodologies}
+    assert kept | set(result.dropped) == {m["title"] for m in METHODOLOGIES}
+
+
+def test_trims_optional_sections_before_dropping_methodologies():
+    full = estimate_tokens(render_methodologies(METHODOLOGIES))
+    result = pack_methodologies(METHODOLOGIES, budget=full - 40, max_items=10, count=estimate_tokens)
+
+    assert len(result.methodologies) == len(METHODOLOGIES)
+    assert result.trimmed == ["五个为什么"]
+    assert "细节和示例" not in result.methodologies[-1]["content"]
+    assert "## 应用步骤" in result.methodologies[-1]["content"]
+    # 返回的是副本，不修改检索结果
+    assert "细节和示例" in METHODOLOGIES[-1]["content"]
+
+
+def test_max_items_limits_selection():
+    result = pack_methodologies(METHODOLOGIES, budget=100000, max_items=2, count=estimate_tokens)
+
+    assert [m["title"] for m in result.methodologies] == ["第一性原理", "金字塔原理"]
+    assert result.dropped == ["SWOT 分析", "五个为什么"]
+
+
+def test_mmr_prefers_diverse_methodologies():
+    duplicate = dict(METHODOLOGIES[0], id="copy", title="第一性原理（副本）", score=0.85)
+    ordered = mmr_order([METHODOLOGIES[0], duplicate, METHODOLOGIES[1]], max_items=2, mmr_lambda=0.5)
+
+    assert [m["title"] for m in ordered] == ["第一性原理", "金字塔原理"]
+
+
+def test_trim_section_and_truncation():
+    content = "## 核心思想\n内容\n\n## 细节和示例\n### 示例一\n很长的示例\n\n## 注意事项\n保留"
+
+    assert trim_section(content, ["细节和示例"]) == "## 核心思想\n内容\n## 注意事项\n保留"
+    assert trim_section(content, ["不存在"]) is None
+    text = "第一段内容。\n\n" + "第二段" * 100
+    truncated = truncate_to_tokens(text, 50, estimate_tokens)
+    assert estimate_tokens(truncated) <= 50 and truncated.endswith("……")
+    assert truncate_to_tokens("短文本", 50, estimate_tokens) == "短文本"
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from mcp_server_better_prompts.quantization import BinaryQuantizer, Int8Quantizer, make_quantizer
+from mcp_server_better_prompts.vector_store import NumpyVectorStore, migrate_store, normalize_rows
+
+MIN_RECALL = 0.85
+
+
+def _metadata(count: int):
+    return [{"title": "", "content": ""}] * count
+
+
+def test_int8_scores_approximate_inner_products(clustered):
+    vectors = normalize_rows(clustered(1000, 32))
+    queries = vectors[:10]
+    quantizer = Int8Quantizer()
+    quantizer.fit(vectors)
+    codes = quantizer.encode(vectors)
+
+    assert codes.dtype == np.int8
+    np.testing.assert_allclose(quantizer.scores(codes, queries), queries @ vectors.T, atol=0.02)
+    assert not quantizer.needs_refit(vectors)
+    assert quantizer.needs_refit(vectors * 2)
+
+
+def test_int8_scale_round_trips_through_disk(tmp_path, clustered):
+    quantizer = Int8Quantizer()
+    quantizer.fit(clustered(100, 8))
+    quantizer.save(str(tmp_path))
+
+    loaded = Int8Quantizer()
+    assert loaded.load(str(tmp_path))
+    np.testing.assert_array_equal(loaded.scale, quantizer.scale)
+    assert not Int8Quantizer().load(str(tmp_path / "missing"))
+
+
+def test_binary_scores_match_sign_vectors(clustered):
+    vectors = clustered(300, 20)
+    queries = clustered(5, 20, seed=1)
+    quantizer = BinaryQuantizer()
+    codes = quantizer.encode(vectors)
+
+    assert codes.shape == (300, 3)
+    signs = np.where(vectors > 0, 1.0, -1.0)
+    np.testing.assert_allclose(quantizer.scores(codes, queries), queries @ signs.T, rtol=1e-5, atol=1e-4)
+
+
+def test_make_quantizer():
+    assert make_quantizer("none") is None
+    assert isinstance(make_quantizer("int8"), Int8Quantizer)
+    assert isinstance(make_quantizer("binary"), BinaryQuantizer)
+    with pytest.raises(ValueError):
+        make_quantizer("pq")
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_quantized_store_recall_stays_above_minimum(tmp_path, clustered, quantization):
+    vectors = clustered(5000, 64)
+    store = NumpyVectorStore(str(tmp_path), dimension=64, quantization=quantization)
+    for start in range(0, 5000, 1000):
+        store.add(vectors[start:start + 1000], _metadata(1000))
+
+    assert store.quantization == quantization
+    assert store.check_recall(sample_size=100) >= MIN_RECALL
+    reopened = NumpyVectorStore(str(tmp_path), dimension=64)
+    assert reopened.quantization == quantization
+    assert reopened.check_recall(sample_size=100) >= MIN_RECALL
+
+
+@pytest.mark.parametrize("quantization", ["int8", "binary"])
+def test_ivf_with_quantized_codes_recall_stays_above_minimum(tmp_path, clustered, quantization):
+    vectors = clustered(6000, 64)
+    store = NumpyVectorStore(
+        str(tmp_path), dimension=64, index="ivf", ivf_min_rows=2000, quantization=quantization
+    )
+    for start in range(0, 6000, 1000):
+        store.add(vectors[start:start + 1000], _metadata(1000))
+
+    info = store.index_info()
+    assert info["ivf_trained"] and info["quantization"] == quantization
+    assert store.check_recall(sample_size=100) >= MIN_RECALL
+
+
+def test_migration_keeps_exact_results(tmp_path, clustered):
+    vectors = clustered(2000, 32)
+    store = NumpyVectorStore(str(tmp_path), dimension=32)
+    store.add(vectors, _metadata(2000))
+    queries = clustered(5, 32, seed=1)
+    expected = store.search(queries, 10)
+
+    migrated = migrate_store(str(tmp_path), "int8", dimension=32)
+    assert migrated.quantization == "int8"
+    assert migrated.search(queries, 10, exact=True) == expected
@@ -0,0 +1,49 @@
+from mcp_server_better_prompts.semantic_cache import SemanticCache
+
+
+def test_similar_query_hits_and_dissimilar_misses():
+    cache = SemanticCache(threshold=0.95)
+    cache.put("model", [1, 2], [1.0, 0.0, 0.0], "答案")
+
+    assert cache.get("model", [1, 2], [0.99, 0.05, 0.0]) == "答案"
+    assert cache.get("model", [1, 2], [0.0, 1.0, 0.0]) is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_entries_are_scoped_by_model_and_methodologies():
+    cache = SemanticCache()
+    cache.put("model", [1, 2], [1.0, 0.0], "答案")
+
+    assert cache.get("other-model", [1, 2], [1.0, 0.0]) is None
+    assert cache.get("model", [1, 3], [1.0, 0.0]) is None
+    assert cache.get("model", ["1", "2"], [1.0, 0.0]) == "答案"
+
+
+def test_clear_discards_results_from_an_older_generation():
+    cache = SemanticCache()
+    generation = cache.generation
+    cache.clear()
+    cache.put("model", [1], [1.0, 0.0], "过期答案", generation=generation)
+
+    assert cache.get("model", [1], [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used_group_beyond_capacity():
+    cache = SemanticCache(max_entries=2)
+    cache.put("model", [1], [1.0, 0.0], "一")
+    cache.put("model", [2], [1.0, 0.0], "二")
+    assert cache.get("model", [1], [1.0, 0.0]) == "一"
+    cache.put("model", [3], [1.0, 0.0], "三")
+
+    assert cache.get("model", [2], [1.0, 0.0]) is None
+    assert cache.get("model", [1], [1.0, 0.0]) == "一"
+    assert cache.get("model", [3], [1.0, 0.0]) == "三"
+
+
+def test_expired_entries_are_not_returned():
+    cache = SemanticCache(ttl=-1)
+    cache.put("model", [1], [1.0, 0.0], "答案")
+
+    assert cache.get("model", [1], [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,79 @@
+import json
+import os
+
+import numpy as np
+
+from mcp_server_better_prompts.vector_store import (
+    METADATA_FILE,
+    NumpyVectorStore,
+    normalize_rows,
+    top_k_indices,
+)
+
+
+def _brute_force(vectors: np.ndarray, queries: np.ndarray, top_k: int):
+    scores = normalize_rows(queries) @ normalize_rows(vectors).T
+    return [list(np.argsort(-row, kind="stable")[:top_k]) for row in scores]
+
+
+def _metadata(start: int, count: int):
+    return [{"title": f"方法论{i}", "content": f"内容{i}"} for i in range(start, start + count)]
+
+
+def test_top_k_indices_orders_by_score():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7], [1.0, 0.0, 0.2, 0.3]])
+
+    assert top_k_indices(scores, 2).tolist() == [[1, 3], [0, 3]]
+    assert top_k_indices(scores, 10).tolist() == [[1, 3, 2, 0], [0, 3, 2, 1]]
+    assert top_k_indices(scores[:, :0], 3).shape == (2, 0)
+
+
+def test_flat_search_matches_brute_force(tmp_path, clustered):
+    vectors = clustered(2700, 32)
+    store = NumpyVectorStore(str(tmp_path), dimension=32, compact_threshold=1000)
+    for start in range(0, 2500, 500):
+        store.add(vectors[start:start + 500], _metadata(start, 500))
+    # 其余数据留在追加文件中，检索同时覆盖压缩部分与追加部分
+    store.add(vectors[2500:], _metadata(2500, 200))
+    assert store.append_rows > 0
+
+    queries = np.random.default_rng(1).standard_normal((20, 32)).astype(np.float32)
+    results = store.search(queries, 10)
+
+    assert [[row_id for row_id, _ in hits] for hits in results] == _brute_force(vectors, queries, 10)
+    scores = [score for _, score in results[0]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_data_survives_reopen_and_compaction(tmp_path, clustered):
+    vectors = clustered(2600, 16)
+    store = NumpyVectorStore(str(tmp_path), dimension=16, compact_threshold=1024)
+    ids = []
+    for start in range(0, 2600, 200):
+        ids += store.add(vectors[start:start + 200], _metadata(start, 200))
+    assert ids == list(range(2600))
+
+    reopened = NumpyVectorStore(str(tmp_path), dimension=16, compact_threshold=1024)
+    assert len(reopened) == 2600
+    np.testing.assert_allclose(reopened.matrix(), normalize_rows(vectors), atol=1e-6)
+    assert reopened.get(1234) == {"title": "方法论1234", "content": "内容1234", "id": 1234}
+    assert [record["id"] for record in reopened.get_many([7, 2599, 7, 0])] == [7, 2599, 7, 0]
+    assert [record["id"] for record in reopened.records()] == ids
+
+    reopened.compact()
+    assert reopened.append_rows == 0
+    again = NumpyVectorStore(str(tmp_path), dimension=16)
+    np.testing.assert_allclose(again.matrix(), normalize_rows(vectors), atol=1e-6)
+
+
+def test_incomplete_metadata_line_is_discarded_on_load(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), dimension=4)
+    store.add(np.eye(4, dtype=np.float32)[:2], _metadata(0, 2))
+    with open(os.path.join(str(tmp_path), METADATA_FILE), "ab") as f:
+        f.write(b'{"title": "half')
+
+    reopened = NumpyVectorStore(str(tmp_path), dimension=4)
+    assert len(reopened) == 2
+    assert reopened.add(np.eye(4, dtype=np.float32)[2:3], _metadata(2, 1)) == [2]
+    with open(os.path.join(str(tmp_path), METADATA_FILE), encoding="utf-8") as f:
+        assert [json.loads(line)["id"] for line in f] == [0, 1, 2]